@@ -0,0 +1,175 @@
+from __future__ import unicode_literals
+
+import random
+import uuid
+
+from mopidy_radiobrowser import countries
+
+from tests.fakeapi import Raw
+
+# Default sizes, close to the real radio-browser index
+TAGS = 10000
+STATIONS = 30000
+LANGUAGES = 400
+MAX_STATES = 20
+
+# A country with a large share of the stations, like the US in the real
+# index, it has more stations than the station registry holds by default
+LARGE_COUNTRY = 'US'
+LARGE_COUNTRY_SHARE = 0.3
+
+GENRES = ('pop', 'rock', 'jazz', 'news', 'classical', 'talk', 'dance',
+          'electronic', 'hits', 'oldies', 'country', 'folk', 'metal',
+          'ambient', 'hip hop', 'chillout', 'christian', 'sports')
+
+WORDS = ('radio', 'fm', 'one', 'city', 'sound', 'wave', 'music', 'live',
+         'classic', 'star', 'sun', 'blue', 'night', 'free', 'public',
+         'national', 'local', 'studio', 'lounge', 'channel')
+
+
+PLAYLIST = '[playlist]\nNumberOfEntries=1\nFile1=http://%s/stream/%d.mp3\n'
+
+
+class Fixtures(object):
+    # Generated radio-browser data and the API answers built from it.
+    #
+    # The data is random but reproducible from the seed. Tag and language
+    # popularity is skewed like in the real index, a few are used by many
+    # stations and most by a handful.
+
+    def __init__(self, host, tags=TAGS, stations=STATIONS,
+                 languages=LANGUAGES, seed=0):
+        self.host = host
+        rng = random.Random(seed)
+        # Every ISO 3166 country, by code and by the name the API uses
+        self.countries = sorted(countries.country_table('en'))
+        self.countryNames = {countries.country_info(code, 'en').name: code
+                             for code in self.countries}
+        self.tags = list(GENRES) + ['tag%05d' % i
+                                    for i in range(max(tags - len(GENRES), 0))]
+        self.languages = ['language%03d' % i for i in range(languages)]
+        self.states = {
+            country: ['%s state %d' % (country, i) for i in range(
+                MAX_STATES if country == LARGE_COUNTRY
+                else rng.randint(0, MAX_STATES))]
+            for country in self.countries}
+        self.stations = [self._station(rng, i) for i in range(stations)]
+        self.byUuid = {s['stationuuid']: s for s in self.stations}
+        self._index()
+
+    def _pick(self, rng, items):
+        # Skewed towards the first items, like a power law
+        return items[min(int(rng.paretovariate(1.2)) - 1, len(items) - 1)]
+
+    def _station(self, rng, i):
+        if rng.random() < LARGE_COUNTRY_SHARE:
+            country = LARGE_COUNTRY
+        else:
+            country = rng.choice(self.countries)
+        states = self.states[country]
+        tags = set(self._pick(rng, self.tags) for _ in range(rng.randint(1, 4)))
+        return {
+            'stationuuid': str(uuid.UUID(int=rng.getrandbits(128))),
+            'changeuuid': str(uuid.UUID(int=rng.getrandbits(128))),
+            'name': '%s %s %d' % (rng.choice(WORDS).title(),
+                                  rng.choice(WORDS).title(), i),
+            'url': 'http://%s/stream/%d.pls' % (self.host, i),
+            # A third of the stations has to be resolved from the playlist
+            'url_resolved': ('' if i % 3 == 0 else
+                             'http://%s/stream/%d.mp3' % (self.host, i)),
+            'homepage': 'http://station%d.example' % i,
+            'favicon': 'http://station%d.example/icon.png' % i,
+            'tags': ','.join(sorted(tags)),
+            'country': country,
+            'countrycode': country,
+            'state': rng.choice(states) if states and rng.random() < 0.7 else '',
+            'language': self._pick(rng, self.languages),
+            'codec': rng.choice(('MP3', 'AAC', 'OGG')),
+            'bitrate': rng.choice((64, 128, 192, 320)),
+            'votes': int(rng.paretovariate(0.8)),
+            'clickcount': int(rng.paretovariate(0.8)),
+            'lastcheckok': 1,
+            'lastchangetime': '2020-01-01 00:00:%02d' % (i % 60),
+        }
+
+    def _index(self):
+        self.byTag = {}
+        self.byLanguage = {}
+        self.byCountry = {}
+        self.byState = {}
+        for station in self.stations:
+            for tag in station['tags'].split(','):
+                self.byTag.setdefault(tag, []).append(station)
+            self.byLanguage.setdefault(station['language'], []).append(station)
+            self.byCountry.setdefault(station['countrycode'], []).append(station)
+            if station['state']:
+                self.byState.setdefault(station['state'], []).append(station)
+
+    def _listing(self, names, index, query):
+        entries = [{'name': name, 'stationcount': len(index.get(name, ()))}
+                   for name in names]
+        if query.get('order') == ['stationcount']:
+            entries.sort(key=lambda entry: entry['stationcount'],
+                         reverse=query.get('reverse') == ['true'])
+        offset = int(query.get('offset', ['0'])[0])
+        limit = int(query.get('limit', [len(entries)])[0])
+        return entries[offset:offset + limit]
+
+    def _top(self, field):
+        return sorted(self.stations, key=lambda s: s[field], reverse=True)[:50]
+
+    def _search(self, query):
+        name = query.get('name', [''])[0].lower()
+        tag = query.get('tag', [''])[0].lower()
+        limit = int(query.get('limit', ['100'])[0])
+        result = [s for s in self.stations
+                  if name in s['name'].lower() and tag in s['tags']]
+        return result[:limit]
+
+    def handle(self, path, query):
+        # FakeApi handler for every endpoint the extension uses
+        if path == '/json/stats':
+            return {'stations': len(self.stations)}
+        if path == '/json/tags':
+            return self._listing(self.tags, self.byTag, query)
+        if path == '/json/languages':
+            return self._listing(self.languages, self.byLanguage, query)
+        if path == '/json/countrycodes':
+            return self._listing(self.countries, self.byCountry, query)
+        if path.startswith('/json/states/'):
+            # The country is given by its name
+            name = path[len('/json/states/'):].strip('/')
+            country = self.countryNames.get(name, name)
+            return [{'name': state, 'country': name,
+                     'stationcount': len(self.byState.get(state, ()))}
+                    for state in self.states.get(country, ())]
+        if path == '/json/stations':
+            return self.stations
+        if path == '/json/stations/topclick/50':
+            return self._top('clickcount')
+        if path == '/json/stations/topvote/50':
+            return self._top('votes')
+        if path == '/json/stations/search':
+            return self._search(query)
+        if path == '/json/stations/byuuid':
+            uuids = query.get('uuids', [''])[0].split(',')
+            return [self.byUuid[u] for u in uuids if u in self.byUuid]
+        for prefix, index in (('/json/stations/byuuid/', None),
+                              ('/json/stations/bytagexact/', self.byTag),
+                              ('/json/stations/bylanguageexact/',
+                               self.byLanguage),
+                              ('/json/stations/bycountrycodeexact/',
+                               self.byCountry),
+                              ('/json/stations/bystateexact/', self.byState)):
+            if path.startswith(prefix):
+                key = path[len(prefix):]
+                if index is None:
+                    station = self.byUuid.get(key)
+                    return [station] if station else []
+                return index.get(key, [])
+        if path.startswith('/stream/') and path.endswith('.pls'):
+            number = int(path[len('/stream/'):-len('.pls')])
+            return Raw((PLAYLIST % (self.host, number)).encode('utf-8'),
+                       'audio/x-scpls')
+        return None
+
@@ -0,0 +1,420 @@
+from __future__ import unicode_literals
+
+import argparse
+import configparser
+import json
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import requests
+
+import mopidy_radiobrowser
+from mopidy_radiobrowser import tracing
+from mopidy_radiobrowser.catalog import Catalog
+from mopidy_radiobrowser.library import RadioBrowserLibrary
+from mopidy_radiobrowser.playback import RadioBrowserPlayback
+from mopidy_radiobrowser.radiobrowser import RadioBrowser
+from mopidy_radiobrowser.resolver import StreamResolver
+
+from benchmarks.fixtures import (
+    Fixtures, LANGUAGES, LARGE_COUNTRY, STATIONS, TAGS)
+
+from tests.fakeapi import FakeApi
+
+# Browsed directories, each reached by browsing its parents first: the ref
+# with the URI, else the first ref whose URI starts with it, is taken
+BROWSE = (
+    ('root', ()),
+    ('countries', ('radiobrowser:category:countries',)),
+    ('languages', ('radiobrowser:category:languages',)),
+    ('tags', ('radiobrowser:category:tags',)),
+    ('clicks', ('radiobrowser:category:clicks',)),
+    ('votes', ('radiobrowser:category:votes',)),
+    ('country', ('radiobrowser:category:countries', 'radiobrowser:country:')),
+    ('state', ('radiobrowser:category:countries', 'radiobrowser:country:',
+               'radiobrowser:state:')),
+    ('language', ('radiobrowser:category:languages', 'radiobrowser:language:')),
+    ('tag', ('radiobrowser:category:tags', 'radiobrowser:tag:')),
+    # The whole country of a country larger than the station registry
+    ('large country', ('radiobrowser:category:countries',
+                       'radiobrowser:country:' + LARGE_COUNTRY,
+                       'radiobrowser:state:' + LARGE_COUNTRY)),
+)
+
+SEARCHES = ({'any': ['radio']}, {'genre': ['jazz']}, {'track_name': ['city']})
+
+# Number of stations looked up at once, like a restored tracklist
+LOOKUP_BATCH = 100
+
+
+class Environment(object):
+    # What the backend would build: the API wrapper, the stream resolver and
+    # the providers, talking to the fake API through their own session
+
+    def __init__(self, host, options, catalog=None):
+        self.session = requests.Session()
+        self.radiobrowser = RadioBrowser(
+            options.timeout, self.session, catalog=catalog, hosts=[host],
+            cacheSize=options.cache_size,
+            minStationCount=options.min_stationcount,
+            pageSize=options.page_size, maxStations=options.max_stations,
+            maxDirectories=options.max_directories)
+        if catalog is not None:
+            # Done by the catalog sync at startup
+            self.radiobrowser.rebuildIndex()
+        self.resolver = StreamResolver(self.radiobrowser, None,
+                                       timeout=options.timeout)
+        self.backend = SimpleNamespace(radiobrowser=self.radiobrowser,
+                                       resolver=self.resolver)
+        self.library = RadioBrowserLibrary(self.backend)
+        self.playback = RadioBrowserPlayback(None, self.backend)
+
+    def close(self):
+        self.resolver.stop()
+        self.radiobrowser.stop()
+        self.session.close()
+
+    def browsePath(self, prefixes):
+        # Browses down to the directory and returns its URI
+        uri = 'radiobrowser:root'
+        for prefix in prefixes:
+            refs = self.library.browse(uri)
+            uris = [ref.uri for ref in refs]
+            uri = prefix if prefix in uris else next(
+                (uri for uri in uris if uri.startswith(prefix)), None)
+            if uri is None:
+                raise LookupError('Nothing to browse below %s' % prefix)
+        return uri
+
+
+class Result(object):
+    # Timings and API requests of one scenario
+
+    def __init__(self, name):
+        self.name = name
+        self.durations = []
+        self.requests = []
+        self.errors = 0
+
+    def add(self, duration, requests):
+        self.durations.append(duration)
+        self.requests.append(requests)
+
+    def summary(self):
+        durations = sorted(self.durations)
+        return {
+            'name': self.name,
+            'calls': len(durations),
+            'errors': self.errors,
+            'p50': percentile(durations, 50) * 1000,
+            'p90': percentile(durations, 90) * 1000,
+            'p99': percentile(durations, 99) * 1000,
+            'max': (durations[-1] if durations else 0.0) * 1000,
+            'requests': (sum(self.requests) / float(len(self.requests))
+                         if self.requests else 0.0),
+        }
+
+
+def percentile(values, percent):
+    # Nearest rank percentile of sorted values
+    if not values:
+        return 0.0
+    rank = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[rank]
+
+
+def peak_rss():
+    # Peak resident set size of this process in MiB, Linux reports KiB
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss /= 1024.0
+    return rss / 1024.0
+
+
+def serve(connection, latency, errorRate, scale, seed):
+    # Runs in the child process of ApiProcess: generates the fixtures, serves
+    # them and answers the questions of the benchmark until it is stopped
+    api = FakeApi(latency=latency, errorRate=errorRate, seed=seed).start()
+    start = time.perf_counter()
+    fixtures = Fixtures(api.host, tags=int(TAGS * scale),
+                        stations=int(STATIONS * scale),
+                        languages=max(int(LANGUAGES * scale), 1),
+                        seed=seed)
+    api.handler = fixtures.handle
+    summary = {'countries': len(fixtures.countries),
+               'states': sum(len(s) for s in fixtures.states.values()),
+               'languages': len(fixtures.languages),
+               'tags': len(fixtures.tags),
+               'stations': len(fixtures.stations),
+               'seconds': time.perf_counter() - start}
+    stationIds = [station['stationuuid']
+                  for station in fixtures.stations[:LOOKUP_BATCH]]
+    connection.send((api.host, summary, stationIds))
+    try:
+        while True:
+            command = connection.recv()
+            if command == 'requests':
+                connection.send(len(api.requests))
+            elif command == 'notModified':
+                connection.send(api.notModified)
+            else:
+                return
+    finally:
+        api.stop()
+        connection.close()
+
+
+class ApiProcess(object):
+    # The fake API and its fixtures, run in a child process, so the
+    # generated data and the server are not part of the measured process
+    # and its peak memory
+
+    def __init__(self, options):
+        context = multiprocessing.get_context('spawn')
+        self._connection, child = context.Pipe()
+        self._process = context.Process(
+            target=serve, name='FakeApi', daemon=True,
+            args=(child, options.latency / 1000.0, options.error_rate,
+                  options.scale, options.seed))
+        self._process.start()
+        child.close()
+        self.host, self.fixtures, self.stationIds = self._connection.recv()
+
+    def _ask(self, command):
+        self._connection.send(command)
+        return self._connection.recv()
+
+    def requestCount(self):
+        return self._ask('requests')
+
+    def notModified(self):
+        return self._ask('notModified')
+
+    def stop(self):
+        try:
+            self._connection.send('stop')
+        except OSError:
+            pass
+        self._process.join(5)
+        self._connection.close()
+
+
+def measure(result, api, call):
+    before = api.requestCount()
+    start = time.perf_counter()
+    try:
+        call()
+    except Exception:
+        result.errors += 1
+    result.add(time.perf_counter() - start, api.requestCount() - before)
+
+
+def scenarios(stationIds):
+    # (name, setup, call) of every measured call. The setup runs before the
+    # call and is not measured, e.g. browsing the parents of a directory.
+    for name, prefixes in BROWSE:
+        state = {}
+
+        def setup(env, prefixes=prefixes, state=state):
+            state['uri'] = env.browsePath(prefixes)
+
+        def call(env, state=state):
+            env.library.browse(state['uri'])
+
+        yield 'browse ' + name, setup, call
+
+    for query in SEARCHES:
+        yield ('search %s' % ','.join(query), None,
+               lambda env, query=query: env.library.search(query))
+
+    uris = ['radiobrowser:station:' + stationId
+            for stationId in stationIds[:LOOKUP_BATCH]]
+    yield ('lookup %d' % len(uris), None,
+           lambda env: env.library.lookup(uris=uris))
+    yield ('get_images %d' % len(uris), None,
+           lambda env: env.library.get_images(uris))
+
+    # The first station has to be resolved from its playlist, the second
+    # has a resolved URL
+    for kind, stationId in zip(('playlist', 'direct'), stationIds):
+        uri = 'radiobrowser:station:' + stationId
+        yield ('translate_uri ' + kind, None,
+               lambda env, uri=uri: env.playback.translate_uri(uri))
+
+
+def run(options):
+    api = ApiProcess(options)
+    catalogDir = tempfile.TemporaryDirectory()
+    try:
+        report = {
+            'options': vars(options),
+            'fixtures': api.fixtures,
+            'cold': [],
+            'warm': [],
+            # Before any backend was created, the scenarios add to it
+            'startRss': peak_rss(),
+        }
+
+        def catalog():
+            if not options.catalog:
+                return None
+            return Catalog(catalogDir.name + '/catalog.sqlite3')
+
+        if options.catalog:
+            env = Environment(api.host, options, catalog())
+            before = api.requestCount()
+            start = time.perf_counter()
+            env.radiobrowser.syncCatalog()
+            env.radiobrowser.rebuildIndex()
+            report['catalog'] = {'seconds': time.perf_counter() - start,
+                                 'requests': api.requestCount() - before}
+            env.close()
+
+        # Cold: every call with a new backend, nothing cached in memory
+        for name, setup, call in scenarios(api.stationIds):
+            result = Result(name)
+            for _ in range(options.repeat):
+                env = Environment(api.host, options, catalog())
+                try:
+                    if setup is not None:
+                        setup(env)
+                    measure(result, api, lambda: call(env))
+                except LookupError:
+                    result.errors += 1
+                finally:
+                    env.close()
+            report['cold'].append(result.summary())
+
+        # Warm: the same backend for all calls, after a first unmeasured one
+        env = Environment(api.host, options, catalog())
+        try:
+            for name, setup, call in scenarios(api.stationIds):
+                result = Result(name)
+                try:
+                    if setup is not None:
+                        setup(env)
+                    call(env)
+                except LookupError:
+                    result.errors += 1
+                else:
+                    for _ in range(options.repeat):
+                        measure(result, api, lambda: call(env))
+                report['warm'].append(result.summary())
+        finally:
+            env.close()
+
+        report['requests'] = api.requestCount()
+        report['notModified'] = api.notModified()
+        report['peakRss'] = peak_rss()
+        if tracing.is_enabled():
+            report['trace'] = {name: {'count': count, 'ms': total * 1000}
+                               for name, (count, total)
+                               in tracing.totals().items()}
+        return report
+    finally:
+        api.stop()
+        catalogDir.cleanup()
+
+
+def format_report(report):
+    lines = []
+    fixtures = report['fixtures']
+    lines.append('Fixtures: %(countries)d countries, %(states)d states, '
+                 '%(languages)d languages, %(tags)d tags, %(stations)d '
+                 'stations (%(seconds).1f s)' % fixtures)
+    if 'catalog' in report:
+        lines.append('Catalog sync: %(seconds).2f s, %(requests)d requests'
+                     % report['catalog'])
+    header = '%-24s %6s %9s %9s %9s %9s %9s %6s' % (
+        'scenario', 'calls', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms',
+        'requests', 'errors')
+    for phase in ('cold', 'warm'):
+        lines.append('')
+        lines.append(phase.title())
+        lines.append(header)
+        for summary in report[phase]:
+            lines.append('%(name)-24s %(calls)6d %(p50)9.1f %(p90)9.1f '
+                         '%(p99)9.1f %(max)9.1f %(requests)9.1f %(errors)6d'
+                         % summary)
+    if 'trace' in report:
+        lines.append('')
+        lines.append('Trace')
+        for name, total in sorted(report['trace'].items()):
+            lines.append('%-24s %6d %9.1f' % (name, total['count'],
+                                              total['ms']))
+    lines.append('')
+    lines.append('API requests: %d (%d not modified)' % (
+        report['requests'], report['notModified']))
+    lines.append('Peak RSS: %.1f MiB (%.1f MiB before the scenarios)' % (
+        report['peakRss'], report['startRss']))
+    return '\n'.join(lines)
+
+
+def ext_defaults():
+    # The shipped defaults of the extension's config, also those of the
+    # benchmark
+    parser = configparser.RawConfigParser()
+    parser.read_string(mopidy_radiobrowser.Extension().get_default_config())
+    return parser['radiobrowser']
+
+
+def parse_args(args=None):
+    defaults = ext_defaults()
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Benchmark the extension against a local fake '
+                    'radio-browser API.')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='delay of every API response in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of API requests failing with 503')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='measured calls per scenario')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='size of the fixtures relative to the real '
+                             'index (%d tags, %d stations)' % (TAGS, STATIONS))
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the generated fixtures and errors')
+    parser.add_argument('--timeout', type=int,
+                        default=defaults.getint('timeout'),
+                        help='API timeout in ms')
+    parser.add_argument('--page-size', type=int,
+                        default=defaults.getint('page_size'),
+                        help='page size of the tag and language listings')
+    parser.add_argument('--min-stationcount', type=int,
+                        default=defaults.getint('min_stationcount'),
+                        help='stations a tag or language needs to be listed')
+    parser.add_argument('--max-stations', type=int,
+                        default=defaults.getint('max_stations'),
+                        help='stations kept in memory, 0 for no limit')
+    parser.add_argument('--max-directories', type=int,
+                        default=defaults.getint('max_directories'),
+                        help='directories kept in memory, 0 for no limit')
+    parser.add_argument('--cache-size', type=int,
+                        default=defaults.getint('cache_size'),
+                        help='cached API responses')
+    parser.add_argument('--catalog', action='store_true',
+                        help='sync the station catalog first and browse it')
+    parser.add_argument('--trace', action='store_true',
+                        help='report the time spent per traced span')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    options = parse_args(args)
+    tracing.enable(options.trace)
+    report = run(options)
+    if options.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
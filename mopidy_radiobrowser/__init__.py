@@ -1,11 +1,16 @@
 import logging
 import pathlib
 
-import pkg_resources
+try:
+    from importlib import metadata
+except ImportError:  # Python 3.7
+    import importlib_metadata as metadata
 
 from mopidy import config, ext
 
-__version__ = pkg_resources.get_distribution("Mopidy-RadioBrowser").version
+# importlib.metadata only reads our own metadata, unlike pkg_resources which
+# scans every installed distribution on import
+__version__ = metadata.version("Mopidy-RadioBrowser")
 
 # TODO: If you need to log, use loggers named after the current Python module
 logger = logging.getLogger(__name__)
@@ -26,6 +31,21 @@ class Extension(ext.Extension):
         #schema["username"] = config.String()
         #schema["password"] = config.Secret()
         schema['timeout'] = config.Integer(minimum=0)
+        schema['connect_timeout'] = config.Integer(minimum=0)
+        schema['https'] = config.Boolean()
+        schema['catalog'] = config.Boolean()
+        schema['catalog_refresh'] = config.Integer(minimum=0)
+        schema['cache_size'] = config.Integer(minimum=0)
+        schema['min_stationcount'] = config.Integer(minimum=1)
+        schema['page_size'] = config.Integer(minimum=0)
+        schema['max_stations'] = config.Integer(minimum=0)
+        schema['max_directories'] = config.Integer(minimum=0)
+        schema['search_limit'] = config.Integer(minimum=1)
+        schema['prefetch'] = config.Integer(minimum=0)
+        schema['prefetch_workers'] = config.Integer(minimum=1)
+        schema['prefetch_connect'] = config.Boolean()
+        schema['workers'] = config.Integer(minimum=0)
+        schema['trace'] = config.Boolean()
 
         return schema
 
@@ -41,6 +61,11 @@ class Extension(ext.Extension):
         from .backend import RadioBrowserBackend
         registry.add("backend", RadioBrowserBackend)
 
+        # Prometheus metrics at /radiobrowser/metrics, served if Mopidy-HTTP
+        # is enabled
+        from .metrics import http_app
+        registry.add("http:app", {"name": self.ext_name, "factory": http_app})
+
         # TODO: Edit or remove entirely
         # registry.add(
         #     "http:static",
@@ -1,28 +1,66 @@
 from __future__ import unicode_literals
 
 import logging
+import pathlib
 from mopidy import backend, httpclient
 from mopidy.audio import scan
 import pykka
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
 import mopidy_radiobrowser
+from .catalog import Catalog
+from . import metrics, tracing
+from .dispatch import DispatchingInbox
 from .radiobrowser import RadioBrowser
 from .library import RadioBrowserLibrary
 from .playback import RadioBrowserPlayback
+from .resolver import StreamResolver
 
 
 logger = logging.getLogger(__name__)
 
+# Smallest number of connections kept open per host
+POOL_SIZE = 10
 
-def get_requests_session(proxy_config, user_agent):
-    logger.debug('RadioBrowser: Start backend.get_requests_session')
+# Number of hosts connections are kept open for, the mirrors and the
+# servers of the station playlists
+POOL_HOSTS = 20
 
+# A failed connection or an overloaded mirror is retried once after a short
+# pause, before the request fails over to the next mirror. A read timeout
+# is not retried, the next mirror is tried at once.
+RETRIES = 1
+RETRY_BACKOFF = 0.2
+RETRY_STATUS = (502, 503, 504)
+
+
+def get_requests_session(proxy_config, user_agent, pool_size=POOL_SIZE):
     proxy = httpclient.format_proxy(proxy_config)
     full_user_agent = httpclient.format_user_agent(user_agent)
 
     session = requests.Session()
     session.proxies.update({'http': proxy, 'https': proxy})
-    session.headers.update({'user-agent': full_user_agent})
+    # Compressed responses are decoded transparently, br is only asked for
+    # if a brotli module is installed to decode it
+    session.headers.update({
+        'user-agent': full_user_agent,
+        'accept-encoding': make_headers(
+            accept_encoding=True)['accept-encoding'],
+    })
+    retry = Retry(total=RETRIES,
+                  read=False,
+                  backoff_factor=RETRY_BACKOFF,
+                  status_forcelist=RETRY_STATUS,
+                  raise_on_status=False)
+    # Keep-alive connections are reused across requests, with https this
+    # saves the TLS handshake as well
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS,
+                          pool_maxsize=pool_size,
+                          max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
 
     return session
 
@@ -30,22 +68,77 @@ def get_requests_session(proxy_config, user_agent):
 class RadioBrowserBackend(pykka.ThreadingActor, backend.Backend):
     uri_schemes = ['radiobrowser']
 
-    def __init__(self, config, audio):
-        logger.debug('RadioBrowser: Start backend.RadioBrowserBackend.__init__')
+    @staticmethod
+    def _create_actor_inbox():
+        return DispatchingInbox()
 
+    def __init__(self, config, audio):
         super(RadioBrowserBackend, self).__init__()
 
+        # Nothing in here may wait on the disk or the network, that is done
+        # in on_start on the actor's own thread
+        self._config = config
+        tracing.enable(config['radiobrowser']['trace'])
+
+        # Every thread that may talk to the API at once gets a connection
         self._session = get_requests_session(
             proxy_config = config['proxy'],
             user_agent = '%s/%s' % (
                 mopidy_radiobrowser.Extension.dist_name,
-                mopidy_radiobrowser.__version__))
+                mopidy_radiobrowser.__version__),
+            pool_size = max(POOL_SIZE,
+                            config['radiobrowser']['workers']
+                            + config['radiobrowser']['prefetch_workers'] + 2))
 
         self._timeout = config['radiobrowser']['timeout']
 
         self._scanner = scan.Scanner(
             timeout = config['radiobrowser']['timeout'],
             proxy_config = config['proxy'])
-        self.radiobrowser = RadioBrowser(config['radiobrowser']['timeout'], self._session)
+        data_dir = pathlib.Path(config['core']['data_dir']).expanduser() / (
+            mopidy_radiobrowser.Extension.ext_name)
+        catalog = None
+        if config['radiobrowser']['catalog']:
+            catalog = Catalog(data_dir / 'catalog.sqlite3')
+        self.radiobrowser = RadioBrowser(
+            config['radiobrowser']['timeout'],
+            self._session,
+            catalog = catalog,
+            catalogRefresh = config['radiobrowser']['catalog_refresh'],
+            cacheSize = config['radiobrowser']['cache_size'],
+            mirrorCache = data_dir / 'mirrors.json',
+            responseStore = data_dir / 'responses.sqlite3',
+            minStationCount = config['radiobrowser']['min_stationcount'],
+            pageSize = config['radiobrowser']['page_size'],
+            maxStations = config['radiobrowser']['max_stations'],
+            maxDirectories = config['radiobrowser']['max_directories'],
+            searchLimit = config['radiobrowser']['search_limit'],
+            connectTimeout = config['radiobrowser']['connect_timeout'],
+            https = config['radiobrowser']['https'])
+        self.resolver = StreamResolver(
+            self.radiobrowser,
+            self._scanner,
+            cacheSize = config['radiobrowser']['cache_size'],
+            prefetch = config['radiobrowser']['prefetch'],
+            prefetchWorkers = config['radiobrowser']['prefetch_workers'],
+            warmConnections = config['radiobrowser']['prefetch_connect'],
+            timeout = config['radiobrowser']['timeout'])
         self.library = RadioBrowserLibrary(self)
         self.playback = RadioBrowserPlayback(audio=audio, backend=self)
+
+    def on_start(self):
+        # Creates the data directory the catalog and caches are kept in
+        mopidy_radiobrowser.Extension.get_data_dir(self._config)
+        self.radiobrowser.start()
+        metrics.register('radiobrowser', self.radiobrowser.gauges)
+        metrics.register('resolver', self.resolver.gauges)
+        # Network bound calls are served by workers, not the actor thread.
+        # Calls sent before are queued and handled once on_start is done.
+        self.actor_inbox.bind(self, self._config['radiobrowser']['workers'])
+
+    def on_stop(self):
+        metrics.unregister('radiobrowser')
+        metrics.unregister('resolver')
+        self.radiobrowser.stop()
+        self.resolver.stop()
+        self.actor_inbox.close()
@@ -0,0 +1,424 @@
+from __future__ import unicode_literals
+
+import itertools
+import logging
+import sqlite3
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+# The station fields kept in the catalog, in column order
+STATION_FIELDS = (
+    'stationuuid',
+    'changeuuid',
+    'name',
+    'url',
+    'url_resolved',
+    'homepage',
+    'favicon',
+    'tags',
+    'country',
+    'countrycode',
+    'state',
+    'language',
+    'codec',
+    'bitrate',
+    'votes',
+    'clickcount',
+    'lastcheckok',
+    'lastchangetime',
+)
+
+# Increased whenever the tables change, an outdated catalog is dropped and
+# downloaded again
+SCHEMA_VERSION = 2
+
+TABLES = ('meta', 'stations', 'station_tags', 'station_languages',
+          'countries', 'languages', 'tags')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS stations (
+    stationuuid TEXT PRIMARY KEY,
+    changeuuid TEXT,
+    name TEXT,
+    url TEXT,
+    url_resolved TEXT,
+    homepage TEXT,
+    favicon TEXT,
+    tags TEXT,
+    country TEXT,
+    countrycode TEXT,
+    state TEXT,
+    language TEXT,
+    codec TEXT,
+    bitrate INTEGER,
+    votes INTEGER,
+    clickcount INTEGER,
+    lastcheckok INTEGER,
+    lastchangetime TEXT
+);
+CREATE INDEX IF NOT EXISTS stations_country
+    ON stations (countrycode, state);
+CREATE TABLE IF NOT EXISTS station_tags (
+    tag TEXT,
+    stationuuid TEXT
+);
+CREATE INDEX IF NOT EXISTS station_tags_tag ON station_tags (tag);
+CREATE INDEX IF NOT EXISTS station_tags_station
+    ON station_tags (stationuuid);
+CREATE TABLE IF NOT EXISTS station_languages (
+    language TEXT,
+    stationuuid TEXT
+);
+CREATE INDEX IF NOT EXISTS station_languages_language
+    ON station_languages (language);
+CREATE INDEX IF NOT EXISTS station_languages_station
+    ON station_languages (stationuuid);
+CREATE TABLE IF NOT EXISTS countries (
+    name TEXT PRIMARY KEY,
+    stationcount INTEGER
+);
+-- The states of older catalogs, now derived by the country index
+DROP TABLE IF EXISTS states;
+CREATE TABLE IF NOT EXISTS languages (
+    name TEXT PRIMARY KEY,
+    stationcount INTEGER
+);
+CREATE TABLE IF NOT EXISTS tags (
+    name TEXT PRIMARY KEY,
+    stationcount INTEGER
+);
+'''
+
+# A download is written to these tables batch by batch and then moved into
+# the catalog at once, so it never holds the catalog while it is received
+STAGING = '''
+CREATE TEMP TABLE IF NOT EXISTS staged_stations (
+    %s,
+    PRIMARY KEY (stationuuid)
+);
+CREATE TEMP TABLE IF NOT EXISTS staged_tags (
+    tag TEXT,
+    stationuuid TEXT
+);
+CREATE TEMP TABLE IF NOT EXISTS staged_languages (
+    language TEXT,
+    stationuuid TEXT
+);
+''' % ',\n    '.join(STATION_FIELDS)
+
+STAGING_TABLES = ('staged_stations', 'staged_tags', 'staged_languages')
+
+# Number of downloaded stations written to the staging tables at once
+STAGING_BATCH = 500
+
+SELECT_STATIONS = 'SELECT %s FROM stations' % ', '.join(STATION_FIELDS)
+STATION_COLUMNS = ', '.join(STATION_FIELDS)
+
+# Upsert of a station, the records of stations/changed lack some fields and
+# the stored values of these are kept. Appended to an INSERT ... SELECT
+# the 'WHERE true' is needed, see the SQLite upsert documentation.
+UPSERT = (' ON CONFLICT(stationuuid) DO UPDATE SET %s' % ', '.join(
+    '%s = COALESCE(excluded.%s, %s)' % (field, field, field)
+    for field in STATION_FIELDS[1:]))
+
+
+def split_list(value):
+    # Split the comma separated 'tags' and 'language' fields of a station
+    if not value:
+        return []
+    items = [item.strip().lower() for item in value.split(',')]
+    return list(dict.fromkeys(item for item in items if item))
+
+
+class Catalog(object):
+    # Persistent SQLite snapshot of the RadioBrowser station index.
+    #
+    # The catalog is filled once from the complete station list and then kept
+    # current with the stations/changed endpoint. The countries, languages
+    # and tags tables are derived from the stored stations, so they always
+    # match the stations that can be browsed. The states of a country are
+    # derived from its stations by the country index.
+    #
+    # Downloads are staged in small transactions and moved into the catalog
+    # in one short transaction at the end, so queries are not blocked while
+    # the stations are received.
+
+    def __init__(self, path):
+        self._path = str(path)
+        self._lock = threading.RLock()
+        # Serializes the downloads sharing the staging tables
+        self._writeLock = threading.Lock()
+        self._connection = None
+        # Read once, then kept current by replaceStations
+        self._populated = None
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self._path, check_same_thread=False)
+            version = connection.execute('PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                with connection:
+                    for table in TABLES:
+                        connection.execute('DROP TABLE IF EXISTS %s' % table)
+                connection.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+            connection.executescript(SCHEMA)
+            connection.executescript(STAGING)
+            self._connection = connection
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._connect().execute(sql, args).fetchall()
+
+    def getMeta(self, key, default=None):
+        rows = self._query('SELECT value FROM meta WHERE key = ?', (key,))
+        if rows:
+            return rows[0][0]
+        return default
+
+    def setMeta(self, key, value):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                    (key, value))
+
+    def isPopulated(self):
+        # Asked on every browse, so it doesn't wait for the connection
+        if self._populated is None:
+            self._populated = self.getMeta('populated') == '1'
+        return self._populated
+
+    def replaceStations(self, stations):
+        # Replace the whole catalog with a complete station dump, the
+        # stations may be an iterator, an incomplete one leaves the catalog
+        # as it was
+        with self._writeLock:
+            count, latest = self._stageStations(stations)
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    connection.execute('DELETE FROM stations')
+                    connection.execute('DELETE FROM station_tags')
+                    connection.execute('DELETE FROM station_languages')
+                    self._applyStaged(connection, latest)
+                    self._rebuildIndexes(connection)
+                    connection.execute(
+                        'INSERT OR REPLACE INTO meta (key, value) '
+                        'VALUES (\'populated\', \'1\')')
+                self._populated = True
+        logger.info('RadioBrowser: Catalog filled with %d stations', count)
+        return count
+
+    def updateStations(self, stations):
+        # Insert or update the given stations (incremental sync), fields
+        # missing from a record keep their stored value
+        with self._writeLock:
+            count, latest = self._stageStations(stations)
+            if count:
+                with self._lock:
+                    connection = self._connect()
+                    with connection:
+                        connection.execute(
+                            'DELETE FROM station_tags WHERE stationuuid IN '
+                            '(SELECT stationuuid FROM staged_stations '
+                            'WHERE tags IS NOT NULL)')
+                        connection.execute(
+                            'DELETE FROM station_languages WHERE stationuuid '
+                            'IN (SELECT stationuuid FROM staged_stations '
+                            'WHERE language IS NOT NULL)')
+                        self._applyStaged(connection, latest)
+                        self._rebuildIndexes(connection)
+        logger.debug('RadioBrowser: Catalog updated %d stations', count)
+        return count
+
+    def _stageStations(self, stations):
+        # Write the stations to the staging tables, the lock is only held
+        # while a batch is written and not while the next one is received.
+        # Returns the number of stations and the last changed one.
+        count = 0
+        latest = None
+        stations = iter(stations)
+        self._clearStaged()
+        try:
+            while True:
+                received = list(itertools.islice(stations, STAGING_BATCH))
+                if not received:
+                    break
+                batch = [station for station in received
+                         if station.get('stationuuid')]
+                if not batch:
+                    continue
+                with self._lock:
+                    connection = self._connect()
+                    with connection:
+                        self._storeBatch(connection, batch)
+                count += len(batch)
+                for station in batch:
+                    if latest is None or (
+                            station.get('lastchangetime') or '') >= (
+                            latest.get('lastchangetime') or ''):
+                        latest = station
+        except BaseException:
+            self._clearStaged()
+            raise
+        return count, latest
+
+    def _storeBatch(self, connection, stations):
+        # The tags and languages are only replaced if the record has them
+        tagged = [station for station in stations
+                  if station.get('tags') is not None]
+        spoken = [station for station in stations
+                  if station.get('language') is not None]
+        connection.executemany(
+            'DELETE FROM staged_tags WHERE stationuuid = ?',
+            [(station['stationuuid'],) for station in tagged])
+        connection.executemany(
+            'DELETE FROM staged_languages WHERE stationuuid = ?',
+            [(station['stationuuid'],) for station in spoken])
+        connection.executemany(
+            'INSERT INTO staged_stations (%s) VALUES (%s)' % (
+                STATION_COLUMNS, ', '.join('?' * len(STATION_FIELDS)))
+            + UPSERT,
+            [[station.get(field) for field in STATION_FIELDS]
+             for station in stations])
+        connection.executemany(
+            'INSERT INTO staged_tags (tag, stationuuid) VALUES (?, ?)',
+            [(tag, station['stationuuid']) for station in tagged
+             for tag in split_list(station['tags'])])
+        connection.executemany(
+            'INSERT INTO staged_languages (language, stationuuid) '
+            'VALUES (?, ?)',
+            [(language, station['stationuuid']) for station in spoken
+             for language in split_list(station['language'])])
+
+    def _applyStaged(self, connection, latest):
+        # Move the staged stations into the catalog, inside the caller's
+        # transaction
+        connection.execute(
+            'INSERT INTO stations (%s) SELECT %s FROM staged_stations '
+            'WHERE true' % (STATION_COLUMNS, STATION_COLUMNS) + UPSERT)
+        connection.execute(
+            'INSERT INTO station_tags (tag, stationuuid) '
+            'SELECT tag, stationuuid FROM staged_tags')
+        connection.execute(
+            'INSERT INTO station_languages (language, stationuuid) '
+            'SELECT language, stationuuid FROM staged_languages')
+        for table in STAGING_TABLES:
+            connection.execute('DELETE FROM %s' % table)
+        # Remember where the next incremental update has to start
+        if latest is not None and latest.get('changeuuid'):
+            connection.execute(
+                'INSERT OR REPLACE INTO meta (key, value) '
+                'VALUES (\'lastchangeuuid\', ?)', (latest['changeuuid'],))
+
+    def _clearStaged(self):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                for table in STAGING_TABLES:
+                    connection.execute('DELETE FROM %s' % table)
+
+    def _rebuildIndexes(self, connection):
+        connection.execute('DELETE FROM countries')
+        connection.execute(
+            'INSERT INTO countries (name, stationcount) '
+            'SELECT countrycode, COUNT(*) FROM stations '
+            'WHERE countrycode != \'\' GROUP BY countrycode')
+        connection.execute('DELETE FROM languages')
+        connection.execute(
+            'INSERT INTO languages (name, stationcount) '
+            'SELECT language, COUNT(*) FROM station_languages '
+            'GROUP BY language')
+        connection.execute('DELETE FROM tags')
+        connection.execute(
+            'INSERT INTO tags (name, stationcount) '
+            'SELECT tag, COUNT(*) FROM station_tags GROUP BY tag')
+
+    def _stations(self, sql, args=()):
+        return [dict(zip(STATION_FIELDS, row))
+                for row in self._query(SELECT_STATIONS + sql, args)]
+
+    def countries(self):
+        return [{'name': name, 'stationcount': stationcount}
+                for name, stationcount in self._query(
+                    'SELECT name, stationcount FROM countries ORDER BY name')]
+
+    def languages(self, minCount=1, limit=-1, offset=0):
+        return self._listing('languages', minCount, limit, offset)
+
+    def tags(self, minCount=1, limit=-1, offset=0):
+        return self._listing('tags', minCount, limit, offset)
+
+    def _listing(self, table, minCount, limit, offset):
+        # Ordered like the paged API listings, most used entries first
+        return [{'name': name, 'stationcount': stationcount}
+                for name, stationcount in self._query(
+                    'SELECT name, stationcount FROM %s '
+                    'WHERE stationcount >= ? '
+                    'ORDER BY stationcount DESC, name '
+                    'LIMIT ? OFFSET ?' % table, (minCount, limit, offset))]
+
+    def station(self, stationId):
+        stations = self._stations(' WHERE stationuuid = ?', (stationId,))
+        if stations:
+            return stations[0]
+        return None
+
+    def stationsByUuid(self, stationIds):
+        stations = []
+        stationIds = list(stationIds)
+        # Stay below SQLite's limit of host parameters
+        for i in range(0, len(stationIds), 500):
+            batch = stationIds[i:i + 500]
+            stations.extend(self._stations(
+                ' WHERE stationuuid IN (%s)' % ', '.join('?' * len(batch)),
+                batch))
+        return stations
+
+    def allStations(self, batchSize=1000):
+        # Iterate over all stations without loading them at once
+        offset = 0
+        while True:
+            stations = self._stations(
+                ' ORDER BY stationuuid LIMIT ? OFFSET ?', (batchSize, offset))
+            yield from stations
+            if len(stations) < batchSize:
+                return
+            offset += batchSize
+
+    def topClicked(self, limit):
+        return self._stations(' ORDER BY clickcount DESC LIMIT ?', (limit,))
+
+    def topVoted(self, limit):
+        return self._stations(' ORDER BY votes DESC LIMIT ?', (limit,))
+
+    def stationsByTag(self, tag):
+        return self._stations(
+            ' WHERE stationuuid IN '
+            '(SELECT stationuuid FROM station_tags WHERE tag = ?) '
+            'ORDER BY name', (tag.strip().lower(),))
+
+    def stationsByLanguage(self, language):
+        return self._stations(
+            ' WHERE stationuuid IN '
+            '(SELECT stationuuid FROM station_languages WHERE language = ?) '
+            'ORDER BY name', (language.strip().lower(),))
+
+    def stationsByCountry(self, countrycode):
+        return self._stations(
+            ' WHERE countrycode = ? ORDER BY name', (countrycode,))
+
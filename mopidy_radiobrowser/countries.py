@@ -0,0 +1,84 @@
+from __future__ import unicode_literals
+
+import collections
+import gettext
+import locale
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+# ISO 3166 data of a country, 'translated' is the name in the user's language
+Country = collections.namedtuple(
+    'Country', ('alpha2', 'alpha3', 'name', 'official', 'translated'))
+
+# gettext domains of the country names, older pycountry releases used the
+# one without the part number
+TRANSLATION_DOMAINS = ('iso3166-1', 'iso3166')
+
+_lock = threading.Lock()
+_tables = {}
+
+
+def current_language():
+    try:
+        return locale.getlocale()[0]
+    except ValueError:
+        return None
+
+
+def _translation(localesDir, language):
+    languages = [language] if language else None
+    for domain in TRANSLATION_DOMAINS:
+        try:
+            return gettext.translation(domain, localesDir, languages=languages)
+        except OSError:
+            continue
+    return gettext.NullTranslations()
+
+
+def _build(language):
+    # pycountry parses its database on first use, so it is only imported
+    # when a country name is needed for the first time
+    import pycountry
+
+    translation = _translation(pycountry.LOCALES_DIR, language)
+    table = {}
+    for country in pycountry.countries:
+        table[country.alpha_2] = Country(
+            country.alpha_2,
+            country.alpha_3,
+            country.name,
+            getattr(country, 'official_name', country.name),
+            translation.gettext(country.name))
+    logger.debug('RadioBrowser: Country table for %s built', language)
+    return table
+
+
+def country_table(language=None):
+    # alpha-2 code to Country, built once per language
+    if language is None:
+        language = current_language()
+    with _lock:
+        table = _tables.get(language)
+        if table is None:
+            table = _tables[language] = _build(language)
+        return table
+
+
+def country_info(alpha2, language=None):
+    # Unknown codes, e.g. the API's placeholders, keep the code as name
+    alpha2 = alpha2.strip()
+    country = country_table(language).get(alpha2.upper())
+    if country is None:
+        return Country(alpha2, '??', alpha2, alpha2, alpha2)
+    return country
+
+
+def sort_key(name):
+    # Orders names by the rules of the user's locale
+    try:
+        return locale.strxfrm(name)
+    except (ValueError, OSError):
+        return name.casefold()
@@ -0,0 +1,113 @@
+from __future__ import unicode_literals
+
+import functools
+import logging
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pykka import messages
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Provider methods that wait on the network and are run on the worker pool.
+# Core doesn't call translate_uri, it calls change_track, which resolves
+# the stream with translate_uri.
+DISPATCHED_CALLS = frozenset([
+    ('library', 'browse'),
+    ('library', 'search'),
+    ('library', 'lookup'),
+    ('library', 'get_images'),
+    ('playback', 'change_track'),
+])
+
+
+def call_key(message):
+    # Identical calls have the same key, the arguments may be unhashable
+    return repr((message.attr_path, message.args,
+                 sorted(message.kwargs.items())))
+
+
+def copy_result(result):
+    # Coalesced callers get their own list or dict, the models are immutable
+    if isinstance(result, (list, dict)):
+        return type(result)(result)
+    return result
+
+
+class DispatchingInbox(queue.Queue):
+    # Actor inbox that runs the network bound provider calls on a pool.
+    #
+    # Pykka handles an actor's messages one after another, so one slow mirror
+    # would stall every other client. The calls in DISPATCHED_CALLS are taken
+    # out of the inbox as they are sent and run on worker threads, everything
+    # else is still handled by the actor's own thread. Identical calls that
+    # are in flight at the same time share one execution.
+
+    def __init__(self):
+        super(DispatchingInbox, self).__init__()
+        self._actor = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def bind(self, actor, workers):
+        # Until the inbox is bound, or with no workers, every message is
+        # handled by the actor thread
+        if workers > 0:
+            self._actor = actor
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix='RadioBrowserWorker')
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def put(self, envelope, block=True, timeout=None):
+        message = envelope.message
+        if (envelope.reply_to is not None
+                and isinstance(message, messages.ProxyCall)
+                and tuple(message.attr_path) in DISPATCHED_CALLS):
+            with self._lock:
+                if self._executor is not None:
+                    self._dispatch(envelope)
+                    return
+        super(DispatchingInbox, self).put(envelope, block, timeout)
+
+    def _dispatch(self, envelope):
+        key = call_key(envelope.message)
+        waiting = self._inflight.get(key)
+        if waiting is not None:
+            waiting.append(envelope.reply_to)
+            return
+        self._inflight[key] = [envelope.reply_to]
+        self._executor.submit(self._run, key, envelope.message,
+                              time.monotonic())
+
+    def _run(self, key, message, queued):
+        metrics.observe('radiobrowser_dispatch_wait_seconds',
+                        time.monotonic() - queued,
+                        call='.'.join(message.attr_path))
+        try:
+            callee = functools.reduce(getattr, message.attr_path, self._actor)
+            result = callee(*message.args, **message.kwargs)
+            error = None
+        except Exception:
+            logger.info('RadioBrowser: %s failed', '.'.join(message.attr_path),
+                        exc_info=True)
+            error = sys.exc_info()
+        with self._lock:
+            futures = self._inflight.pop(key)
+        for i, future in enumerate(futures):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set(result if i == 0 else copy_result(result))
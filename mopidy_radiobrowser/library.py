@@ -3,83 +3,98 @@ from __future__ import unicode_literals
 import logging
 from mopidy import backend
 from mopidy.models import Ref, SearchResult, Image
-from mopidy_radiobrowser import translator
+from mopidy_radiobrowser import countries as iso_countries
+from mopidy_radiobrowser import metrics, tracing, translator
+from mopidy_radiobrowser.radiobrowser import Registry
 
 
 logger = logging.getLogger(__name__)
 
+# Number of station refs kept for repeated browsing, enough for the
+# largest listings
+REF_CACHE_SIZE = 20000
+
+# Number of station tracks kept for repeated searches and lookups
+TRACK_CACHE_SIZE = 5000
+
 
 class RadioBrowserLibrary(backend.LibraryProvider):
     root_directory = Ref.directory(uri='radiobrowser:root', name='RadioBrowser')
 
     def __init__(self, backend):
-        logger.debug('RadioBrowser: Start backend.RadioBrowserLibrary.__init__')
-
         super(RadioBrowserLibrary, self).__init__(backend)
+        self._refs = Registry(REF_CACHE_SIZE)
+        self._tracks = Registry(TRACK_CACHE_SIZE)
 
     def browse(self, uri):
-        logger.debug('RadioBrowser: Start backend.RadioBrowserLibrary.browse')
+        with tracing.span('browse', uri=uri) as span, metrics.timer(
+                'radiobrowser_library_seconds', call='browse'):
+            result, stations = self._browse(uri)
+            span.set(entries=len(result))
+        if stations:
+            # The registered records are at hand, the resolver only queues
+            # the first ones on its pool
+            self.backend.resolver.prefetch(stations)
+        return result
 
+    def _browse(self, uri):
+        # Returns the refs and the stations among them, in their order
         result = []
+        stations = []
         variant, identifier = translator.parse_uri(uri)
-        logger.debug('RadioBrowser: Browsing %s' % uri)
         if variant == 'root':
             # root list: all categies
             for category in self.backend.radiobrowser.getCategories():
                 result.append(translator.category_to_ref(category))
         elif "category" == variant:
+            # Paged listings have the page number appended
+            identifier, _, page = identifier.partition(':')
+            page = int(page) if page.isdigit() else 0
             if "countries" == identifier:
                 countries = self.backend.radiobrowser.browseCategory(identifier)
                 for country in countries:
                     translator.country_add_name(country)
-                for country in sorted(countries, key = lambda i: i['translated_name']):
+                for country in sorted(countries, key = lambda i: iso_countries.sort_key(i['translated_name'])):
                     ret = self.backend.radiobrowser.addCountry(country)
                     if True == ret:
                         result.append(translator.country_to_ref(country))
             elif "languages" == identifier:
-                languages = self.backend.radiobrowser.browseCategory(identifier)
-                for language in languages:
-                    ret = self.backend.radiobrowser.addLanguage(language)
-                    if True == ret:
-                        result.append(translator.language_to_ref(language))
+                languages = list(self.backend.radiobrowser.iterCategory(identifier, page))
+                addLanguage = self.backend.radiobrowser.addLanguage
+                result.extend(translator.directories_to_refs(
+                    'language', [lang for lang in languages if addLanguage(lang)]))
+                if self.backend.radiobrowser.isPageFull(len(languages)):
+                    result.append(translator.page_to_ref(identifier, page + 1))
             elif "tags" == identifier:
-                tags = self.backend.radiobrowser.browseCategory(identifier)
-                for tag in tags:
-                    ret = self.backend.radiobrowser.addTag(tag)
-                    if True == ret:
-                        result.append(translator.tag_to_ref(tag))
-            elif "clicks" == identifier:
-                stations = self.backend.radiobrowser.browseCategory(identifier)
-                for station in stations:
-                    ret = self.backend.radiobrowser.addStation(station)
-                    if True == ret:
-                        result.append(translator.station_to_ref(station))
-            elif "votes" == identifier:
-                stations = self.backend.radiobrowser.browseCategory(identifier)
-                for station in stations:
-                    ret = self.backend.radiobrowser.addStation(station)
-                    if True == ret:
-                        result.append(translator.station_to_ref(station))
+                tags = list(self.backend.radiobrowser.iterCategory(identifier, page))
+                addTag = self.backend.radiobrowser.addTag
+                result.extend(translator.directories_to_refs(
+                    'tag', [tag for tag in tags if addTag(tag)]))
+                if self.backend.radiobrowser.isPageFull(len(tags)):
+                    result.append(translator.page_to_ref(identifier, page + 1))
+            elif identifier in ("clicks", "votes"):
+                stations = self.backend.radiobrowser.addStations(
+                    self.backend.radiobrowser.browseCategory(identifier))
+                result.extend(translator.stations_to_refs(stations, self._refs))
             else:
                 logger.debug('RadioBrowser: Unknown URI: %s', uri)
         elif variant == "tag" and identifier:
             tag = self.backend.radiobrowser.getTag(identifier)
-            stations = self.backend.radiobrowser.stations(tag)
-            for station in stations:
-                self.backend.radiobrowser.addStation(station)
-                result.append(translator.station_to_ref(station))
+            stations = self.backend.radiobrowser.addStations(
+                self.backend.radiobrowser.stations(tag))
+            result.extend(translator.stations_to_refs(stations, self._refs))
         elif variant == "language" and identifier:
             language = self.backend.radiobrowser.getLanguage(identifier)
-            stations = self.backend.radiobrowser.stations(language)
-            for station in stations:
-                self.backend.radiobrowser.addStation(station)
-                result.append(translator.station_to_ref(station))
+            stations = self.backend.radiobrowser.addStations(
+                self.backend.radiobrowser.stations(language))
+            result.extend(translator.stations_to_refs(stations, self._refs))
         elif variant == "country" and identifier:
             country = self.backend.radiobrowser.getCountry(identifier)
             states = self.backend.radiobrowser.browseDirectory(country)
             emptyState = {
                 'name': country['a2'],
                 'country': country['a2'],
+                'countrycode': country['a2'],
                 'stationcount' : 1
                 }
             states.append(emptyState)
@@ -89,25 +104,37 @@ class RadioBrowserLibrary(backend.LibraryProvider):
                     result.append(translator.state_to_ref(state))
         elif variant == "state" and identifier:
             state = self.backend.radiobrowser.getState(identifier)
-            stations = self.backend.radiobrowser.stations(state)
-            for station in stations:
-                if (state['name'] == state['country']):
-                    if ('' == station['state']):
-                        continue
-                self.backend.radiobrowser.addStation(station)
-                result.append(translator.station_to_ref(station))
+            stations = self.backend.radiobrowser.addStations(
+                self.backend.radiobrowser.stations(state))
+            result.extend(translator.stations_to_refs(stations, self._refs))
         else:
             logger.debug('RadioBrowser: Unknown URI: %s', uri)
 
-        return result
+        return result, stations
 
     def refresh(self, uri=None):
-        logger.debug('RadioBrowser: Start backend.RadioBrowserLibrary.refresh')
-
         self.backend.radiobrowser.reload()
-
-    def lookup(self, uri):
-        logger.debug('RadioBrowser: Start backend.RadioBrowserLibrary.lookup')
+        self.backend.resolver.clear()
+        self._refs.clear()
+        self._tracks.clear()
+
+    def lookup(self, uri=None, uris=None):
+        with metrics.timer('radiobrowser_library_seconds', call='lookup'):
+            return self._lookup(uri, uris)
+
+    def _lookup(self, uri, uris):
+        if uris is not None:
+            # Multi-URI form: {uri: [track]} resolved with batched requests
+            stations = self._stations(uris)
+            with tracing.span('translate', entries=len(stations)), \
+                    metrics.timer('radiobrowser_translate_seconds'):
+                found = [uri for uri in uris if uri in stations]
+                tracks = translator.stations_to_tracks(
+                    [stations[uri] for uri in found], self._tracks)
+                result = {uri: [] for uri in uris}
+                result.update((uri, [track])
+                              for uri, track in zip(found, tracks))
+                return result
 
         variant, identifier = translator.parse_uri(uri)
         if variant != 'station':
@@ -116,57 +143,63 @@ class RadioBrowserLibrary(backend.LibraryProvider):
         if not station:
             return []
 
-        track = translator.station_to_track(station)
-        return [track]
+        return translator.stations_to_tracks([station], self._tracks)
 
     def search(self, query=None, uris=None, exact=False):
-        logger.debug('RadioBrowser: Start backend.RadioBrowserLibrary.search')
+        with metrics.timer('radiobrowser_library_seconds', call='search'):
+            return self._search(query, uris, exact)
 
+    def _search(self, query, uris, exact):
         if query is None or not query:
             return
         radiobrowser_query = translator.mopidy_to_radiobrowser_query(query)
-        tracks = []
-        stations = self.backend.radiobrowser.search(radiobrowser_query)
-        for station in stations:
-            self.backend.radiobrowser.addStation(station)
-            track = translator.station_to_track(station)
-            tracks.append(track)
+        directories = self._searchDirectories(uris)
+        stations = self.backend.radiobrowser.search(
+            radiobrowser_query, exact, directories)
+        with tracing.span('translate', entries=len(stations)), \
+                metrics.timer('radiobrowser_translate_seconds'):
+            tracks = translator.stations_to_tracks(stations, self._tracks)
         return SearchResult(uri='radiobrowser:search', tracks=tracks)
+
+    def _searchDirectories(self, uris):
+        # The directories the search is limited to, None for no limit
+        if not uris:
+            return None
+        getters = {'tag': self.backend.radiobrowser.getTag,
+                   'language': self.backend.radiobrowser.getLanguage,
+                   'country': self.backend.radiobrowser.getCountry,
+                   'state': self.backend.radiobrowser.getState}
+        directories = []
+        for uri in uris:
+            variant, identifier = translator.parse_uri(uri)
+            if variant in ('root', 'category'):
+                return None
+            if variant in getters and identifier:
+                directory = getters[variant](identifier)
+                if directory:
+                    directories.append(directory)
+        return directories
     
     def get_images(self, uris):
-        logger.debug('RadioBrowser: Start backend.RadioBrowserLibrary.get_images')
+        with metrics.timer('radiobrowser_library_seconds', call='get_images'):
+            return self._get_images(uris)
 
+    def _get_images(self, uris):
         result = {}
-        for uri in uris:
-            variant, identifier = translator.parse_uri(uri)
-            if variant != 'station':
-                continue
-
-            station = self.backend.radiobrowser.getStation(identifier)
-            if not station:
-                continue
-            
-            result[uri] = [Image(uri=station.get('favicon'))]
+        for uri, station in self._stations(uris).items():
+            if station.favicon:
+                result[uri] = [Image(uri=station.favicon)]
         return result
 
+    def _stations(self, uris):
+        # Map the station URIs to their stations, fetching unknown ones at once
+        identifiers = {}
+        for uri in uris:
+            variant, identifier = translator.parse_uri(uri)
+            if variant == 'station' and identifier:
+                identifiers[uri] = identifier
+        stations = self.backend.radiobrowser.getStations(identifiers.values())
+        return {uri: stations[identifier]
+                for uri, identifier in identifiers.items()
+                if identifier in stations}
 
-class RadioBrowserPlayback(backend.PlaybackProvider):
-
-    def translate_uri(self, uri):
-        logger.debug('RadioBrowser: Start backend.RadioBrowserPlayback.translate_uri')
-
-        identifier = translator.parse_uri(uri)
-        if identifier[0] == 'station':
-            station = self.backend.radiobrowser.getStation(identifier[1])
-        else:
-            station = self.backend.radiobrowser.getStation(identifier[0])
-        if not station:
-            return None
-        stream_uris = self.backend.radiobrowser.tune(station)
-        while stream_uris:
-            uri = stream_uris.pop(0)
-            logger.debug('RadioBrowser: Looking up URI: %s.' % uri)
-            if uri:
-                return uri
-        logger.debug('RadioBrowser: RadioBrowser lookup failed.')
-        return None
@@ -0,0 +1,196 @@
+from __future__ import unicode_literals
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Type and help text of every metric, in the order they are exposed
+METRICS = (
+    ('radiobrowser_api_requests_total', 'counter',
+     'API requests by endpoint and HTTP status, "error" if none was received.'),
+    ('radiobrowser_api_request_seconds', 'histogram',
+     'Time until the API response headers were received.'),
+    ('radiobrowser_api_read_seconds', 'histogram',
+     'Time spent decoding API responses, streamed ones include their '
+     'download.'),
+    ('radiobrowser_api_bytes_total', 'counter',
+     'Bytes of API responses and playlists received.'),
+    ('radiobrowser_cache_hits_total', 'counter',
+     'Lookups answered from a cache.'),
+    ('radiobrowser_cache_misses_total', 'counter',
+     'Lookups not found in a cache.'),
+    ('radiobrowser_cache_entries', 'gauge',
+     'Entries kept in a cache.'),
+    ('radiobrowser_registry_entries', 'gauge',
+     'Stations and directories kept in memory.'),
+    ('radiobrowser_flight_calls_total', 'counter',
+     'API requests made for concurrent identical requests.'),
+    ('radiobrowser_flight_coalesced_total', 'counter',
+     'Requests that waited for an identical request in flight.'),
+    ('radiobrowser_library_seconds', 'histogram',
+     'Time to serve a library or playback call.'),
+    ('radiobrowser_translate_seconds', 'histogram',
+     'Time to translate stations to Mopidy tracks.'),
+    ('radiobrowser_dispatch_wait_seconds', 'histogram',
+     'Time a dispatched call waited for a worker.'),
+    ('radiobrowser_resolve_total', 'counter',
+     'Stream resolutions by result.'),
+    ('radiobrowser_resolve_seconds', 'histogram',
+     'Time to resolve the stream URL of a station.'),
+)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_collectors = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    index = bisect.bisect_left(BUCKETS, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            # Count per bucket and the overflow, then the sum
+            histogram = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        histogram[index] += 1
+        histogram[-1] += value
+
+
+@contextmanager
+def timer(name, **labels):
+    # Use as 'with metrics.timer('radiobrowser_library_seconds', call=...):'
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(iterable, name, **labels):
+    # Yields the items and observes the time spent producing them, without
+    # the time the caller takes for each item
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        observe(name, elapsed, **labels)
+
+
+def register(key, collector):
+    # The collector returns (name, labels, value) of values that are read
+    # when the metrics are exposed, like the size of a cache. A collector
+    # registered again under the same key replaces the old one.
+    with _lock:
+        _collectors[key] = collector
+
+
+def unregister(key):
+    with _lock:
+        _collectors.pop(key, None)
+
+
+def clear():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _collectors.clear()
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _sample(name, labels, value):
+    if labels:
+        name += '{%s}' % ','.join('%s="%s"' % (label, _escape(labelValue))
+                                  for label, labelValue in labels)
+    return '%s %s' % (name, _number(value))
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else '%d' % value
+    return '%d' % value
+
+
+def exposition():
+    # All metrics in the Prometheus text format
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+        collectors = list(_collectors.values())
+    for collector in collectors:
+        for name, labels, value in collector():
+            counters[_key(name, labels)] = value
+
+    lines = []
+    for name, kind, text in METRICS:
+        if kind == 'histogram':
+            samples = _histogramSamples(name, histograms)
+        else:
+            samples = [_sample(name, labels, value)
+                       for (sampleName, labels), value
+                       in sorted(counters.items()) if sampleName == name]
+        if samples:
+            lines.append('# HELP %s %s' % (name, text))
+            lines.append('# TYPE %s %s' % (name, kind))
+            lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+def _histogramSamples(name, histograms):
+    samples = []
+    for (sampleName, labels), histogram in sorted(histograms.items()):
+        if sampleName != name:
+            continue
+        count = 0
+        for bound, bucketCount in zip(BUCKETS + ('+Inf',), histogram):
+            count += bucketCount
+            le = bound if bound == '+Inf' else repr(bound)
+            samples.append(_sample(name + '_bucket',
+                                   labels + (('le', le),), count))
+        samples.append(_sample(name + '_sum', labels, float(histogram[-1])))
+        samples.append(_sample(name + '_count', labels, count))
+    return samples
+
+
+def http_app(config, core):
+    # Factory of the Mopidy-HTTP app serving /radiobrowser/metrics
+    import tornado.web
+
+    class MetricsHandler(tornado.web.RequestHandler):
+
+        def get(self):
+            self.set_header('Content-Type', CONTENT_TYPE)
+            self.set_header('Cache-Control', 'no-cache')
+            self.write(exposition())
+
+    return [(r'/metrics', MetricsHandler)]
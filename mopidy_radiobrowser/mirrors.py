@@ -0,0 +1,232 @@
+from __future__ import unicode_literals
+
+import json
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+
+logger = logging.getLogger(__name__)
+
+# DNS name listing all RadioBrowser API servers
+DISCOVERY_NAME = 'all.api.radio-browser.info'
+
+# Used until the first discovery has succeeded and nothing was cached on disk
+DEFAULT_HOSTS = [
+    'de1.api.radio-browser.info',
+    'nl1.api.radio-browser.info',
+    'at1.api.radio-browser.info',
+]
+
+# Endpoint used to check the health and latency of a mirror
+PROBE_PATH = '/json/stats'
+
+# Seconds a failed mirror is skipped, doubled for each further failure
+FAILURE_BACKOFF = 30
+MAX_FAILURE_BACKOFF = 600
+
+# Seconds until a failed discovery is retried, doubled for each further
+# failure, and until the mirrors are discovered and probed again
+DISCOVERY_RETRY = 30
+MAX_DISCOVERY_RETRY = 600
+REDISCOVERY_INTERVAL = 3600
+
+# Weight of a new latency sample in the moving average
+LATENCY_WEIGHT = 0.3
+
+
+class Mirror(object):
+    # Health and latency state of one API server
+
+    def __init__(self, host, latency=None):
+        self.host = host
+        self.latency = latency
+        self.failures = 0
+        self.retryAfter = 0
+
+    def isHealthy(self, now):
+        return self.retryAfter <= now
+
+    def sortKey(self):
+        if self.latency is None:
+            return float('inf')
+        return self.latency
+
+
+class MirrorPool(object):
+    # Latency ranked list of RadioBrowser API servers.
+    #
+    # The mirrors are discovered in a background thread, so constructing the
+    # pool never waits on DNS. A failed discovery is retried with a backoff,
+    # for players whose network comes up late, and the mirrors are probed
+    # again from time to time. Requests report their outcome back to the
+    # pool, failing mirrors are skipped for a while and the fastest healthy
+    # mirror is tried first.
+
+    def __init__(self, session, timeout, hosts=None, cachePath=None,
+                 clock=time.monotonic, scheme='http://'):
+        self._session = session
+        self._timeout = timeout
+        self._scheme = scheme
+        self._cachePath = cachePath
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._discover = not hosts
+        self._loaded = False
+        self._mirrors = [Mirror(host) for host in hosts or DEFAULT_HOSTS]
+
+    def _load(self):
+        # Mirrors ranked by an earlier run, read from the on-disk cache
+        if self._cachePath is None:
+            return []
+        try:
+            with open(str(self._cachePath)) as f:
+                data = json.load(f)
+            return [Mirror(entry['host'], entry.get('latency'))
+                    for entry in data]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug('RadioBrowser: No cached mirror list: %s', e)
+        return []
+
+    def _save(self):
+        if self._cachePath is None:
+            return
+        with self._lock:
+            data = [{'host': m.host, 'latency': m.latency}
+                    for m in self._mirrors]
+        try:
+            with open(str(self._cachePath), 'w') as f:
+                json.dump(data, f)
+        except OSError as e:
+            logger.info('RadioBrowser: Saving mirror list failed: %s', e)
+
+    def start(self):
+        if not self._discover:
+            return
+        if not self._loaded:
+            # The mirrors ranked by the last run replace the defaults
+            self._loaded = True
+            cached = self._load()
+            if cached:
+                with self._lock:
+                    self._mirrors = cached
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name='RadioBrowserMirrors',
+            daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        retry = DISCOVERY_RETRY
+        while not self._stopped.is_set():
+            if self.discover():
+                retry = DISCOVERY_RETRY
+                wait = REDISCOVERY_INTERVAL
+            else:
+                wait = retry
+                retry = min(retry * 2, MAX_DISCOVERY_RETRY)
+                logger.info('RadioBrowser: Retrying mirror discovery in %ds',
+                            wait)
+            if self._stopped.wait(wait):
+                return
+
+    def discover(self):
+        # Returns whether reachable mirrors were found, else the known
+        # mirrors are kept
+        try:
+            hosts = self._resolve()
+        except OSError as e:
+            logger.info('RadioBrowser: Mirror discovery failed: %s', e)
+            return False
+        if not hosts:
+            return False
+        with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+            latencies = list(executor.map(self._probe, hosts))
+        mirrors = [Mirror(host, latency)
+                   for host, latency in zip(hosts, latencies)
+                   if latency is not None]
+        if not mirrors:
+            logger.info('RadioBrowser: No RadioBrowser mirror is reachable')
+            return False
+        mirrors.sort(key=Mirror.sortKey)
+        with self._lock:
+            self._mirrors = mirrors
+        logger.info('RadioBrowser: Using mirrors %s',
+                    ', '.join(m.host for m in mirrors))
+        self._save()
+        return True
+
+    def _resolve(self):
+        ips = socket.getaddrinfo(
+            DISCOVERY_NAME, 80, 0, 0, socket.IPPROTO_TCP)
+        addresses = list(dict.fromkeys(ip_tupel[4][0] for ip_tupel in ips))
+        with ThreadPoolExecutor(max_workers=len(addresses) or 1) as executor:
+            names = list(executor.map(self._reverse, addresses))
+        return list(dict.fromkeys(name for name in names if name))
+
+    def _reverse(self, address):
+        try:
+            return socket.gethostbyaddr(address)[0]
+        except OSError:
+            return None
+
+    def _probe(self, host):
+        start = self._clock()
+        try:
+            with closing(self._session.get(self._scheme + host + PROBE_PATH,
+                                           timeout=self._timeout)) as r:
+                r.raise_for_status()
+        except Exception as e:
+            logger.debug('RadioBrowser: Mirror %s failed probe: %s', host, e)
+            return None
+        return self._clock() - start
+
+    def hosts(self):
+        # All known mirrors, the fastest healthy one first
+        now = self._clock()
+        with self._lock:
+            mirrors = list(self._mirrors)
+        healthy = sorted((m for m in mirrors if m.isHealthy(now)),
+                         key=Mirror.sortKey)
+        failing = sorted((m for m in mirrors if not m.isHealthy(now)),
+                         key=lambda m: m.retryAfter)
+        return [m.host for m in healthy + failing]
+
+    def _find(self, host):
+        for mirror in self._mirrors:
+            if mirror.host == host:
+                return mirror
+        mirror = Mirror(host)
+        self._mirrors.append(mirror)
+        return mirror
+
+    def reportSuccess(self, host, elapsed):
+        with self._lock:
+            mirror = self._find(host)
+            if mirror.latency is None:
+                mirror.latency = elapsed
+            else:
+                mirror.latency += LATENCY_WEIGHT * (elapsed - mirror.latency)
+            mirror.failures = 0
+            mirror.retryAfter = 0
+
+    def reportFailure(self, host):
+        with self._lock:
+            mirror = self._find(host)
+            mirror.failures += 1
+            backoff = min(FAILURE_BACKOFF * 2 ** (mirror.failures - 1),
+                          MAX_FAILURE_BACKOFF)
+            mirror.retryAfter = self._clock() + backoff
+        logger.info('RadioBrowser: Mirror %s failed, skipping it for %ds',
+                    host, backoff)
@@ -2,7 +2,7 @@ from __future__ import unicode_literals
 
 import logging
 from mopidy import backend
-from mopidy_radiobrowser import translator
+from mopidy_radiobrowser import metrics, translator
 
 
 logger = logging.getLogger(__name__)
@@ -11,8 +11,11 @@ logger = logging.getLogger(__name__)
 class RadioBrowserPlayback(backend.PlaybackProvider):
 
     def translate_uri(self, uri):
-        logger.debug('RadioBrowser: Start backend.RadioBrowserPlayback.translate_uri')
+        with metrics.timer('radiobrowser_library_seconds',
+                           call='translate_uri'):
+            return self._translate_uri(uri)
 
+    def _translate_uri(self, uri):
         identifier = translator.parse_uri(uri)
         if identifier[0] == 'station':
             station = self.backend.radiobrowser.getStation(identifier[1])
@@ -20,11 +23,10 @@ class RadioBrowserPlayback(backend.PlaybackProvider):
             station = self.backend.radiobrowser.getStation(identifier[0])
         if not station:
             return None
-        stream_uris = self.backend.radiobrowser.tune(station)
-        while stream_uris:
-            uri = stream_uris.pop(0)
-            logger.debug('RadioBrowser: Looking up URI: %s.' % uri)
-            if uri:
-                return uri
+        uri = self.backend.resolver.resolve(station)
+        self.backend.resolver.prefetchAround(station)
+        if uri:
+            logger.debug('RadioBrowser: Playing URI: %s.', uri)
+            return uri
         logger.debug('RadioBrowser: RadioBrowser lookup failed.')
         return None
@@ -1,6 +1,8 @@
 from __future__ import unicode_literals
 
+import codecs
 import configparser
+import json
 import logging
 import re
 import time
@@ -9,8 +11,17 @@ from collections import OrderedDict
 from contextlib import closing
 import requests
 import io
-import socket
+import itertools
+import threading
+from urllib.parse import urlencode
 import xml.etree.ElementTree as elementtree
+from . import metrics, tracing
+from .mirrors import MirrorPool
+from .search import SearchIndex
+from .station import Station
+from .uris import parse_state_id, quote_name, state_id, unquote_name
+from .validators import (
+    ValidatorStore, conditional_headers, response_validators)
 
 # Constants
 PREFIX_COUNTRY = 'country-'
@@ -18,6 +29,95 @@ PREFIX_STATE = 'state-'
 PREFIX_LANGUAGE = 'language-'
 PREFIX_TAG = 'tag-'
 
+# Number of stations in the 'Top 50' categories
+TOP_LIMIT = 50
+
+# Categories ordered by station count and browsed page by page
+PAGED_CATEGORIES = ('tags', 'languages')
+
+# Categories asked from the API even with the catalog, as the click and
+# vote counts change all the time and the catalog syncs only the changed
+# stations. The catalog is used if the API fails.
+TOP_CATEGORIES = ('clicks', 'votes')
+
+# Time to live (seconds) of cached responses per endpoint class, the
+# complete station dump and the change list are only used by the catalog
+RESPONSE_TTLS = (
+    (re.compile(r'/json/stations/top(click|vote)/'), 300),
+    (re.compile(r'/json/stations(/changed)?/?$'), 0),
+    # Kept as a CountryIndex instead
+    (re.compile(r'/json/stations/bycountrycodeexact/'), 0),
+    (re.compile(r'/json/(countrycodes|languages|tags|states)(/|$)'), 86400),
+)
+DEFAULT_TTL = 3600
+NEGATIVE_TTL = 60
+
+# Listings that rarely change, once stale they are revalidated with a
+# conditional request instead of being downloaded again
+REVALIDATED = re.compile(r'/json/(countrycodes|languages|tags|states)(/|$)')
+
+# Number of mirrors tried before a request fails
+MAX_MIRROR_ATTEMPTS = 3
+
+# Number of stations requested at once by uuid
+BATCH_SIZE = 100
+
+# Parameters of stations/search for the search query fields
+SEARCH_PARAMETERS = {
+    'any': 'name',
+    'name': 'name',
+    'tag': 'tag',
+    'album': 'tag',
+    'country': 'country',
+    'language': 'language',
+    'codec': 'codec',
+}
+
+# Bytes read at once when a response is decoded while it is downloaded
+STREAM_CHUNK_SIZE = 64 * 1024
+PLAYLIST_TTL = 3600
+MISSING_STATION_TTL = 600
+
+# Number of countries whose states and stations are kept, and for how long
+COUNTRY_INDEX_SIZE = 16
+COUNTRY_INDEX_TTL = 3600
+
+# Bytes of a station URL's body looked at to tell a playlist from a stream
+SNIFF_SIZE = 4 * 1024
+
+# Larger bodies are no playlist, whatever their content-type says
+MAX_PLAYLIST_SIZE = 64 * 1024
+
+# Content-types of the playlist formats that can be parsed
+PLAYLIST_CONTENT_TYPES = (
+    'audio/x-scpls',
+    'audio/scpls',
+    'audio/x-mpegurl',
+    'audio/mpegurl',
+    'application/x-mpegurl',
+    'video/x-ms-asf',
+    'video/x-ms-asx',
+    'audio/x-ms-wax',
+)
+
+# Content-types that are always an audio stream, the body isn't read at all
+STREAM_CONTENT_TYPES = (
+    'application/ogg',
+    'application/vnd.apple.mpegurl',
+)
+
+# Start of a playlist document and the content-type of its format
+PLAYLIST_SIGNATURES = (
+    (b'[playlist]', 'audio/x-scpls'),
+    (b'#extm3u', 'audio/x-mpegurl'),
+    (b'[reference]', 'video/x-ms-asf'),
+    (b'<asx', 'video/x-ms-asf'),
+    # A plain m3u without header is just a list of URLs
+    (b'http://', 'audio/x-mpegurl'),
+    (b'https://', 'audio/x-mpegurl'),
+    (b'mms://', 'audio/x-mpegurl'),
+)
+
 
 logger = logging.getLogger(__name__)
 
@@ -26,55 +126,338 @@ class PlaylistError(Exception):
     pass
 
 
-class cache(object):
-    # TODO: merge this to util library (copied from mopidy-spotify)
-
-    def __init__(self, ctl=0, ttl=3600):
-        logger.debug('RadioBrowser: Start radiobrowser.cache.__init__')
-
-        self.cache = {}
-        self.ctl = ctl
-        self.ttl = ttl
-        self._call_count = 0
-
-    def __call__(self, func):
-        logger.debug('RadioBrowser: Start radiobrowser.cache.__call__')
-
-        def _memoized(*args):
-            logger.debug('RadioBrowser: Start radiobrowser.cache.__call__._memoized')
-
-            now = time.time()
-            try:
-                value, last_update = self.cache[args]
-                age = now - last_update
-                if (self._call_count > self.ctl or age > self.ttl):
-                    self._call_count = 0
-                    raise AttributeError
-                if self.ctl:
-                    self._call_count += 1
-                return value
-
-            except (KeyError, AttributeError):
-                value = func(*args)
-                if value:
-                    self.cache[args] = (value, now)
-                return value
+class IncompleteResponse(Exception):
+    pass
 
-            except TypeError:
-                return func(*args)
 
-        def clear():
-            logger.debug('RadioBrowser: Start radiobrowser.cache.__call__.clear')
+class ResponseCache(object):
+    # Thread safe cache for API and playlist responses.
+    #
+    # The cache holds at most 'maxsize' entries and evicts the least recently
+    # used one when it is full. Every entry expires after its own time to live,
+    # so failures can be cached for a shorter time than successful responses.
+
+    def __init__(self, maxsize=256, clock=time.monotonic):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        # Returns a tuple (found, value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value, ttl):
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'size': len(self._entries)}
+
+
+class Flight(object):
+    # One call in flight, its outcome is shared with the waiting callers
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlight(object):
+    # Thread safe coalescing of identical concurrent calls.
+    #
+    # The first caller of a key runs the call, callers arriving while it is
+    # in flight wait for it and share its result instead of repeating it.
+    # 'coalesced' counts the calls that were saved that way.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def join(self, key):
+        # Returns (flight, leader), the leader has to call leave() when done
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.calls += 1
+            return flight, True
+
+    def leave(self, key, flight, value=None, error=None):
+        with self._lock:
+            del self._flights[key]
+        flight.value = value
+        flight.error = error
+        flight.done.set()
+
+    def do(self, key, function):
+        flight, leader = self.join(key)
+        if not leader:
+            return flight.result()
+        try:
+            value = function()
+        except Exception as e:
+            self.leave(key, flight, error=e)
+            raise
+        self.leave(key, flight, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls,
+                    'coalesced': self.coalesced,
+                    'inflight': len(self._flights)}
+
+
+class Registry(object):
+    # Thread safe mapping of the known stations or directories.
+    #
+    # The registry holds at most 'maxsize' entries and evicts the least
+    # recently used one, so memory stays flat however much is browsed. A
+    # maxsize of 0 disables the limit.
+
+    def __init__(self, maxsize=0, onEvict=None):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._onEvict = onEvict
+        self.maxsize = maxsize
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key, default)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            return value
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._entries[key]
+            self._entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        self.update(((key, value),))
+
+    def update(self, items):
+        # Adds many (key, value) pairs, evicting only once at the end
+        with self._lock:
+            entries = self._entries
+            for key, value in items:
+                entries[key] = value
+                entries.move_to_end(key)
+            if self.maxsize:
+                while len(entries) > self.maxsize:
+                    evicted, _ = entries.popitem(last=False)
+                    if self._onEvict is not None:
+                        self._onEvict(evicted)
+
+    def values(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CountryIndex(object):
+    # The states of one country and the uuids of their stations.
+    #
+    # Built from all stations of the country, fetched with one request or
+    # read from the catalog, so the country and its states are browsed
+    # without further requests. The compact station records are kept, so a
+    # country larger than the station registry isn't looked up again, the
+    # number of indexes is bounded by COUNTRY_INDEX_SIZE. Stations without a
+    # state are left out, of the 'whole country' as well.
+
+    def __init__(self, countrycode, stations):
+        self.countrycode = countrycode
+        # All stations of the country, with or without a state
+        self.total = 0
+        self._stations = OrderedDict()
+        states = {}
+        for station in stations:
+            self.total += 1
+            if not station.state:
+                continue
+            self._stations[station.stationuuid] = station
+            states.setdefault(station.state, []).append(station.stationuuid)
+        self._states = OrderedDict(
+            (name, tuple(states[name])) for name in sorted(states))
+
+    def __len__(self):
+        return len(self._stations)
+
+    def states(self):
+        # The states like the API lists them, with their station counts
+        return [{'name': name,
+                 'country': self.countrycode,
+                 'countrycode': self.countrycode,
+                 'stationcount': len(uuids)}
+                for name, uuids in self._states.items()]
+
+    def stationIds(self, state=None):
+        # The uuids of a state's stations, of the whole country without one
+        if state is None:
+            return tuple(self._stations)
+        return self._states.get(state, ())
+
+    def stations(self, state=None):
+        return [self._stations[uuid] for uuid in self.stationIds(state)]
+
+
+def response_ttl(uri):
+    # Time to live for a cached API response, based on the endpoint
+    path = urlparse(uri).path
+    for endpoint, ttl in RESPONSE_TTLS:
+        if endpoint.search(path):
+            return ttl
+    return DEFAULT_TTL
+
+
+def is_revalidated(uri):
+    return bool(REVALIDATED.search(urlparse(uri).path))
+
+
+def endpoint_name(uri):
+    # The API endpoint of a request without names and arguments, e.g.
+    # 'stations/bytagexact' for /json/stations/bytagexact/jazz
+    parts = urlparse(uri).path.split('/')[2:]
+    if len(parts) > 1 and parts[0] == 'stations' and parts[1]:
+        return 'stations/' + parts[1]
+    return parts[0] if parts and parts[0] else 'other'
+
+
+def response_size(r):
+    # Bytes received for a response, compressed ones as they were sent
+    try:
+        return int(r.raw.tell())
+    except (AttributeError, TypeError, ValueError, OSError):
+        return 0
 
-            self.cache.clear()
 
-        _memoized.clear = clear
-        return _memoized
+def station_count(entry):
+    # The API used to return the station count as a string
+    try:
+        return int(entry.get('stationcount', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def copy_response(value):
+    # Callers enrich the returned entries, keep the cached ones untouched
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item
+                for item in value]
+    return value
+
+
+def iter_json_array(chunks, encoding='utf-8'):
+    # Decode a JSON array from an iterable of byte chunks and yield its
+    # elements as soon as they are complete, without keeping the whole
+    # document in memory.
+    decoder = json.JSONDecoder()
+    textDecoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    exhausted = False
+    started = False
+
+    def read():
+        nonlocal buffer, pos, exhausted
+        for chunk in chunks:
+            text = textDecoder.decode(chunk)
+            if text:
+                buffer = buffer[pos:] + text
+                pos = 0
+                return True
+        buffer = buffer[pos:] + textDecoder.decode(b'', final=True)
+        pos = 0
+        exhausted = True
+        return False
+
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace()
+                                     or (started and buffer[pos] == ',')):
+            pos += 1
+        if pos >= len(buffer):
+            if exhausted:
+                raise ValueError('Unexpected end of JSON array')
+            read()
+            continue
+        if not started:
+            if buffer[pos] != '[':
+                raise ValueError('JSON document is not an array')
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+            read()
+            continue
+        if end == len(buffer) and not exhausted:
+            # A number could continue in the next chunk
+            read()
+            continue
+        pos = end
+        yield item
 
 
 def parse_m3u(data):
-    logger.debug('RadioBrowser: Start radiobrowser.parse_m3u')
-
     # Copied from mopidy.audio.playlists
     # Mopidy version expects a header but it's not always present
     for line in data.readlines():
@@ -83,8 +466,6 @@ def parse_m3u(data):
 
 
 def parse_pls(data):
-    logger.debug('RadioBrowser: Start radiobrowser.parse_pls')
-
     # Copied from mopidy.audio.playlists
     try:
         cp = configparser.RawConfigParser()
@@ -108,14 +489,10 @@ def parse_pls(data):
 
 
 def fix_asf_uri(uri):
-    logger.debug('RadioBrowser: Start radiobrowser.fix_asf_uri')
-
     return re.sub(r'http://(.+\?mswmext=\.asf)', r'mms://\1', uri, flags=re.IGNORECASE)
 
 
 def parse_old_asx(data):
-    logger.debug('RadioBrowser: Start radiobrowser.parse_old_asx')
-
     try:
         cp = configparser.RawConfigParser()
         cp.readfp(data)
@@ -131,8 +508,6 @@ def parse_old_asx(data):
 
 
 def parse_new_asx(data):
-    logger.debug('RadioBrowser: Start radiobrowser.parse_new_asx')
-
     # Copied from mopidy.audio.playlists
     try:
         for element in elementtree.iterparse(data):
@@ -148,8 +523,6 @@ def parse_new_asx(data):
 
 
 def parse_asx(data):
-    logger.debug('RadioBrowser: Start radiobrowser.parse_asx')
-
     if 'asx' in data.getvalue()[0:50].lower():
         return parse_new_asx(data)
     else:
@@ -172,16 +545,63 @@ def parse_asx(data):
 #     return results
 
 
-def find_playlist_parser(extension, content_type):
-    logger.debug('RadioBrowser: Start radiobrowser.find_playlist_parser')
+def media_type(content_type):
+    # The content-type without parameters like the charset
+    return (content_type or '').split(';')[0].strip().lower()
+
+
+def is_stream_content_type(content_type):
+    # True if the content-type alone says the body is an audio stream
+    if content_type in PLAYLIST_CONTENT_TYPES:
+        return False
+    return (content_type.startswith('audio/')
+            or content_type in STREAM_CONTENT_TYPES)
+
+
+def is_hls(head):
+    # Whether the body starts like an HLS playlist, GStreamer plays these
+    # itself. They are often served as application/x-mpegurl too.
+    head = head.lstrip(codecs.BOM_UTF8 + b' \t\r\n').lower()
+    return head.startswith(b'#extm3u') and b'#ext-x-' in head
+
+
+def sniff_playlist(head):
+    # Returns the content-type of the playlist the body starts with, or None
+    # if the first bytes look like anything else, e.g. audio data or HLS
+    if is_hls(head):
+        return None
+    head = head.lstrip(codecs.BOM_UTF8 + b' \t\r\n').lower()
+    for signature, content_type in PLAYLIST_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head.startswith(b'<?xml') and b'<asx' in head:
+        return 'video/x-ms-asf'
+    return None
+
+
+def read_limited(chunks, limit):
+    # Joins the chunks, None if there are more than limit bytes
+    data = bytearray()
+    for chunk in chunks:
+        data += chunk
+        if len(data) > limit:
+            return None
+    return bytes(data)
 
+
+def find_playlist_parser(extension, content_type):
     extension_map = {'.asx': parse_asx,
                      '.wax': parse_asx,
                      '.m3u': parse_m3u,
                      '.pls': parse_pls}
     content_type_map = {'video/x-ms-asf': parse_asx,
+                        'video/x-ms-asx': parse_asx,
+                        'audio/x-ms-wax': parse_asx,
                         'application/x-mpegurl': parse_m3u,
-                        'audio/x-scpls': parse_pls}
+                        'audio/x-mpegurl': parse_m3u,
+                        'audio/mpegurl': parse_m3u,
+                        'audio/x-scpls': parse_pls,
+                        'audio/scpls': parse_pls}
 
     parser = extension_map.get(extension, None)
     if not parser and content_type:
@@ -195,26 +615,41 @@ def find_playlist_parser(extension, content_type):
 class RadioBrowser(object):
     # Wrapper for the RadioBrowser API.
 
-    def __init__(self, timeout, session=None):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.__init__')
-        
-        hosts = []
-        ips = socket.getaddrinfo('all.api.radio-browser.info', 80, 0, 0, socket.IPPROTO_TCP)
-        for ip_tupel in ips:
-            ip = ip_tupel[4][0]
-            host_addr = socket.gethostbyaddr(ip)
-            if host_addr[0] not in hosts:
-                hosts.append(host_addr[0])
-                
-        hosts.sort()
-
+    def __init__(self, timeout, session=None, catalog=None, catalogRefresh=0,
+                 cacheSize=256, hosts=None, mirrorCache=None,
+                 minStationCount=1, pageSize=0, maxStations=0,
+                 maxDirectories=0, searchLimit=100, connectTimeout=0,
+                 https=False, responseStore=None):
         # old API: self._base_uri = 'http://www.radio-browser.info/webservice/json/%s'
-        self._base_uri = 'http://' + hosts[0] + '/json/%s'
+        # The API paths are relative, the mirror is chosen per request
+        self._base_uri = '/json/%s'
         self._session = session or requests.Session()
-        self._timeout = timeout / 1000.0
+        # A dead mirror is noticed by the shorter connect timeout, while
+        # large listings get the full read timeout
+        readTimeout = timeout / 1000.0
+        self._timeout = (connectTimeout / 1000.0 or readTimeout, readTimeout)
+        self._scheme = 'https://' if https else 'http://'
+        self._mirrors = MirrorPool(self._session, self._timeout,
+                                   hosts=hosts, cachePath=mirrorCache,
+                                   scheme=self._scheme)
+        self._minStationCount = minStationCount
+        self._pageSize = pageSize
         self._categories = []  # <type 'list'>
-        self._directories = {}
-        self._stations = {}
+        self._searchLimit = searchLimit
+        self._index = SearchIndex()
+        self._directories = Registry(maxDirectories)
+        self._stations = Registry(maxStations, onEvict=self._evictStation)
+        self._responses = ResponseCache(cacheSize)
+        self._playlists = ResponseCache(cacheSize)
+        self._missingStations = ResponseCache(cacheSize)
+        self._countries = ResponseCache(COUNTRY_INDEX_SIZE if cacheSize else 0)
+        self._validators = ValidatorStore(responseStore, cacheSize)
+        # Identical concurrent requests share one fetch
+        self._flights = SingleFlight()
+        self._catalog = catalog
+        self._catalogRefresh = catalogRefresh
+        self._catalogThread = None
+        self._catalogStop = threading.Event()
 
         category = {   # <type 'dict'>
             # Countries
@@ -276,23 +711,46 @@ class RadioBrowser(object):
         };
         self.addCategory(category);
 
-    def reload(self):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.reload')
+    def gauges(self):
+        # Cache statistics and sizes, read when the metrics are exposed
+        samples = []
+        for name, cache in (('responses', self._responses),
+                            ('playlists', self._playlists),
+                            ('missing_stations', self._missingStations)):
+            stats = cache.stats()
+            labels = {'cache': name}
+            samples.append(('radiobrowser_cache_hits_total', labels,
+                            stats['hits']))
+            samples.append(('radiobrowser_cache_misses_total', labels,
+                            stats['misses']))
+            samples.append(('radiobrowser_cache_entries', labels,
+                            stats['size']))
+        samples.append(('radiobrowser_registry_entries',
+                        {'registry': 'stations'}, len(self._stations)))
+        samples.append(('radiobrowser_registry_entries',
+                        {'registry': 'directories'}, len(self._directories)))
+        flights = self._flights.stats()
+        samples.append(('radiobrowser_flight_calls_total', {},
+                        flights['calls']))
+        samples.append(('radiobrowser_flight_coalesced_total', {},
+                        flights['coalesced']))
+        return samples
 
+    def reload(self):
+        logger.debug('RadioBrowser: Response cache %s', self._responses.stats())
+        logger.debug('RadioBrowser: Requests %s', self._flights.stats())
         self._stations.clear()
-        self._radiobrowser.clear()
-        self._get_playlist.clear()
+        self._responses.clear()
+        self._playlists.clear()
+        self._missingStations.clear()
+        self._countries.clear()
 
     def addCategory(self, category):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.addCategory')
-
         self._categories.append(category);
         
         return True
 
     def getCategory(self, categoryId):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.getCategory')
-
         if categoryId in self._categories:
             category = self._categories[categoryId]
         else:
@@ -301,27 +759,63 @@ class RadioBrowser(object):
         return category
 
     def getCategories(self):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.getCategories')
-
         return self._categories
 
     def browseCategory(self, key):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.browseCategory (key="' + key + '")')
+        if self._isCatalogReady() and key not in TOP_CATEGORIES:
+            results = self._catalogCategory(key)
+            if results is not None:
+                return results
 
         # Use the key to find the category
         for category in self._categories:
             if key == category['key']:
                 url = category['URL']
                 results = list(self._radiobrowser(url, ''))
+                if not results and self._isCatalogReady():
+                    return self._catalogCategory(key) or []
                 return results
 
-        return results
+        return []
 
-    def addDirectory(self, directory):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.addDirectory')
+    def iterCategory(self, key, page=0):
+        # Like browseCategory, but yields the entries while they are
+        # downloaded. Tags and languages are ordered by their station count,
+        # filtered by the minimum station count and split into pages.
+        if key not in PAGED_CATEGORIES:
+            yield from self.browseCategory(key)
+            return
 
+        if self._isCatalogReady():
+            yield from self._catalogListing(key, page)
+            return
+
+        for category in self._categories:
+            if key == category['key']:
+                args = {'order': 'stationcount',
+                        'reverse': 'true',
+                        'hidebroken': 'true'}
+                if self._pageSize:
+                    args['limit'] = self._pageSize
+                    args['offset'] = page * self._pageSize
+                entries = self._radiobrowserIter(category['URL'], '?' + urlencode(args))
+                try:
+                    for entry in entries:
+                        # Only smaller counts follow, but finish the page so
+                        # that it gets cached
+                        if station_count(entry) >= self._minStationCount:
+                            yield entry
+                except IncompleteResponse as e:
+                    logger.info('RadioBrowser: Listing of %s is incomplete: %s' % (key, e))
+                return
+
+    def isPageFull(self, count):
+        # A listing page with fewer entries than the page size is the last
+        return bool(self._pageSize) and count >= self._pageSize
+
+    def addDirectory(self, directory):
         directoryId = directory['key']
-        if directoryId in self._directories:
+        if self._directories.get(directoryId) is not None:
             # The directory always exists
             return True
         
@@ -330,145 +824,217 @@ class RadioBrowser(object):
         return True
 
     def getDirectory(self, directoryId):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.getDirectory')
-
-        if directoryId in self._directories:
-            directory = self._directories[directoryId]
-        else:
+        directory = self._directories.get(directoryId)
+        if directory is None:
+            # Evicted or never browsed in this process
+            directory = self._rebuildDirectory(directoryId)
+        if directory is None:
             logger.error('RadioBrowser: Unknown directory with id=' + directoryId)
-            directory = None
         return directory
 
-    def getDirectories(self):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.getDirectories')
+    def _rebuildDirectory(self, directoryId):
+        # Recreate a directory from its key, which holds the percent-encoded
+        # name, so its parent doesn't have to be browsed first
+        prefix, _, identifier = directoryId.partition('-')
+        prefix += '-'
+        if not identifier:
+            return None
+        if PREFIX_COUNTRY == prefix:
+            from mopidy_radiobrowser import translator
+            directory = {'name': unquote_name(identifier), 'stationcount': 1}
+            translator.country_add_name(directory)
+            self.addCountry(directory)
+        elif PREFIX_STATE == prefix:
+            countrycode, name = parse_state_id(identifier)
+            directory = {'name': countrycode if name is None else name,
+                         'country': countrycode,
+                         'countrycode': countrycode,
+                         'stationcount': 1}
+            self.addState(directory)
+        elif PREFIX_LANGUAGE == prefix:
+            directory = {'name': unquote_name(identifier),
+                         'stationcount': self._minStationCount}
+            self.addLanguage(directory)
+        elif PREFIX_TAG == prefix:
+            directory = {'name': unquote_name(identifier),
+                         'stationcount': self._minStationCount}
+            self.addTag(directory)
+        else:
+            return None
+        # The identifier may not be encoded the way the key is
+        return self._directories.get(directory.get('key'))
 
+    def getDirectories(self):
         return self._directories
 
     def browseDirectory(self, directory):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.browseDirectory')
+        if directory['key'].startswith(PREFIX_COUNTRY):
+            index = self.countryIndex(directory['a2'])
+            if index is not None:
+                return index.states()
 
         url = directory['URL']
         results = list(self._radiobrowser(url, ''))
+        if directory['key'].startswith(PREFIX_COUNTRY):
+            for state in results:
+                state['countrycode'] = directory['a2']
 
         return results
 
     def addStation(self, station):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.addStation')
+        # Keep a compact record, the API data may be newer than a stored one
+        station = Station.fromApi(station)
+        self._stations[station.stationuuid] = station
+        if not self._index.complete:
+            self._index.add(station)
 
-        stationId = station['stationuuid']
-        if stationId in self._stations:
-            # The station always exist
-            return True
-        
-        self._stations[stationId] = station
-        
-        return True
+        return station
 
-    def getStation(self, stationId):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.getStation')
+    def addStations(self, stations):
+        # Like addStation for a whole listing, in one pass
+        stations = [Station.fromApi(station) for station in stations]
+        if not self._index.complete:
+            # Indexed first, so stations evicted by the listing itself are
+            # removed from the index again
+            for station in stations:
+                self._index.add(station)
+        self._stations.update(
+            (station.stationuuid, station) for station in stations)
+        return stations
+
+    def _evictStation(self, stationId):
+        # Without the catalog the search index only covers known stations
+        if not self._index.complete:
+            self._index.discard(stationId)
 
-        if stationId in self._stations:
-            station = self._stations[stationId]
-        else:
-            station = self._station_info(stationId)
-            self._stations['stationId'] = station
+    def getStation(self, stationId):
+        station = self._stations.get(stationId)
+        if station is None:
+            found, _ = self._missingStations.get(stationId)
+            if found:
+                return None
+            # Prefer the catalog, no network request needed
+            station = self._catalogStation(stationId)
+            if station:
+                station = self.addStation(station)
+            else:
+                station = self._station_info(stationId)
         return station
 
-    def addCountry(self, country):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.addCountry')
+    def getStations(self, stationIds):
+        # Resolve many stations at once: known ones from the registry, then
+        # the catalog, and the rest with as few API requests as possible.
+        # Returns a dict of the stations found by uuid.
+        result = {}
+        missing = []
+        for stationId in dict.fromkeys(stationIds):
+            station = self._stations.get(stationId)
+            if station is not None:
+                result[stationId] = station
+            elif not self._missingStations.get(stationId)[0]:
+                missing.append(stationId)
+
+        if missing and self._isCatalogReady():
+            for station in self._catalog.stationsByUuid(missing):
+                result[station['stationuuid']] = self.addStation(station)
+            missing = [s for s in missing if s not in result]
+
+        for i in range(0, len(missing), BATCH_SIZE):
+            batch = missing[i:i + BATCH_SIZE]
+            uri = self._base_uri % 'stations/byuuid'
+            stations = self._radiobrowser(uri, '?' + urlencode({'uuids': ','.join(batch)}))
+            if not isinstance(stations, list):
+                # The request failed, don't remember the stations as missing
+                continue
+            for station in stations:
+                if station.get('stationuuid') in batch:
+                    result[station['stationuuid']] = self.addStation(station)
+            for stationId in batch:
+                if stationId not in result:
+                    self._missingStations.set(stationId, True, MISSING_STATION_TTL)
+
+        return result
 
-        if '0' == country['stationcount']:
+    def addCountry(self, country):
+        if 0 == station_count(country):
             return False
 
         # Add the url to browse the country
         # http://www.radio-browser.info/webservice/json/states/<country>
             
-        country['URL'] = self._base_uri % ('states/' + country['name'] + '/')
+        country['URL'] = self._base_uri % ('states/' + quote_name(country['name']) + '/')
         # country['URL'] = self._base_uri % ('states')
-        country['key'] = PREFIX_COUNTRY + country['a2']
+        country['key'] = PREFIX_COUNTRY + quote_name(country['a2'])
 
         self.addDirectory(country)
         
         return True
 
     def getCountry(self, countryId):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.getCountry')
-
         return self.getDirectory(PREFIX_COUNTRY + countryId)
 
     def addState(self, state):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.addState')
-
-        if '0' == state['stationcount']:
+        if 0 == station_count(state):
             return False
 
         # Add the url to browse the state
         # http://www.radio-browser.info/webservice/json/stations/bystate/<name>
         # http://www.radio-browser.info/webservice/json/stations/bystateexact/<name>
+        # States of the same name in different countries have their own key
         name = state['name'].strip()
-        identifier = name.replace(' ', '')
         if len(name) == 2 and name == state['country']:
-            state['URL'] = self._base_uri % ('stations/bycountrycodeexact/' + name)
+            state['URL'] = self._base_uri % ('stations/bycountrycodeexact/' + quote_name(name))
         else:
-            state['URL'] = self._base_uri % ('stations/bystateexact/' + name)
-        state['key'] = PREFIX_STATE + identifier
+            state['URL'] = self._base_uri % ('stations/bystateexact/' + quote_name(name))
+        state['key'] = PREFIX_STATE + state_id(state.get('countrycode'), name)
 
         self.addDirectory(state)
         
         return True
 
     def getState(self, stateId):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.getState')
-
         return self.getDirectory(PREFIX_STATE + stateId)
 
     def addLanguage(self, language):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.addLanguage')
-        
-        if '0' == language['stationcount']:
+        if station_count(language) < self._minStationCount:
             return False
 
         # Add the url to browse the language
         # http://www.radio-browser.info/webservice/json/stations/bylanguage/<name>
         # http://www.radio-browser.info/webservice/json/stations/bylanguageexact/<name>
         name = language['name'].strip()
-        language['URL'] = self._base_uri % ('stations/bylanguageexact/' + name)
-        language['key'] = PREFIX_LANGUAGE + name.replace(' ', '')
+        language['URL'] = self._base_uri % ('stations/bylanguageexact/' + quote_name(name))
+        language['key'] = PREFIX_LANGUAGE + quote_name(name)
 
         self.addDirectory(language)
         
         return True
 
     def getLanguage(self, languageId):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.getLanguage')
-
         return self.getDirectory(PREFIX_LANGUAGE + languageId)
 
     def addTag(self, tag):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.addTag')
+        if station_count(tag) < self._minStationCount:
+            return False
 
         # Add the url to browse the tag
         # http://www.radio-browser.info/webservice/json/stations/bytag/<name>
         # http://www.radio-browser.info/webservice/json/stations/bytagexact/<name>
         name = tag['name'].strip()
         searchName = name.replace('#', '')
-        tag['URL'] = self._base_uri % ('stations/bytagexact/' + searchName)
-        tag['key'] = PREFIX_TAG + name.replace(' ', '')
+        tag['URL'] = self._base_uri % ('stations/bytagexact/' + quote_name(searchName))
+        tag['key'] = PREFIX_TAG + quote_name(name)
 
         self.addDirectory(tag)
         
         return True
 
     def getTag(self, tagId):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.getTag')
-
         directoryId = PREFIX_TAG + tagId
         return self.getDirectory(directoryId)
 
     ''' glaetten, abgleichen, abspecken, geraderichten
     def _flatten(self, data):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser._flatten')
-
         results = []
         for item in data:
             if 'children' in item:
@@ -478,8 +1044,6 @@ class RadioBrowser(object):
         return results
 
     def _grab_item(item):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser._grab_item')
-
         if 'guide_id' not in item:
             return
         if map_func:
@@ -493,8 +1057,6 @@ class RadioBrowser(object):
         results.append(station)
 
     def _filter_results(self, data, section_name=None, map_func=None):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser._filter_results')
-
         results = []
 
         for item in data:
@@ -508,16 +1070,63 @@ class RadioBrowser(object):
         return results
 
     def locations(self, location):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.locations')
-
         args = '&id=' + location
         results = self._radiobrowser('Browse.ashx', args)
         # TODO: Support filters here
         return [x for x in results if x.get('type', '') == 'link']
     '''
 
+    def countryIndex(self, countrycode):
+        # The states and stations of a country, None if they can't be fetched
+        found, index = self._countries.get(countrycode)
+        if found:
+            return index
+        return self._flights.do('country:' + countrycode,
+                                lambda: self._buildCountryIndex(countrycode))
+
+    def _buildCountryIndex(self, countrycode):
+        with tracing.span('country', countrycode=countrycode) as span:
+            if self._isCatalogReady():
+                stations = self._catalog.stationsByCountry(countrycode)
+            else:
+                url = self._base_uri % ('stations/bycountrycodeexact/' + countrycode)
+                stations = self._radiobrowserIter(url, '')
+            try:
+                index = CountryIndex(countrycode, (Station.fromApi(station)
+                                                   for station in stations))
+            except IncompleteResponse:
+                return None
+            span.set(stations=len(index))
+        if not index.total and not self._isCatalogReady():
+            # Maybe the request failed, don't keep the empty index for long.
+            # A country whose stations have no state is kept like any other.
+            self._countries.set(countrycode, index, NEGATIVE_TTL)
+        else:
+            self._countries.set(countrycode, index, COUNTRY_INDEX_TTL)
+        return index
+
+    def _stateStations(self, state):
+        # The stations of a state from the country index, the whole country
+        # if the state is named like the country
+        index = self.countryIndex(state['countrycode'])
+        name = state['name'].strip()
+        wholeCountry = name == state['country']
+        if index is None:
+            # The stations of the country couldn't be fetched, a state's
+            # stations may still be
+            return [] if wholeCountry else None
+        return index.stations(None if wholeCountry else name)
+
     def _browse(self, tag):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser._browse')
+        if tag['key'].startswith(PREFIX_STATE) and tag.get('countrycode'):
+            results = self._stateStations(tag)
+            if results is not None:
+                return results
+
+        if self._isCatalogReady():
+            results = self._catalogStations(tag)
+            if results is not None:
+                return results
 
         args = ''
         url = tag['URL']
@@ -525,62 +1134,43 @@ class RadioBrowser(object):
         return results
 
     def featured(self, guide_id):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.featured')
-
         return self._browse('Featured', guide_id)
 
     def local(self, guide_id):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.local')
-
         return self._browse('Local', guide_id)
 
     def stations(self, tag):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.stations')
-
         return self._browse(tag)
 
     def related(self, guide_id):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.related')
-
         return self._browse('Related', guide_id)
 
     def shows(self, guide_id):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.shows')
-
         return self._browse('Show', guide_id)
 
     def episodes(self, guide_id):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.episodes')
-
         args = '&c=pbrowse&id=' + guide_id
         results = self._radiobrowser('Tune.ashx', args)
         return self._filter_results(results, 'Topic')
 
-    def _map_listing(self, listing):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser._map_listing')
-
-        # We've already checked 'guide_id' exists
-        url_args = 'Tune.ashx?id=%s' % listing['guide_id']
-        return {'text': listing.get('name', '???'),
-                'guide_id': listing['guide_id'],
-                'type': 'audio',
-                'image': listing.get('logo', ''),
-                'subtext': listing.get('slogan', ''),
-                'URL': self._base_uri % url_args}
-
     def _station_info(self, stationId):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser._station_info')
+        # Concurrent lookups of the same station share one request
+        return self._flights.do('station:' + stationId,
+                                lambda: self._fetchStation(stationId))
 
-        logger.debug('RadioBrowser: Fetching info for station %s' % stationId)
+    def _fetchStation(self, stationId):
+        logger.debug('RadioBrowser: Fetching info for station %s', stationId)
         uri = self._base_uri % ('stations/byuuid/' + stationId)
         results = self._radiobrowser(uri, '')
-        listings = self._filter_results(results, 'Listing', self._map_listing)
-        if listings:
-            return listings[0]
+        if results:
+            return self.addStation(results[0])
+        if isinstance(results, list):
+            # The mirror answered, the station doesn't exist (anymore)
+            logger.info('RadioBrowser: Unknown station %s' % stationId)
+            self._missingStations.set(stationId, True, MISSING_STATION_TTL)
+        return None
 
     def parse_stream_url(self, url):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.parse_stream_url')
-
         logger.debug('RadioBrowser: Extracting URIs from %s', url)
         extension = urlparse(url).path[-4:]
         if extension in ['.mp3', '.wma']:
@@ -604,66 +1194,388 @@ class RadioBrowser(object):
         logger.debug('RadioBrowser: Got %s', results)
         return list(OrderedDict.fromkeys(results))
 
-    def tune(self, station):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.tune')
-
-        logger.debug('RadioBrowser: Tuning station id %s' % station['name'])
-        stream_uris = []
-        stream_uris.append(station['url'])
-        if not stream_uris:
-            logger.error('Failed to tune station id %s' % station['guide_id'])
-        return list(OrderedDict.fromkeys(stream_uris))
-
-    def search(self, query):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser.search')
-
-        # "Search.ashx?query=" + query + filterVal
+    def search(self, query, exact=False, directories=None):
+        # The query is a dict {field: [values]}, see search.QUERY_FIELDS. The
+        # result can be limited to the stations of some directories.
         if not query:
             logger.debug('RadioBrowser: Empty search query')
             return []
-        
-        logger.debug('RadioBrowser: Searching RadioBrowser for "%s"' % query)
-        url = self._base_uri % ('stations/byname/' + query)
-        results = list(self._radiobrowser(url, ''))
 
+        restrict = None
+        if directories is not None:
+            if not directories:
+                return []
+            restrict = lambda station: any(  # noqa: E731
+                self.inDirectory(station, directory)
+                for directory in directories)
+
+        with tracing.span('search', query=query) as span:
+            remote = []
+            if not self._index.complete:
+                # Only the known stations are indexed, ask the API as well
+                remote = [self.addStation(station)
+                          for station in self._remoteSearch(query, exact)]
+
+            results = self._index.search(query, exact, self._searchLimit, restrict)
+            found = set(station.stationuuid for station in results)
+            for station in remote:
+                if len(results) >= self._searchLimit:
+                    break
+                if station.stationuuid not in found and (restrict is None or restrict(station)):
+                    found.add(station.stationuuid)
+                    results.append(station)
+            span.set(results=len(results))
         return results
 
-    # @cache()   # Can't be debugged
+    def _remoteSearch(self, query, exact):
+        logger.debug('RadioBrowser: Searching RadioBrowser for "%s"', query)
+
+        args = {'order': 'votes',
+                'reverse': 'true',
+                'hidebroken': 'true',
+                'limit': self._searchLimit}
+        terms = {}
+        for field, values in query.items():
+            param = SEARCH_PARAMETERS.get(field)
+            if param and values:
+                terms.setdefault(param, []).extend(values)
+        if not terms:
+            return []
+        for param, values in terms.items():
+            args[param] = ' '.join(values)
+            if exact:
+                args[param + 'Exact'] = 'true'
+        url = self._base_uri % 'stations/search'
+        results = self._radiobrowser(url, '?' + urlencode(args))
+        return results if isinstance(results, list) else []
+
+    def inDirectory(self, station, directory):
+        # Whether the station is listed in the tag, language, country or state
+        key = directory.get('key', '')
+        name = directory.get('name', '').strip()
+        if key.startswith(PREFIX_TAG):
+            return name.lower() in station.tags
+        if key.startswith(PREFIX_LANGUAGE):
+            return name.lower() in station.language
+        if key.startswith(PREFIX_COUNTRY):
+            return station.countrycode == directory.get('a2')
+        if key.startswith(PREFIX_STATE):
+            countrycode = directory.get('countrycode')
+            if countrycode and station.countrycode != countrycode:
+                return False
+            return name == directory.get('country') or station.state == name
+        return False
+
+    def rebuildIndex(self):
+        # Index every station of the catalog, so search works offline
+        if not self._isCatalogReady():
+            return
+        with tracing.span('index'):
+            self._index.rebuild(
+                Station.fromApi(station)
+                for station in self._catalog.allStations())
+
+    def _isCatalogReady(self):
+        return self._catalog is not None and self._catalog.isPopulated()
+
+    def _catalogStation(self, stationId):
+        if not self._isCatalogReady():
+            return None
+        return self._catalog.station(stationId)
+
+    def _catalogCategory(self, key):
+        if 'countries' == key:
+            return self._catalog.countries()
+        if key in PAGED_CATEGORIES:
+            return self._catalogListing(key, 0)
+        if 'clicks' == key:
+            return self._catalog.topClicked(TOP_LIMIT)
+        if 'votes' == key:
+            return self._catalog.topVoted(TOP_LIMIT)
+        return None
+
+    def _catalogListing(self, key, page):
+        listing = self._catalog.tags if 'tags' == key else self._catalog.languages
+        if self._pageSize:
+            return listing(self._minStationCount, self._pageSize, page * self._pageSize)
+        return listing(self._minStationCount)
+
+    def _catalogStations(self, directory):
+        key = directory.get('key', '')
+        if key.startswith(PREFIX_TAG):
+            return self._catalog.stationsByTag(directory['name'])
+        if key.startswith(PREFIX_LANGUAGE):
+            return self._catalog.stationsByLanguage(directory['name'])
+        return None
+
+    def syncCatalog(self):
+        if self._catalog is None:
+            return False
+        with tracing.span('catalog'):
+            return self._syncCatalog()
+
+    def _syncCatalog(self):
+        # An incomplete download raises and rolls the catalog update back
+        lastChange = self._catalog.getMeta('lastchangeuuid')
+        if self._catalog.isPopulated() and lastChange:
+            # Incremental update: only the station changes since the last sync
+            url = self._base_uri % 'stations/changed'
+            self._catalog.updateStations(
+                self._radiobrowserIter(url, '?lastchangeuuid=' + lastChange))
+        else:
+            # Initial fill from the complete station list
+            stations = self._radiobrowserIter(self._base_uri % 'stations', '')
+            first = next(stations, None)
+            if first is None:
+                logger.info('RadioBrowser: Catalog download failed')
+                return False
+            self._catalog.replaceStations(itertools.chain([first], stations))
+        return True
+
+    def start(self):
+        self._mirrors.start()
+        self.startCatalogSync()
+
+    def stop(self):
+        self._mirrors.stop()
+        self.stopCatalogSync()
+        self._validators.close()
+
+    def startCatalogSync(self):
+        if self._catalog is None:
+            return
+        if self._catalogThread is not None and self._catalogThread.is_alive():
+            return
+        self._catalogStop.clear()
+        self._catalogThread = threading.Thread(
+            target=self._catalogSyncLoop,
+            name='RadioBrowserCatalogSync',
+            daemon=True)
+        self._catalogThread.start()
+
+    def stopCatalogSync(self):
+        self._catalogStop.set()
+
+    def _catalogSyncLoop(self):
+        while not self._catalogStop.is_set():
+            try:
+                self.syncCatalog()
+            except Exception as e:
+                logger.warning('RadioBrowser: Catalog sync failed: %s' % e)
+            try:
+                self.rebuildIndex()
+            except Exception as e:
+                logger.warning('RadioBrowser: Building the search index failed: %s' % e)
+            if not self._catalogRefresh:
+                break
+            self._catalogStop.wait(self._catalogRefresh)
+
     def _radiobrowser(self, url, args):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser._radiobrowser')
+        uri = url + args
+        found, value = self._responses.get(uri)
+        if found:
+            return copy_response(value)
+
+        # Concurrent callers of the same URI wait for the first one's request
+        return copy_response(self._flights.do(uri, lambda: self._fetch(uri)))
+
+    def _fetch(self, uri):
+        validated = self._validated(uri)
+        r = self._open(uri, headers=conditional_headers(validated))
+        if r is not None:
+            with closing(r):
+                try:
+                    if validated is not None and r.status_code == 304:
+                        ret = validated.body
+                    else:
+                        with tracing.span('parse', uri=uri), metrics.timer(
+                                'radiobrowser_api_read_seconds',
+                                endpoint=endpoint_name(uri)):
+                            ret = r.json() # ['body']
+                        metrics.inc('radiobrowser_api_bytes_total',
+                                    response_size(r),
+                                    endpoint=endpoint_name(uri))
+                        self._storeValidators(uri, r, ret)
+                except ValueError as e:
+                    logger.info('RadioBrowser API request for %s failed: %s' % (uri, e))
+                else:
+                    self._responses.set(uri, ret, response_ttl(uri))
+                    return ret
+        # Don't hammer the mirror with a request that just failed
+        self._responses.set(uri, {}, NEGATIVE_TTL)
+        return {}
 
+    def _radiobrowserIter(self, url, args):
+        # Like _radiobrowser for JSON lists, but the entries are decoded and
+        # yielded while the response is downloaded
         uri = url + args
+        found, value = self._responses.get(uri)
+        if not found and not self._isCacheable(uri):
+            yield from self._fetchIter(uri)
+            return
+        if not found:
+            flight, leader = self._flights.join(uri)
+            if leader:
+                try:
+                    yield from self._fetchIter(uri)
+                finally:
+                    self._flights.leave(uri, flight)
+                return
+            # Use the response another caller is downloading right now
+            flight.done.wait()
+            found, value = self._responses.get(uri)
+        if found:
+            for item in value:
+                yield dict(item) if isinstance(item, dict) else item
+            return
+        # Nothing was cached for us, e.g. the other download failed
+        yield from self._fetchIter(uri)
+
+    def _isCacheable(self, uri):
+        return response_ttl(uri) > 0 and self._responses.maxsize > 0
+
+    def _validated(self, uri):
+        # The stored body and validators of a listing, if it has any
+        if not is_revalidated(uri):
+            return None
+        return self._validators.get(uri)
+
+    def _storeValidators(self, uri, r, body):
+        if is_revalidated(uri):
+            etag, lastModified = response_validators(r.headers)
+            self._validators.set(uri, etag, lastModified, body)
+
+    def _fetchIter(self, uri):
+        validated = self._validated(uri)
+        r = self._open(uri, stream=True,
+                       headers=conditional_headers(validated))
+        if r is None:
+            self._responses.set(uri, [], NEGATIVE_TTL)
+            return
+
+        ttl = response_ttl(uri)
+        if validated is not None and r.status_code == 304:
+            # Not modified, the stored body is still current
+            r.close()
+            self._responses.set(uri, validated.body, ttl)
+            for item in validated.body:
+                yield dict(item) if isinstance(item, dict) else item
+            return
+
+        results = [] if self._isCacheable(uri) or is_revalidated(uri) else None
+        # The span includes the time the caller takes for the entries
+        with closing(r), tracing.span('parse', uri=uri) as span:
+            count = 0
+            endpoint = endpoint_name(uri)
+            try:
+                # Only the time spent downloading and decoding is measured
+                for item in metrics.timed(
+                        iter_json_array(r.iter_content(STREAM_CHUNK_SIZE)),
+                        'radiobrowser_api_read_seconds', endpoint=endpoint):
+                    if results is not None:
+                        # Callers enrich the entries, like copy_response
+                        # the cached ones are kept apart
+                        results.append(item)
+                        item = dict(item) if isinstance(item, dict) else item
+                    count += 1
+                    yield item
+                span.set(entries=count)
+                metrics.inc('radiobrowser_api_bytes_total', response_size(r),
+                            endpoint=endpoint)
+            except (requests.RequestException, ValueError) as e:
+                logger.info('RadioBrowser API request for %s failed: %s' % (uri, e))
+                raise IncompleteResponse(uri) from e
+        if results is not None:
+            self._responses.set(uri, results, ttl)
+            self._storeValidators(uri, r, results)
+
+    def _open(self, uri, stream=False, headers=None):
+        # Send the request to the fastest healthy mirror and fail over to the
+        # next one. Returns the response or None if all mirrors failed.
         logger.debug('RadioBrowser: Request: %s', uri)
-        try:
-            # self._session.get(url, **kwargs)
-            # self._session.post(url, data=None, json=None, **kwargs)
-            #  url: URL for the new Request object.
-            #  data: (optional) Dictionary, list of tuples, bytes, or file-like object to send in the body of the Request.
-            #  json: (optional) json to send in the body of the Request.
-            #  **kwargs: Optional arguments that request takes.
-            with closing(self._session.get(uri, timeout=self._timeout)) as r:
+        endpoint = endpoint_name(uri)
+        for host in self._mirrors.hosts()[:MAX_MIRROR_ATTEMPTS]:
+            start = time.monotonic()
+            try:
+                with tracing.span('request', uri=uri, host=host) as span:
+                    r = self._session.get(self._scheme + host + uri,
+                                          headers=headers,
+                                          timeout=self._timeout,
+                                          stream=stream)
+                    span.set(status=r.status_code)
+            except requests.RequestException as e:
+                logger.info('RadioBrowser API request for %s failed: %s' % (uri, e))
+                metrics.inc('radiobrowser_api_requests_total',
+                            endpoint=endpoint, status='error')
+                self._mirrors.reportFailure(host)
+                continue
+            elapsed = time.monotonic() - start
+            metrics.inc('radiobrowser_api_requests_total',
+                        endpoint=endpoint, status=str(r.status_code))
+            metrics.observe('radiobrowser_api_request_seconds', elapsed,
+                            endpoint=endpoint)
+            try:
                 r.raise_for_status()
-                ret = r.json() # ['body']
-                return ret
-        except Exception as e:
-            logger.info('RadioBrowser API request for %s failed: %s' % (uri, e))
-        return {}
+            except requests.HTTPError as e:
+                r.close()
+                logger.info('RadioBrowser API request for %s failed: %s' % (uri, e))
+                if r.status_code < 500:
+                    # The mirror works, another one won't answer differently
+                    return None
+                self._mirrors.reportFailure(host)
+                continue
+            self._mirrors.reportSuccess(host, elapsed)
+            return r
+        return None
 
-    # @cache()   # Can't be debugged
     def _get_playlist(self, uri):
-        logger.debug('RadioBrowser: Start radiobrowser.RadioBrowser._get_playlist')
+        found, value = self._playlists.get(uri)
+        if found:
+            return value
 
         data, content_type = None, None
         try:
             # Defer downloading the body until know it's not a stream
-            with closing(self._session.get(uri,
-                                           timeout=self._timeout,
-                                           stream=True)) as r:
+            with tracing.span('playlist', uri=uri), \
+                    closing(self._session.get(uri,
+                                              timeout=self._timeout,
+                                              stream=True)) as r:
                 r.raise_for_status()
-                content_type = r.headers.get('content-type', 'audio/mpeg')
-                logger.debug('RadioBrowser: %s has content-type: %s' % (uri, content_type))
-                if content_type != 'audio/mpeg':
-                    data = r.content.decode('utf-8', errors='ignore')
+                data, content_type = self._read_playlist(uri, r)
+                metrics.inc('radiobrowser_api_bytes_total', response_size(r),
+                            endpoint='playlist')
         except Exception as e:
             logger.info('RadioBrowser playlist request for %s failed: %s' % (uri, e))
+            self._playlists.set(uri, (data, content_type), NEGATIVE_TTL)
+            return (data, content_type)
+        self._playlists.set(uri, (data, content_type), PLAYLIST_TTL)
         return (data, content_type)
+
+    def _read_playlist(self, uri, r):
+        # Classifies the response as stream or playlist from its headers and
+        # at most SNIFF_SIZE bytes, only a playlist's body is read completely
+        header = r.headers.get('content-type')
+        content_type = media_type(header) or 'audio/mpeg'
+        logger.debug('RadioBrowser: %s has content-type: %s', uri, header)
+        if header and is_stream_content_type(content_type):
+            return None, content_type
+
+        chunks = r.iter_content(SNIFF_SIZE)
+        head = next(chunks, b'')
+        if is_hls(head):
+            # Whatever its content-type says
+            logger.debug('RadioBrowser: %s is an HLS stream', uri)
+            return None, content_type
+        sniffed = sniff_playlist(head)
+        if content_type not in PLAYLIST_CONTENT_TYPES:
+            if sniffed is None:
+                logger.debug('RadioBrowser: %s is a stream', uri)
+                return None, content_type
+            content_type = sniffed
+
+        body = read_limited(itertools.chain([head], chunks), MAX_PLAYLIST_SIZE)
+        if body is None:
+            logger.info('RadioBrowser: %s is larger than %d bytes, '
+                        'treating it as a stream' % (uri, MAX_PLAYLIST_SIZE))
+            return None, content_type
+        return body.decode('utf-8', errors='ignore'), content_type
@@ -0,0 +1,233 @@
+from __future__ import unicode_literals
+
+import logging
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from mopidy import exceptions
+
+from . import metrics, tracing
+from .radiobrowser import NEGATIVE_TTL, ResponseCache
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds a resolved stream URL is reused for a station
+RESOLVED_TTL = 600
+
+# Number of candidate streams probed at the same time
+PROBE_WORKERS = 4
+
+# Number of stations resolved in the background at the same time
+PREFETCH_WORKERS = 2
+
+# Default ports used when the stream URL has none, for warming connections
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class StreamResolver(object):
+    # Turns a station into a stream URL GStreamer can play.
+    #
+    # The API's url_resolved is tried first, as the playlists are already
+    # followed there. Otherwise the station's url is parsed as a playlist if
+    # it is one. The candidates are probed in parallel with the scanner and
+    # the first playable one wins. The result is cached per station.
+    #
+    # With prefetching enabled, up to 'prefetch' stations of a browsed
+    # directory, or the ones following the playing station, are resolved in
+    # the background, so zapping to them doesn't wait for the network.
+
+    def __init__(self, radiobrowser, scanner=None, cacheSize=256,
+                 ttl=RESOLVED_TTL, workers=PROBE_WORKERS, prefetch=0,
+                 prefetchWorkers=PREFETCH_WORKERS, warmConnections=False,
+                 timeout=5000):
+        self._radiobrowser = radiobrowser
+        self._scanner = scanner
+        self._ttl = ttl
+        self._workers = workers
+        self._resolved = ResponseCache(cacheSize)
+        self._prefetch = prefetch
+        self._prefetchWorkers = prefetchWorkers
+        self._warmConnections = warmConnections
+        self._timeout = timeout / 1000.0
+        self._executor = None
+        self._lock = threading.Lock()
+        # Background resolutions by station, queued or running
+        self._pending = {}
+        # The stations of the last browsed directory, in their order
+        self._neighbours = []
+
+    @property
+    def prefetching(self):
+        return self._prefetch > 0
+
+    def clear(self):
+        self._resolved.clear()
+        with self._lock:
+            self._neighbours = []
+
+    def gauges(self):
+        # Statistics of the resolved streams, read by the metrics endpoint
+        stats = self._resolved.stats()
+        labels = {'cache': 'streams'}
+        return [('radiobrowser_cache_hits_total', labels, stats['hits']),
+                ('radiobrowser_cache_misses_total', labels, stats['misses']),
+                ('radiobrowser_cache_entries', labels, stats['size'])]
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def resolve(self, station):
+        found, uri = self._resolved.get(station.stationuuid)
+        if found:
+            return uri
+        with self._lock:
+            future = self._pending.get(station.stationuuid)
+            if future is not None and future.cancel():
+                # Only queued, it's resolved right away instead of after the
+                # prefetches ahead of it
+                del self._pending[station.stationuuid]
+                future = None
+        if future is not None and not future.cancelled():
+            # Already being resolved in the background
+            try:
+                return future.result()
+            except Exception as e:
+                logger.debug('RadioBrowser: Prefetching %s failed: %s',
+                             station.name, e)
+        return self._resolveAndCache(station)
+
+    def _resolveAndCache(self, station):
+        with tracing.span('resolve', station=station.stationuuid) as span, \
+                metrics.timer('radiobrowser_resolve_seconds'):
+            uri = self._resolve(station)
+            span.set(uri=uri)
+        metrics.inc('radiobrowser_resolve_total',
+                    result='resolved' if uri else 'failed')
+        self._resolved.set(station.stationuuid, uri,
+                           self._ttl if uri else NEGATIVE_TTL)
+        return uri
+
+    def prefetch(self, stations):
+        # Resolve the first stations of a browsed directory in the background
+        if not self.prefetching:
+            return
+        stations = list(stations)
+        with self._lock:
+            self._neighbours = stations
+        self._schedule(stations[:self._prefetch])
+
+    def prefetchAround(self, station):
+        # Resolve the stations following the playing one and the one before
+        if not self.prefetching:
+            return
+        with self._lock:
+            neighbours = self._neighbours
+        for i, neighbour in enumerate(neighbours):
+            if neighbour.stationuuid == station.stationuuid:
+                following = neighbours[i + 1:i + 1 + self._prefetch]
+                self._schedule(following + neighbours[max(i - 1, 0):i])
+                return
+
+    def _schedule(self, stations):
+        # Replaces the queued prefetches, so the budget is spent on the
+        # stations that are most likely played next
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._prefetchWorkers,
+                    thread_name_prefix='RadioBrowserPrefetch')
+            wanted = set(station.stationuuid for station in stations)
+            for stationId, future in list(self._pending.items()):
+                if stationId not in wanted and future.cancel():
+                    del self._pending[stationId]
+            for station in stations:
+                if station.stationuuid in self._pending:
+                    continue
+                if self._resolved.get(station.stationuuid)[0]:
+                    continue
+                future = self._executor.submit(self._prefetchStation, station)
+                self._pending[station.stationuuid] = future
+
+    def _prefetchStation(self, station):
+        try:
+            uri = self._resolveAndCache(station)
+            if uri and self._warmConnections:
+                self._warm(uri)
+            return uri
+        finally:
+            with self._lock:
+                self._pending.pop(station.stationuuid, None)
+
+    def _warm(self, uri):
+        # Look up the stream's host and open a connection to it, so DNS and
+        # the route are fresh when playback starts
+        url = urlparse(uri)
+        port = url.port or DEFAULT_PORTS.get(url.scheme)
+        if not url.hostname or port is None:
+            return
+        try:
+            socket.create_connection(
+                (url.hostname, port), timeout=self._timeout).close()
+        except OSError as e:
+            logger.debug('RadioBrowser: Warming %s failed: %s', uri, e)
+
+    def _resolve(self, station):
+        tried = []
+        if station.url_resolved:
+            tried.append(station.url_resolved)
+            uri = self._probe(tried)
+            if uri:
+                return uri
+
+        if station.url:
+            candidates = [uri for uri in
+                          self._radiobrowser.parse_stream_url(station.url)
+                          if uri not in tried]
+            uri = self._probe(candidates)
+            if uri:
+                return uri
+            tried.extend(candidates)
+
+        if tried:
+            # Nothing is known to play, let GStreamer try the best guess
+            logger.info('RadioBrowser: No playable stream found for %s' % station.name)
+            return tried[0]
+        logger.info('RadioBrowser: Station %s has no stream' % station.name)
+        return None
+
+    def _probe(self, candidates):
+        # Returns the first candidate the scanner finds playable
+        if not candidates:
+            return None
+        if self._scanner is None:
+            return candidates[0]
+        workers = min(len(candidates), self._workers)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {executor.submit(self._scan, uri): uri
+                       for uri in candidates}
+            for future in as_completed(futures):
+                if future.result():
+                    return futures[future]
+        finally:
+            # Don't wait for the slower probes
+            executor.shutdown(wait=False)
+        return None
+
+    def _scan(self, uri):
+        try:
+            result = self._scanner.scan(uri)
+        except exceptions.ScannerError as e:
+            logger.debug('RadioBrowser: Probing %s failed: %s', uri, e)
+            return False
+        logger.debug('RadioBrowser: %s has mime type %s', uri, result.mime)
+        return bool(result.playable)
@@ -0,0 +1,206 @@
+from __future__ import unicode_literals
+
+import bisect
+import logging
+import re
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+# Query fields and the station fields they are matched against
+QUERY_FIELDS = {
+    'any': ('name', 'tags', 'country', 'language', 'codec'),
+    'name': ('name',),
+    'tag': ('tags',),
+    'album': ('tags', 'country'),
+    'country': ('country',),
+    'language': ('language',),
+    'codec': ('codec',),
+}
+
+# Matches in the station name count more than in the other fields
+FIELD_WEIGHTS = {'name': 2}
+
+# Scores of the kinds of token matches
+SCORE_EXACT = 3
+SCORE_PREFIX = 2
+SCORE_FUZZY = 1
+
+# Shorter query tokens are not matched fuzzily
+FUZZY_MIN_LENGTH = 4
+
+# Upper limit of vocabulary tokens a prefix may expand to
+MAX_PREFIX_TOKENS = 500
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def station_tokens(station):
+    # The tokens of every indexed field of a station
+    return {
+        'name': set(tokenize(station.name)),
+        'tags': set(token for tag in station.tags for token in tokenize(tag)),
+        'country': set(tokenize(station.country)
+                       + tokenize(station.countrycode)),
+        'language': set(token for language in station.language
+                        for token in tokenize(language)),
+        'codec': set(tokenize(station.codec)),
+    }
+
+
+def within_one_edit(a, b):
+    # True if a and b differ by at most one insertion, deletion or change
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex(object):
+    # Inverted index over the known stations.
+    #
+    # Every query token has to match a token of one of the fields of its
+    # query field, exactly or, unless an exact search is requested, as a
+    # prefix or with one typo. Stations are ranked by how well they match
+    # and then by their votes and clicks.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stations = {}
+        self._postings = {field: {} for field in QUERY_FIELDS['any']}
+        self._vocabulary = {field: [] for field in QUERY_FIELDS['any']}
+        self._dirty = set()
+        # Set when the index holds every station, e.g. built from the catalog
+        self.complete = False
+
+    def __len__(self):
+        return len(self._stations)
+
+    def add(self, station):
+        with self._lock:
+            self._discard(station.stationuuid)
+            self._stations[station.stationuuid] = station
+            for field, tokens in station_tokens(station).items():
+                postings = self._postings[field]
+                for token in tokens:
+                    if token not in postings:
+                        postings[token] = set()
+                        self._dirty.add(field)
+                    postings[token].add(station.stationuuid)
+
+    def discard(self, stationId):
+        with self._lock:
+            self._discard(stationId)
+
+    def _discard(self, stationId):
+        station = self._stations.pop(stationId, None)
+        if station is None:
+            return
+        for field, tokens in station_tokens(station).items():
+            postings = self._postings[field]
+            for token in tokens:
+                stationIds = postings.get(token)
+                if stationIds is None:
+                    continue
+                stationIds.discard(stationId)
+                if not stationIds:
+                    del postings[token]
+                    self._dirty.add(field)
+
+    def rebuild(self, stations, complete=True):
+        index = SearchIndex()
+        for station in stations:
+            index.add(station)
+        with self._lock:
+            self._stations = index._stations
+            self._postings = index._postings
+            self._vocabulary = index._vocabulary
+            self._dirty = set(index._dirty)
+            self.complete = complete
+        logger.debug('RadioBrowser: Search index holds %d stations',
+                     len(self._stations))
+
+    def _tokens(self, field):
+        # Sorted vocabulary of a field, for prefix matching
+        if field in self._dirty:
+            self._vocabulary[field] = sorted(self._postings[field])
+            self._dirty.discard(field)
+        return self._vocabulary[field]
+
+    def _match(self, field, token, exact):
+        # Returns {stationuuid: score} of the stations matching the token
+        postings = self._postings[field]
+        scores = {}
+
+        def update(stationIds, score):
+            for stationId in stationIds:
+                if scores.get(stationId, 0) < score:
+                    scores[stationId] = score
+
+        if token in postings:
+            update(postings[token], SCORE_EXACT)
+        if exact:
+            return scores
+
+        vocabulary = self._tokens(field)
+        start = bisect.bisect_left(vocabulary, token)
+        end = min(bisect.bisect_left(vocabulary, token + '\uffff'),
+                  start + MAX_PREFIX_TOKENS)
+        for candidate in vocabulary[start:end]:
+            if candidate != token:
+                update(postings[candidate], SCORE_PREFIX)
+
+        if not scores and len(token) >= FUZZY_MIN_LENGTH:
+            for candidate in vocabulary:
+                if within_one_edit(token, candidate):
+                    update(postings[candidate], SCORE_FUZZY)
+        return scores
+
+    def search(self, query, exact=False, limit=100, restrict=None):
+        # query is a dict {query field: [values]}, restrict an optional
+        # function that tells whether a station may be part of the result
+        with self._lock:
+            result = None
+            for queryField, values in query.items():
+                fields = QUERY_FIELDS.get(queryField)
+                if fields is None:
+                    continue
+                for value in values:
+                    for token in tokenize(value):
+                        scores = {}
+                        for field in fields:
+                            weight = FIELD_WEIGHTS.get(field, 1)
+                            for stationId, score in self._match(
+                                    field, token, exact).items():
+                                scores[stationId] = max(
+                                    scores.get(stationId, 0), score * weight)
+                        if result is None:
+                            result = scores
+                        else:
+                            result = {stationId: score + scores[stationId]
+                                      for stationId, score in result.items()
+                                      if stationId in scores}
+                        if not result:
+                            return []
+            if not result:
+                return []
+            stations = [(score, self._stations[stationId])
+                        for stationId, score in result.items()]
+
+        if restrict is not None:
+            stations = [(score, station) for score, station in stations
+                        if restrict(station)]
+        stations.sort(key=lambda item: (
+            -item[0], -(item[1].votes + item[1].clickcount), item[1].name))
+        return [station for _, station in stations[:limit]]
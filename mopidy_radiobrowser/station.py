@@ -0,0 +1,64 @@
+from __future__ import unicode_literals
+
+import sys
+
+from .catalog import split_list
+
+
+class Station(object):
+    # Compact record of a RadioBrowser station.
+    #
+    # The API returns about 30 fields per station, only the few used for
+    # browsing, playback, images and search are kept. Values that repeat
+    # across many stations are interned, so they are stored only once.
+
+    __slots__ = ('stationuuid', 'name', 'url', 'url_resolved', 'favicon',
+                 'state',
+                 'countrycode', 'codec', 'country', 'tags', 'language',
+                 'votes', 'clickcount')
+
+    def __init__(self, stationuuid, name, url, url_resolved='', favicon='',
+                 state='',
+                 countrycode='', codec='', country='', tags=(), language=(),
+                 votes=0, clickcount=0):
+        self.stationuuid = stationuuid
+        self.name = name
+        self.url = url
+        self.url_resolved = url_resolved
+        self.favicon = favicon
+        self.state = sys.intern(state)
+        self.countrycode = sys.intern(countrycode)
+        self.codec = sys.intern(codec)
+        self.country = sys.intern(country)
+        self.tags = tuple(sys.intern(tag) for tag in tags)
+        self.language = tuple(sys.intern(language) for language in language)
+        self.votes = votes
+        self.clickcount = clickcount
+
+    @classmethod
+    def fromApi(cls, data):
+        # Build the record from a station dict returned by the API or catalog
+        if isinstance(data, cls):
+            return data
+        return cls(data['stationuuid'],
+                   data.get('name') or '',
+                   data.get('url') or '',
+                   data.get('url_resolved') or '',
+                   data.get('favicon') or '',
+                   (data.get('state') or '').strip(),
+                   data.get('countrycode') or '',
+                   data.get('codec') or '',
+                   data.get('country') or '',
+                   split_list(data.get('tags')),
+                   split_list(data.get('language')),
+                   int(data.get('votes') or 0),
+                   int(data.get('clickcount') or 0))
+
+    def __eq__(self, other):
+        if not isinstance(other, Station):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field)
+                   for field in self.__slots__)
+
+    def __repr__(self):
+        return 'Station(%r, %r)' % (self.stationuuid, self.name)
@@ -0,0 +1,106 @@
+from __future__ import unicode_literals
+
+import collections
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Number of finished spans kept for inspection
+MAX_SPANS = 1000
+
+_enabled = False
+_lock = threading.Lock()
+_spans = collections.deque(maxlen=MAX_SPANS)
+_totals = {}
+
+# A finished span: what was done, its attributes and how long it took
+Record = collections.namedtuple('Record', ('name', 'attrs', 'duration'))
+
+
+class _NullSpan(object):
+    # Returned while tracing is disabled, entering and leaving it is free
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span(object):
+    # Times a block of code, like one API request or one translated batch
+
+    __slots__ = ('name', 'attrs', '_start')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        duration = time.perf_counter() - self._start
+        if excType is not None:
+            self.attrs['error'] = excType.__name__
+        _record(Record(self.name, self.attrs, duration))
+        return False
+
+    def set(self, **attrs):
+        # Add attributes only known at the end, e.g. the number of entries
+        self.attrs.update(attrs)
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name, **attrs):
+    # Use as 'with tracing.span('request', uri=uri) as s:'
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, attrs)
+
+
+def _record(record):
+    with _lock:
+        _spans.append(record)
+        count, total = _totals.get(record.name, (0, 0.0))
+        _totals[record.name] = (count + 1, total + record.duration)
+    logger.debug('RadioBrowser trace: %s %.1f ms %s', record.name,
+                 record.duration * 1000, record.attrs)
+
+
+def spans():
+    # The most recent finished spans, oldest first
+    with _lock:
+        return list(_spans)
+
+
+def totals():
+    # {name: (count, total seconds)} of all finished spans
+    with _lock:
+        return dict(_totals)
+
+
+def clear():
+    with _lock:
+        _spans.clear()
+        _totals.clear()
@@ -1,17 +1,12 @@
 from __future__ import unicode_literals
 
 import logging
-import urllib
-import pycountry
-import gettext
-import locale
 
 from mopidy.models import Album, Artist, Ref, Track
 
-actualLocale = locale.getlocale()
+from mopidy_radiobrowser import countries, uris
+
 logger = logging.getLogger(__name__)
-localLanguage = gettext.translation('iso3166', pycountry.LOCALES_DIR, languages=[actualLocale[0]])
-localLanguage.install()
 
 RADIOBROWSER_API_ENCODING = 'utf-8'
 
@@ -26,21 +21,33 @@ RADIOBROWSER_ID_AFFILIATE = 'affiliate'
 RADIOBROWSER_ID_STREAM = 'stream'
 RADIOBROWSER_ID_UNKNOWN = 'unknown'
 
+# URI prefixes of the stations and directories, the identifier is appended
+STATION_URI = uris.SCHEME + ':station:'
+DIRECTORY_URIS = {variant: '%s:%s:' % (uris.SCHEME, variant)
+                  for variant in ('country', 'state', 'language', 'tag')}
 
-def unparse_uri(variant, name):
-    logger.debug('RadioBrowser: Start translator.unparse_uri')
+# Mopidy search fields and the station fields they search
+MOPIDY_SEARCH_FIELDS = {
+    'any': 'any',
+    'comment': 'any',
+    'track_name': 'name',
+    'artist': 'name',
+    'albumartist': 'name',
+    'performer': 'name',
+    'genre': 'tag',
+    'album': 'album',
+}
 
-    identifier = name.replace(" ", "")
-    identifier = identifier.replace(":", "")
-    unparsed = 'radiobrowser:%s:%s' % (variant, identifier) 
-    return unparsed
+
+def unparse_uri(variant, name):
+    # The name is percent-encoded, so it can be recovered from the uri
+    return uris.unparse(variant, name)
 
 
 # Parse the uri to ???
 def parse_uri(uri):
-    logger.debug('RadioBrowser: Start translator.parse_uri')
-
-    result = uri.split(":")
+    # The identifier may carry a page number: radiobrowser:category:tags:2
+    result = uri.split(":", 2)
     if 3 == len(result):
         return result[1], result[2]
     if 2 == len(result):
@@ -48,35 +55,66 @@ def parse_uri(uri):
     return None, None
 
 
-def station_to_ref(station):
-    logger.debug('RadioBrowser: Start translator.station_to_ref')
-
-    stationUuid = station.get('stationuuid', '??')
-    uri = unparse_uri('station', stationUuid)
-    name = station.get('name', station.get('url', '??'))
+def station_name(station):
     # TODO: Should the name include 'now playing' for all stations?
     # if get_id_type(id) == RADIOBROWSER_ID_TOPIC:
     #     name = name + ' [%s]' % station.get('subtext', '??')
-    return Ref.track(uri=uri, name=name)
+    return station.name or station.url or '??'
+
+
+def station_to_ref(station):
+    # The uuid needs no percent-encoding, unparse_uri isn't needed
+    return Ref.track(uri=STATION_URI + station.stationuuid,
+                     name=station_name(station))
+
+
+def stations_to_refs(stations, memo=None):
+    # station_to_ref for a whole listing in one pass, see memoized
+    if memo is not None:
+        return memoized(stations, memo, station_to_ref)
+    track = Ref.track
+    return [track(uri=STATION_URI + station.stationuuid,
+                  name=station.name or station.url or '??')
+            for station in stations]
 
 
 def station_to_track(station):
-    logger.debug('RadioBrowser: Start translator.station_to_track')
-
-    ref = station_to_ref(station)
-    stationArtists = [Artist(name=ref.name, uri=ref.uri)]
-    albumUri = ref.uri
-    stationAlbum = Album(name=ref.name, uri=albumUri, artists=stationArtists)
-    stationName = station.get('name', ref.name)
-    track = Track(uri=ref.uri, name=stationName, album=stationAlbum)
+    uri = STATION_URI + station.stationuuid
+    name = station_name(station)
+    stationArtists = [Artist(name=name, uri=uri)]
+    stationAlbum = Album(name=name, uri=uri, artists=stationArtists)
+    track = Track(uri=uri, name=name, album=stationAlbum)
     return track
 
 
-def show_to_ref(show):
-    logger.debug('RadioBrowser: Start translator.show_to_ref')
+def stations_to_tracks(stations, memo=None):
+    # station_to_track for many stations, see memoized
+    if memo is not None:
+        return memoized(stations, memo, station_to_track)
+    return [station_to_track(station) for station in stations]
+
+
+def memoized(stations, memo, translate):
+    # Translates the stations with reuse of the models in memo, a mapping of
+    # station uuids to refs or tracks. Building a Mopidy model is expensive,
+    # the one of a station seen before is kept as long as its name is the
+    # same, e.g. for repeated browsing and searches.
+    models = []
+    created = []
+    for station in stations:
+        model = memo.get(station.stationuuid)
+        if model is None or model.name != station_name(station):
+            model = translate(station)
+            created.append((station.stationuuid, model))
+        models.append(model)
+    if created:
+        memo.update(created)
+    return models
+
 
+def show_to_ref(show):
     if show['item'] != 'show':
-        logger.debug('RadioBrowser: Expecting show but got %s' % show['item'])
+        logger.debug('RadioBrowser: Expecting show but got %s', show['item'])
     uri = unparse_uri('episodes', show.get('guide_id', '??'))
     name = show.get('text', show['URL'])
     return Ref.directory(uri=uri, name=name)
@@ -84,40 +122,25 @@ def show_to_ref(show):
 
 # Translate the TuneIn category entries to Mopidy Ref element
 def category_to_ref(category):
-    logger.debug('RadioBrowser: Start translator.category_to_ref')
-
     uri = unparse_uri('category', category['key'].strip())
     ret = Ref.directory(uri=uri, name=category['text'].strip())
     return ret
 
 
+def page_to_ref(key, page):
+    uri = '%s:%d' % (unparse_uri('category', key), page)
+    ret = Ref.directory(uri=uri, name='Next page')
+    return ret
+
+
 def country_add_name(country):
-    alpha2 = country['name'].strip()
-    # add some informations from pycountry
-    try:
-        isoCountry = pycountry.countries.get(alpha_2=alpha2)
-        if isoCountry:
-            country['a2'] = isoCountry.alpha_2
-            country['a3'] = isoCountry.alpha_3
-            country['name'] = isoCountry.name
-            country['translated_name'] = _(country['name'])
-            if hasattr(isoCountry, 'official_name'):
-                country['official'] = isoCountry.official_name
-            else:
-                country['official'] = isoCountry.name
-        else:
-            country['a2'] = alpha2
-            country['a3'] = '??'
-            country['name'] = alpha2
-            country['translated_name'] = alpha2
-            country['official'] = alpha2
-
-    except LookupError:
-        # Problem: no standard country name
-        country['a2'] = alpha2
-        country['a3'] = '??'
-        country['name'] = alpha2
-        country['official'] = alpha2
+    # add some informations from the ISO 3166 table
+    isoCountry = countries.country_info(country['name'])
+    country['a2'] = isoCountry.alpha2
+    country['a3'] = isoCountry.alpha3
+    country['name'] = isoCountry.name
+    country['translated_name'] = isoCountry.translated
+    country['official'] = isoCountry.official
 
 '''
 RadioBrowser country data structure:
@@ -125,8 +148,6 @@ RadioBrowser country data structure:
  * 'stationcount' - Count of stations using this country
 '''
 def country_to_ref(country):
-    logger.debug('RadioBrowser: Start translator.country_to_ref')
-    
     countryName = country['translated_name']
     countryUri = unparse_uri('country', country['a2'])
     ret = Ref.directory(uri=countryUri, name=countryName)
@@ -140,10 +161,10 @@ RadioBrowser state data structure:
  * 'stationcount' - Count of stations using this state
 '''
 def state_to_ref(state):
-    logger.debug('RadioBrowser: Start translator.state_to_ref')
-
     stateName = state['name'].strip()
-    stateUri = unparse_uri('state', stateName.replace(" ", ""))
+    # Qualified by the country like the key RadioBrowser.addState makes
+    stateUri = DIRECTORY_URIS['state'] + uris.state_id(
+        state.get('countrycode'), stateName)
     if (state['name'] == state['country']):
         referenzName = 'Whole country'
     else:
@@ -152,6 +173,19 @@ def state_to_ref(state):
     return ret
 
 
+def directories_to_refs(variant, directories):
+    # tag_to_ref or language_to_ref for a whole listing in one pass, the
+    # identifier is the percent-encoded name like unparse_uri makes it
+    prefix = DIRECTORY_URIS[variant]
+    directory = Ref.directory
+    quote_name = uris.quote_name
+    refs = []
+    for entry in directories:
+        name = entry['name'].strip()
+        refs.append(directory(uri=prefix + quote_name(name), name=name))
+    return refs
+
+
 '''
 RadioBrowser tag data structure:
  * 'name' - Name of the tag
@@ -159,12 +193,7 @@ RadioBrowser tag data structure:
  * 'stationcount' - Count of stations using this tag
 '''
 def tag_to_ref(tag):
-    logger.debug('RadioBrowser: Start translator.tag_to_ref')
-
-    tagName = tag['name'].strip()
-    tagUri = unparse_uri('tag', tagName.replace(" ", ""))
-    ret = Ref.directory(uri=tagUri, name=tagName)
-    return ret
+    return directories_to_refs('tag', [tag])[0]
 
 
 '''
@@ -174,17 +203,10 @@ RadioBrowser language data structure:
  * 'stationcount' - Count of stations using this language
 '''
 def language_to_ref(language):
-    logger.debug('RadioBrowser: Start translator.language_to_ref')
-
-    languageName = language['name'].strip()
-    languageUri = unparse_uri('language', languageName.replace(" ", ""))
-    ret = Ref.directory(uri=languageUri, name=languageName)
-    return ret
+    return directories_to_refs('language', [language])[0]
 
 
 def section_to_ref(section, identifier=''):
-    logger.debug('RadioBrowser: Start translator.section_to_ref')
-
     if section.get('type', 'link') == 'audio':
         ret = station_to_ref(section)
         return ret
@@ -198,8 +220,6 @@ def section_to_ref(section, identifier=''):
 
 
 def get_id_type(guide_id):
-    logger.debug('RadioBrowser: Start translator.get_id_type')
-
     return {'p': RADIOBROWSER_ID_PROGRAM,
             's': RADIOBROWSER_ID_STATION,
             'g': RADIOBROWSER_ID_GROUP,
@@ -212,14 +232,16 @@ def get_id_type(guide_id):
 
 
 def mopidy_to_radiobrowser_query(mopidy_query):
-    logger.debug('RadioBrowser: Start translator.mopidy_to_radiobrowser_query')
-
-    radiobrowser_query = []
+    # Map the Mopidy search fields to the station fields, see
+    # search.QUERY_FIELDS. Unsupported fields are ignored.
+    radiobrowser_query = {}
     for (field, values) in mopidy_query.items():
-        if not hasattr(values, '__iter__'):
+        radiobrowser_field = MOPIDY_SEARCH_FIELDS.get(field)
+        if radiobrowser_field is None:
+            continue
+        if isinstance(values, str):
             values = [values]
-        for value in values:
-            if field == 'any':
-                radiobrowser_query.append(value)
-    query = ' '.join(radiobrowser_query).encode(RADIOBROWSER_API_ENCODING)
-    return urllib.request.pathname2url(query)
+        values = [value.strip() for value in values if value and value.strip()]
+        if values:
+            radiobrowser_query.setdefault(radiobrowser_field, []).extend(values)
+    return radiobrowser_query
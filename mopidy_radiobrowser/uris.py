@@ -0,0 +1,49 @@
+from __future__ import unicode_literals
+
+from urllib.parse import quote, unquote
+
+
+# radiobrowser:<variant>:<identifier> URIs of the stations and directories.
+#
+# Names are percent-encoded, so every name has its own identifier and the
+# name is recovered from it: 'Hip Hop' and 'HipHop' don't collide, and a
+# directory is rebuilt from its URI without browsing its parent. States
+# are qualified by their country code, radiobrowser:state:DE:Saxony, the
+# code alone stands for the whole country.
+
+SCHEME = 'radiobrowser'
+
+
+def quote_name(name):
+    return quote(name.strip(), safe='')
+
+
+def unquote_name(identifier):
+    return unquote(identifier)
+
+
+def unparse(variant, *names):
+    return '%s:%s:%s' % (SCHEME, variant, ':'.join(quote_name(name)
+                                                   for name in names))
+
+
+def state_id(countrycode, name=None):
+    # The identifier of a state, of the whole country without a name
+    if not countrycode:
+        # Nothing to qualify the state with
+        return quote_name(name or '')
+    if name is None or name.strip() == countrycode:
+        return quote_name(countrycode)
+    return '%s:%s' % (quote_name(countrycode), quote_name(name))
+
+
+def parse_state_id(identifier):
+    # Returns (countrycode, name), name is None for the whole country.
+    # Identifiers of the old form are state names without country code.
+    countrycode, separator, name = identifier.partition(':')
+    if separator:
+        return unquote_name(countrycode), unquote_name(name)
+    name = unquote_name(identifier)
+    if len(name) == 2 and name.isalpha() and name.isupper():
+        return name, None
+    return '', name
@@ -0,0 +1,118 @@
+from __future__ import unicode_literals
+
+import collections
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+# A response body and the validators to ask the server if it changed
+Validated = collections.namedtuple(
+    'Validated', ('etag', 'lastModified', 'body'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    uri TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body TEXT
+);
+'''
+
+
+def conditional_headers(validated):
+    # Request headers that let the server answer 304 Not Modified
+    headers = {}
+    if validated is not None:
+        if validated.etag:
+            headers['If-None-Match'] = validated.etag
+        if validated.lastModified:
+            headers['If-Modified-Since'] = validated.lastModified
+    return headers
+
+
+def response_validators(headers):
+    # Returns (etag, last-modified) of a response, None for missing ones
+    return headers.get('etag'), headers.get('last-modified')
+
+
+class ValidatorStore(object):
+    # Bodies of revalidated responses with their ETag and Last-Modified.
+    #
+    # Unlike the response cache, entries don't expire: once a response is
+    # stale it is revalidated with a conditional request and its body reused
+    # if the server answers 304. The most recently used entries are kept in
+    # memory, all of them in an optional SQLite file, so revalidation is
+    # cheap after a restart too.
+
+    def __init__(self, path=None, maxsize=256):
+        self._path = str(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._connection = None
+        self._entries = OrderedDict()
+        self.maxsize = maxsize
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self._path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _remember(self, uri, validated):
+        self._entries[uri] = validated
+        self._entries.move_to_end(uri)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, uri):
+        with self._lock:
+            validated = self._entries.get(uri)
+            if validated is not None:
+                self._entries.move_to_end(uri)
+                return validated
+            if self._path is None:
+                return None
+            try:
+                row = self._connect().execute(
+                    'SELECT etag, last_modified, body FROM responses '
+                    'WHERE uri = ?', (uri,)).fetchone()
+                if row is None:
+                    return None
+                validated = Validated(row[0], row[1], json.loads(row[2]))
+            except (sqlite3.Error, ValueError) as e:
+                logger.info('RadioBrowser: Reading cached response failed: %s',
+                            e)
+                return None
+            self._remember(uri, validated)
+            return validated
+
+    def set(self, uri, etag, lastModified, body):
+        if not etag and not lastModified:
+            # Nothing to revalidate with
+            return
+        validated = Validated(etag, lastModified, body)
+        with self._lock:
+            self._remember(uri, validated)
+            if self._path is None:
+                return
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute(
+                        'INSERT OR REPLACE INTO responses '
+                        '(uri, etag, last_modified, body) VALUES (?, ?, ?, ?)',
+                        (uri, etag, lastModified, json.dumps(body)))
+            except sqlite3.Error as e:
+                logger.info('RadioBrowser: Storing cached response failed: %s',
+                            e)
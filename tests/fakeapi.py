@@ -0,0 +1,135 @@
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class Raw(object):
+    # A route answering with the given bytes instead of JSON. An endless
+    # response repeats the body until the client hangs up, like a radio
+    # stream does.
+
+    def __init__(self, body, contentType, endless=False):
+        self.body = body
+        self.contentType = contentType
+        self.endless = endless
+
+
+class FakeApi(object):
+    # Local stand-in for a RadioBrowser API mirror.
+    #
+    # 'routes' maps request paths to the JSON data or a Raw response to
+    # return, or to a callable that gets the parsed query and returns one of
+    # them. JSON responses carry an ETag and are answered with 304 Not
+    # Modified if the client already has them. Paths without a route are
+    # passed to 'handler' with the query, if given, otherwise or if it
+    # returns None they answer 404. Every request waits 'latency' seconds
+    # before it is served, and 'errorRate' of them fail with 503.
+
+    def __init__(self, routes=None, latency=0.0, handler=None, errorRate=0.0,
+                 seed=0):
+        self.routes = routes or {}
+        self.latency = latency
+        self.handler = handler
+        self.errorRate = errorRate
+        self._random = random.Random(seed)
+        self.requests = []
+        self.notModified = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def host(self):
+        return '127.0.0.1:%d' % self._server.server_address[1]
+
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                api._serve(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def count(self, path):
+        with self._lock:
+            return sum(1 for request in self.requests
+                       if urlparse(request).path == path)
+
+    def _serve(self, handler):
+        with self._lock:
+            self.requests.append(handler.path)
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(handler.path)
+        if self.errorRate:
+            with self._lock:
+                failing = self._random.random() < self.errorRate
+            if failing:
+                handler.send_error(503)
+                return
+        route = self.routes.get(url.path)
+        if route is None and self.handler is not None:
+            route = self.handler(unquote(url.path), parse_qs(url.query))
+        if route is None:
+            handler.send_error(404)
+            return
+        if callable(route):
+            route = route(parse_qs(url.query))
+        if isinstance(route, Raw):
+            self._serveRaw(handler, route)
+            return
+        body = json.dumps(route).encode('utf-8')
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if handler.headers.get('If-None-Match') == etag:
+            with self._lock:
+                self.notModified += 1
+            handler.send_response(304)
+            handler.send_header('ETag', etag)
+            handler.end_headers()
+            return
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('ETag', etag)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _serveRaw(self, handler, route):
+        handler.send_response(200)
+        if route.contentType:
+            handler.send_header('Content-Type', route.contentType)
+        if not route.endless:
+            handler.send_header('Content-Length', str(len(route.body)))
+        handler.end_headers()
+        try:
+            handler.wfile.write(route.body)
+            while route.endless:
+                handler.wfile.write(route.body)
+        except OSError:
+            pass
@@ -0,0 +1,55 @@
+from __future__ import unicode_literals
+
+import json
+from urllib.parse import urlparse
+
+import requests
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse(object):
+
+    status_code = 200
+    headers = {}
+
+    def __init__(self, data):
+        self._body = json.dumps(data).encode('utf-8')
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self._body)
+
+    def iter_content(self, size):
+        for i in range(0, len(self._body), size):
+            yield self._body[i:i + size]
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    # Answers requests by path from routes; hosts in failing are unreachable
+
+    def __init__(self, routes, failing=()):
+        self.routes = routes
+        self.failing = failing
+        self.requested = []
+        self.timeouts = []
+
+    def get(self, uri, **kwargs):
+        self.requested.append(uri)
+        self.timeouts.append(kwargs.get('timeout'))
+        for host in self.failing:
+            if uri.startswith('http://' + host + '/'):
+                raise requests.ConnectionError('down')
+        return FakeResponse(self.routes[urlparse(uri).path])
@@ -0,0 +1,63 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from benchmarks import run
+from benchmarks.fixtures import Fixtures
+
+
+class FixturesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fixtures = Fixtures('127.0.0.1:1', tags=50, stations=300,
+                                 languages=10)
+
+    def test_fixtures_are_reproducible(self):
+        other = Fixtures('127.0.0.1:1', tags=50, stations=300, languages=10)
+
+        self.assertEqual(self.fixtures.stations, other.stations)
+
+    def test_listing_is_ordered_and_paged(self):
+        tags = self.fixtures.handle('/json/tags', {
+            'order': ['stationcount'], 'reverse': ['true'],
+            'offset': ['5'], 'limit': ['10']})
+
+        self.assertEqual(len(tags), 10)
+        counts = [tag['stationcount'] for tag in tags]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_stations_by_uuid(self):
+        uuids = [s['stationuuid'] for s in self.fixtures.stations[:3]]
+
+        stations = self.fixtures.handle('/json/stations/byuuid',
+                                        {'uuids': [','.join(uuids)]})
+
+        self.assertEqual([s['stationuuid'] for s in stations], uuids)
+
+    def test_unknown_path(self):
+        self.assertIsNone(self.fixtures.handle('/json/unknown', {}))
+
+
+class RunTest(unittest.TestCase):
+
+    def test_report(self):
+        options = run.parse_args(['--scale', '0.01', '--repeat', '2'])
+
+        report = run.run(options)
+
+        names = [summary['name'] for summary in report['cold']]
+        self.assertIn('browse countries', names)
+        self.assertIn('lookup 100', names)
+        self.assertIn('browse large country', names)
+        self.assertEqual(options.max_stations,
+                         run.ext_defaults().getint('max_stations'))
+        self.assertEqual(len(report['cold']), len(report['warm']))
+        for summary in report['cold'] + report['warm']:
+            self.assertEqual(summary['errors'], 0, summary['name'])
+            self.assertEqual(summary['calls'], 2)
+        # Nothing is fetched twice by a warm backend
+        for summary in report['warm']:
+            self.assertEqual(summary['requests'], 0, summary['name'])
+        self.assertGreaterEqual(report['peakRss'], report['startRss'])
+        self.assertEqual(report['fixtures']['stations'], 300)
+        self.assertIn('Peak RSS', run.format_report(report))
@@ -0,0 +1,62 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from mopidy_radiobrowser import radiobrowser
+
+from tests.fakes import FakeClock
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = radiobrowser.ResponseCache(maxsize=2, clock=self.clock)
+
+    def test_hit_and_miss(self):
+        self.assertEqual(self.cache.get('a'), (False, None))
+        self.cache.set('a', [1], 10)
+        self.assertEqual(self.cache.get('a'), (True, [1]))
+        self.assertEqual(
+            self.cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_expiry(self):
+        self.cache.set('a', 'value', 10)
+        self.clock.now += 11
+        self.assertEqual(self.cache.get('a'), (False, None))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        self.cache.set('a', 1, 10)
+        self.cache.set('b', 2, 10)
+        self.cache.get('a')
+        self.cache.set('c', 3, 10)
+        self.assertEqual(self.cache.get('b'), (False, None))
+        self.assertEqual(self.cache.get('a'), (True, 1))
+        self.assertEqual(self.cache.get('c'), (True, 3))
+
+    def test_clear(self):
+        self.cache.set('a', 1, 10)
+        self.cache.clear()
+        self.assertEqual(self.cache.get('a'), (False, None))
+
+    def test_zero_ttl_is_not_cached(self):
+        self.cache.set('a', 1, 0)
+        self.assertEqual(self.cache.get('a'), (False, None))
+
+
+class ResponseTtlTest(unittest.TestCase):
+
+    def test_endpoint_classes(self):
+        base = 'http://mirror/json/'
+        self.assertEqual(radiobrowser.response_ttl(base + 'tags'), 86400)
+        self.assertEqual(
+            radiobrowser.response_ttl(base + 'states/DE/'), 86400)
+        self.assertEqual(
+            radiobrowser.response_ttl(base + 'stations/topvote/50'), 300)
+        self.assertEqual(radiobrowser.response_ttl(base + 'stations'), 0)
+        self.assertEqual(
+            radiobrowser.response_ttl(base + 'stations/changed?x=1'), 0)
+        self.assertEqual(
+            radiobrowser.response_ttl(base + 'stations/bytagexact/tags'),
+            radiobrowser.DEFAULT_TTL)
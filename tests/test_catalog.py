@@ -0,0 +1,180 @@
+from __future__ import unicode_literals
+
+import threading
+import unittest
+
+import requests
+
+from mopidy_radiobrowser import radiobrowser
+from mopidy_radiobrowser import catalog
+from mopidy_radiobrowser.catalog import Catalog
+
+from tests.fakeapi import FakeApi
+
+STATIONS = [
+    {
+        'stationuuid': 'uuid-1',
+        'changeuuid': 'change-1',
+        'name': 'Radio One',
+        'url': 'http://one.example/stream',
+        'tags': 'rock,Pop',
+        'countrycode': 'DE',
+        'state': 'Saxony',
+        'language': 'german',
+        'votes': 10,
+        'clickcount': 5,
+        'lastchangetime': '2020-01-01 10:00:00',
+    },
+    {
+        'stationuuid': 'uuid-2',
+        'changeuuid': 'change-2',
+        'name': 'Radio Two',
+        'url': 'http://two.example/stream',
+        'tags': 'rock',
+        'countrycode': 'DE',
+        'state': '',
+        'language': 'german,english',
+        'votes': 20,
+        'clickcount': 1,
+        'lastchangetime': '2020-01-02 10:00:00',
+    },
+]
+
+
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = Catalog(':memory:')
+        self.catalog.replaceStations(STATIONS)
+
+    def tearDown(self):
+        self.catalog.close()
+
+    def test_populated(self):
+        self.assertTrue(self.catalog.isPopulated())
+        self.assertFalse(Catalog(':memory:').isPopulated())
+
+    def test_last_change_is_remembered(self):
+        self.assertEqual(self.catalog.getMeta('lastchangeuuid'), 'change-2')
+
+    def test_derived_listings(self):
+        self.assertEqual(
+            self.catalog.countries(), [{'name': 'DE', 'stationcount': 2}])
+        self.assertEqual(
+            self.catalog.tags(),
+            [{'name': 'rock', 'stationcount': 2},
+             {'name': 'pop', 'stationcount': 1}])
+        self.assertEqual(
+            self.catalog.languages(),
+            [{'name': 'german', 'stationcount': 2},
+             {'name': 'english', 'stationcount': 1}])
+
+    def test_paged_listings(self):
+        self.assertEqual(
+            self.catalog.tags(minCount=2),
+            [{'name': 'rock', 'stationcount': 2}])
+        self.assertEqual(
+            self.catalog.languages(limit=1, offset=1),
+            [{'name': 'english', 'stationcount': 1}])
+
+    def test_station_queries(self):
+        self.assertEqual(self.catalog.station('uuid-1')['name'], 'Radio One')
+        self.assertIsNone(self.catalog.station('missing'))
+        names = [s['name'] for s in self.catalog.stationsByTag('Rock')]
+        self.assertEqual(names, ['Radio One', 'Radio Two'])
+        names = [s['name'] for s in self.catalog.topVoted(1)]
+        self.assertEqual(names, ['Radio Two'])
+        names = [s['name'] for s in self.catalog.allStations(batchSize=1)]
+        self.assertEqual(names, ['Radio One', 'Radio Two'])
+
+    def test_incremental_update(self):
+        changed = dict(STATIONS[1], tags='jazz', changeuuid='change-3')
+        self.catalog.updateStations(iter([changed]))
+
+        names = [s['name'] for s in self.catalog.stationsByTag('rock')]
+        self.assertEqual(names, ['Radio One'])
+        self.assertEqual(
+            self.catalog.stationsByTag('jazz')[0]['changeuuid'], 'change-3')
+
+    def test_change_records_keep_missing_fields(self):
+        # Records of stations/changed lack e.g. url_resolved and the counts
+        self.catalog.replaceStations(
+            [dict(STATIONS[0], url_resolved='http://one.example/live')]
+            + STATIONS[1:])
+        changed = {'stationuuid': 'uuid-1', 'changeuuid': 'change-3',
+                   'name': 'Radio Uno', 'url': 'http://one.example/stream'}
+
+        self.catalog.updateStations([changed])
+
+        station = self.catalog.station('uuid-1')
+        self.assertEqual(station['name'], 'Radio Uno')
+        self.assertEqual(station['url_resolved'], 'http://one.example/live')
+        self.assertEqual(station['clickcount'], 5)
+        names = [s['name'] for s in self.catalog.stationsByTag('pop')]
+        self.assertEqual(names, ['Radio Uno'])
+
+    def test_queries_are_not_blocked_by_a_download(self):
+        answered = []
+
+        def stations():
+            # Query from another thread while the download is received
+            query = threading.Thread(target=lambda: answered.append(
+                self.catalog.stationsByTag('rock')))
+            query.start()
+            query.join(2)
+            yield dict(STATIONS[0], name='Radio Uno')
+
+        self.catalog.updateStations(stations())
+
+        self.assertEqual(len(answered), 1)
+        self.assertEqual(self.catalog.station('uuid-1')['name'], 'Radio Uno')
+
+    def test_incomplete_download_keeps_the_catalog(self):
+        def stations():
+            yield dict(STATIONS[0], name='Radio Uno')
+            raise IOError('connection lost')
+
+        with self.assertRaises(IOError):
+            self.catalog.replaceStations(stations())
+
+        self.assertEqual(self.catalog.station('uuid-1')['name'], 'Radio One')
+        self.assertEqual(len(list(self.catalog.allStations())), 2)
+        self.assertTrue(self.catalog.isPopulated())
+
+    def test_stations_are_staged_in_batches(self):
+        many = [dict(STATIONS[0], stationuuid='uuid-%d' % i,
+                     changeuuid='change-%d' % i)
+                for i in range(catalog.STAGING_BATCH + 10)]
+
+        count = self.catalog.replaceStations([{'name': 'no uuid'}] + many)
+
+        self.assertEqual(count, len(many))
+        self.assertEqual(len(self.catalog.stationsByTag('pop')), len(many))
+
+
+class CatalogBrowseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = Catalog(':memory:')
+        self.addCleanup(self.catalog.close)
+        self.catalog.replaceStations(STATIONS)
+        self.api = FakeApi({'/json/stations/topclick/50': [
+            dict(STATIONS[1], clickcount=99)]}).start()
+        self.addCleanup(self.api.stop)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+        self.browser = radiobrowser.RadioBrowser(
+            5000, self.session, catalog=self.catalog, hosts=[self.api.host])
+
+    def test_top_lists_are_current(self):
+        clicks = self.browser.browseCategory('clicks')
+
+        self.assertEqual([s['stationuuid'] for s in clicks], ['uuid-2'])
+
+    def test_top_lists_fall_back_to_the_catalog(self):
+        votes = self.browser.browseCategory('votes')
+
+        self.assertEqual([s['stationuuid'] for s in votes],
+                         ['uuid-2', 'uuid-1'])
+        self.assertEqual(self.browser.browseCategory('tags'),
+                         self.catalog.tags())
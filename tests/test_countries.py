@@ -0,0 +1,58 @@
+from __future__ import unicode_literals
+
+import subprocess
+import sys
+import unittest
+
+from mopidy_radiobrowser import countries, translator
+
+
+class CountryTableTest(unittest.TestCase):
+
+    def test_table_is_built_once_per_language(self):
+        table = countries.country_table('de')
+
+        self.assertIs(countries.country_table('de'), table)
+        self.assertEqual(table['DE'].translated, 'Deutschland')
+        self.assertEqual(countries.country_table('en')['DE'].translated,
+                         'Germany')
+
+    def test_country_info(self):
+        country = countries.country_info(' fr', 'en')
+
+        self.assertEqual(country.alpha3, 'FRA')
+        self.assertEqual(country.name, 'France')
+        self.assertEqual(country.official, 'French Republic')
+
+    def test_unknown_country_keeps_its_code(self):
+        self.assertEqual(countries.country_info('XX', 'en'),
+                         countries.Country('XX', '??', 'XX', 'XX', 'XX'))
+
+    def test_unknown_language_uses_english_names(self):
+        self.assertEqual(countries.country_info('DE', 'xx').translated,
+                         'Germany')
+
+    def test_country_add_name(self):
+        country = {'name': 'AT', 'stationcount': 3}
+
+        translator.country_add_name(country)
+
+        self.assertEqual(country['a2'], 'AT')
+        self.assertEqual(country['a3'], 'AUT')
+        self.assertEqual(country['name'], 'Austria')
+
+    def test_sort_key(self):
+        names = ['b', 'A', 'a']
+
+        self.assertEqual(sorted(names, key=countries.sort_key)[-1], 'b')
+
+
+class LazyImportTest(unittest.TestCase):
+
+    def test_translator_does_not_load_pycountry(self):
+        # Run in a fresh interpreter, other tests may have loaded it
+        code = ('import sys; from mopidy_radiobrowser import translator; '
+                'print("pycountry" in sys.modules)')
+        output = subprocess.check_output([sys.executable, '-c', code])
+
+        self.assertEqual(output.strip(), b'False')
@@ -0,0 +1,167 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from mopidy_radiobrowser import radiobrowser
+from mopidy_radiobrowser.catalog import Catalog
+from mopidy_radiobrowser.station import Station
+
+from tests.fakeapi import FakeApi
+from tests.fakes import FakeClock
+
+STATIONS = [
+    {'stationuuid': 'uuid-1', 'name': 'Radio Dresden', 'countrycode': 'DE',
+     'state': 'Saxony'},
+    {'stationuuid': 'uuid-2', 'name': 'Radio Berlin', 'countrycode': 'DE',
+     'state': 'Berlin'},
+    {'stationuuid': 'uuid-3', 'name': 'Radio Leipzig', 'countrycode': 'DE',
+     'state': 'Saxony '},
+    {'stationuuid': 'uuid-4', 'name': 'Radio Germany', 'countrycode': 'DE',
+     'state': ''},
+]
+
+COUNTRY = '/json/stations/bycountrycodeexact/DE'
+
+
+class CountryIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = radiobrowser.CountryIndex(
+            'DE', [Station.fromApi(station) for station in STATIONS])
+
+    def test_states_are_counted(self):
+        self.assertEqual(self.index.states(), [
+            {'name': 'Berlin', 'country': 'DE', 'countrycode': 'DE',
+             'stationcount': 1},
+            {'name': 'Saxony', 'country': 'DE', 'countrycode': 'DE',
+             'stationcount': 2},
+        ])
+
+    def test_stations_by_state(self):
+        self.assertEqual(self.index.stationIds('Saxony'), ('uuid-1', 'uuid-3'))
+        self.assertEqual(self.index.stationIds('Bavaria'), ())
+
+    def test_whole_country_lists_stations_with_a_state(self):
+        self.assertEqual(self.index.stationIds(),
+                         ('uuid-1', 'uuid-2', 'uuid-3'))
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.total, 4)
+
+
+class CountryBrowseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeApi({COUNTRY: STATIONS}).start()
+        self.addCleanup(self.api.stop)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+        self.browser = radiobrowser.RadioBrowser(
+            5000, self.session, hosts=[self.api.host])
+
+    def browseCountry(self):
+        country = {'name': 'DE', 'a2': 'DE', 'stationcount': 4}
+        self.browser.addCountry(country)
+        states = self.browser.browseDirectory(country)
+        for state in states:
+            self.browser.addState(state)
+        return states
+
+    def test_country_and_states_need_one_request(self):
+        states = self.browseCountry()
+        saxony = self.browser.getState('DE:Saxony')
+        self.browser.addState({'name': 'DE', 'country': 'DE',
+                               'countrycode': 'DE', 'stationcount': 1})
+        whole = self.browser.getState('DE')
+
+        self.assertEqual([state['name'] for state in states],
+                         ['Berlin', 'Saxony'])
+        self.assertEqual([s.stationuuid for s in self.browser.stations(saxony)],
+                         ['uuid-1', 'uuid-3'])
+        self.assertEqual([s.stationuuid for s in self.browser.stations(whole)],
+                         ['uuid-1', 'uuid-2', 'uuid-3'])
+        self.assertEqual(len(self.api.requests), 1)
+        self.assertEqual(self.api.count(COUNTRY), 1)
+
+    def test_failed_country_is_empty(self):
+        self.api.routes = {}
+
+        self.assertEqual(self.browseCountry(), [])
+        self.browser.addState({'name': 'DE', 'country': 'DE',
+                               'countrycode': 'DE', 'stationcount': 1})
+        self.assertEqual(self.browser.stations(self.browser.getState('DE')),
+                         [])
+
+    def test_country_without_states_is_kept(self):
+        clock = FakeClock()
+        self.browser._countries = radiobrowser.ResponseCache(16, clock)
+        self.api.routes = {COUNTRY: [STATIONS[3]]}
+
+        self.assertEqual(self.browseCountry(), [])
+        clock.now += radiobrowser.NEGATIVE_TTL + 1
+        self.assertEqual(self.browseCountry(), [])
+
+        self.assertEqual(self.api.count(COUNTRY), 1)
+
+    def test_failed_country_is_fetched_again(self):
+        clock = FakeClock()
+        self.browser._countries = radiobrowser.ResponseCache(16, clock)
+        self.browser._responses = radiobrowser.ResponseCache(16, clock)
+        self.api.routes = {}
+
+        self.browseCountry()
+        clock.now += radiobrowser.NEGATIVE_TTL + 1
+        self.browseCountry()
+
+        self.assertEqual(self.api.count(COUNTRY), 2)
+
+    def test_large_country_is_not_looked_up_again(self):
+        # More stations than the registry holds
+        stations = [{'stationuuid': 'uuid-%d' % i, 'name': 'Radio %d' % i,
+                     'countrycode': 'DE', 'state': 'Saxony'}
+                    for i in range(20)]
+        self.api.routes = {COUNTRY: stations,
+                           '/json/stations/byuuid': stations}
+        self.browser = radiobrowser.RadioBrowser(
+            5000, self.session, hosts=[self.api.host], maxStations=5)
+        self.browseCountry()
+        self.browser.addState({'name': 'DE', 'country': 'DE',
+                               'countrycode': 'DE', 'stationcount': 1})
+
+        for stateId in ('DE', 'DE:Saxony'):
+            found = self.browser.addStations(
+                self.browser.stations(self.browser.getState(stateId)))
+            self.assertEqual(len(found), 20)
+
+        self.assertEqual(self.api.requests, [COUNTRY])
+
+    def test_reload_drops_the_index(self):
+        self.browseCountry()
+        self.browser.reload()
+        self.browseCountry()
+
+        self.assertEqual(self.api.count(COUNTRY), 2)
+
+
+class CatalogCountryTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.catalog = Catalog(os.path.join(directory, 'catalog.sqlite3'))
+        self.addCleanup(self.catalog.close)
+        self.catalog.replaceStations(STATIONS)
+
+    def test_index_is_built_from_the_catalog(self):
+        browser = radiobrowser.RadioBrowser(1000, catalog=self.catalog,
+                                            hosts=['unreachable.invalid'])
+
+        index = browser.countryIndex('DE')
+
+        self.assertEqual([state['name'] for state in index.states()],
+                         ['Berlin', 'Saxony'])
+        self.assertEqual(index.stationIds('Saxony'), ('uuid-1', 'uuid-3'))
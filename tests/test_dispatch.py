@@ -0,0 +1,153 @@
+from __future__ import unicode_literals
+
+import threading
+import unittest
+
+import pykka
+from mopidy.models import Track
+
+from mopidy_radiobrowser.dispatch import DispatchingInbox
+from mopidy_radiobrowser.playback import RadioBrowserPlayback
+from mopidy_radiobrowser.station import Station
+
+
+class SlowLibrary(object):
+    pykka_traversable = True
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def browse(self, uri):
+        self.calls.append(uri)
+        if uri == 'slow':
+            self.release.wait(5)
+        if uri == 'broken':
+            raise ValueError(uri)
+        return [uri]
+
+
+class Future(object):
+
+    def __init__(self, value=None):
+        self._value = value
+
+    def get(self, timeout=None):
+        return self._value
+
+
+class FakeAudio(object):
+
+    def __init__(self):
+        self.uris = []
+
+    def set_source_setup_callback(self, callback):
+        return Future()
+
+    def set_uri(self, uri, live_stream=False, download=False):
+        self.uris.append(uri)
+        return Future(True)
+
+
+class SlowRadioBrowser(object):
+
+    def getStation(self, stationId):
+        return Station.fromApi({'stationuuid': stationId, 'name': 'Radio',
+                                'url': 'http://stream/' + stationId})
+
+
+class SlowResolver(object):
+    # Resolves a station like the StreamResolver probing a slow stream
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def resolve(self, station):
+        self.release.wait(5)
+        return station.url
+
+    def prefetchAround(self, station):
+        pass
+
+
+class FakeBackend(pykka.ThreadingActor):
+
+    @staticmethod
+    def _create_actor_inbox():
+        return DispatchingInbox()
+
+    def __init__(self, workers, library, audio=None):
+        super(FakeBackend, self).__init__()
+        self.library = library
+        self.radiobrowser = SlowRadioBrowser()
+        self.resolver = SlowResolver()
+        self.playback = RadioBrowserPlayback(audio, self)
+        self.actor_inbox.bind(self, workers)
+
+    def ping(self):
+        return 'pong'
+
+    def on_stop(self):
+        self.actor_inbox.close()
+
+
+class DispatchingInboxTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = SlowLibrary()
+
+    def start(self, workers=2, audio=None):
+        ref = FakeBackend.start(workers, self.library, audio)
+        self.addCleanup(ref.stop)
+        return ref.proxy()
+
+    def test_slow_call_does_not_block_the_actor(self):
+        backend = self.start()
+
+        slow = backend.library.browse('slow')
+        self.assertEqual(backend.ping().get(timeout=1), 'pong')
+        self.assertEqual(backend.library.browse('fast').get(timeout=1),
+                         ['fast'])
+
+        self.library.release.set()
+        self.assertEqual(slow.get(timeout=1), ['slow'])
+
+    def test_identical_calls_share_one_execution(self):
+        backend = self.start()
+
+        first = backend.library.browse('slow')
+        second = backend.library.browse('slow')
+        self.library.release.set()
+
+        self.assertEqual(first.get(timeout=1), ['slow'])
+        self.assertEqual(second.get(timeout=1), ['slow'])
+        self.assertIsNot(first.get(), second.get())
+        self.assertEqual(self.library.calls, ['slow'])
+
+    def test_errors_reach_the_caller(self):
+        backend = self.start()
+
+        with self.assertRaises(ValueError):
+            backend.library.browse('broken').get(timeout=1)
+        self.assertEqual(backend.ping().get(timeout=1), 'pong')
+
+    def test_stream_resolution_does_not_block_the_actor(self):
+        audio = FakeAudio()
+        backend = self.start(audio=audio)
+        resolver = backend.resolver.get()
+        self.addCleanup(resolver.release.set)
+
+        # Core switches tracks with change_track, not translate_uri
+        changed = backend.playback.change_track(
+            Track(uri='radiobrowser:station:uuid-1'))
+        self.assertEqual(backend.ping().get(timeout=1), 'pong')
+
+        resolver.release.set()
+        self.assertTrue(changed.get(timeout=1))
+        self.assertEqual(audio.uris, ['http://stream/uuid-1'])
+
+    def test_without_workers_the_actor_serves_every_call(self):
+        backend = self.start(workers=0)
+
+        self.assertEqual(backend.library.browse('fast').get(timeout=1),
+                         ['fast'])
@@ -21,3 +21,18 @@ class ExtensionTest(unittest.TestCase):
         schema = ext.get_config_schema()
 
         self.assertIn('timeout', schema)
+        self.assertIn('connect_timeout', schema)
+        self.assertIn('https', schema)
+        self.assertIn('catalog', schema)
+        self.assertIn('catalog_refresh', schema)
+        self.assertIn('cache_size', schema)
+        self.assertIn('min_stationcount', schema)
+        self.assertIn('page_size', schema)
+        self.assertIn('max_stations', schema)
+        self.assertIn('max_directories', schema)
+        self.assertIn('search_limit', schema)
+        self.assertIn('prefetch', schema)
+        self.assertIn('prefetch_workers', schema)
+        self.assertIn('prefetch_connect', schema)
+        self.assertIn('workers', schema)
+        self.assertIn('trace', schema)
@@ -0,0 +1,35 @@
+from __future__ import unicode_literals
+
+import json
+import unittest
+
+from mopidy_radiobrowser.radiobrowser import iter_json_array
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+
+    def test_decodes_split_chunks(self):
+        entries = [{'name': 'rock \\u00e4 ö', 'stationcount': 123},
+                   {'name': 'jazz, "modern"', 'stationcount': 4},
+                   12345, 'text', None]
+        data = json.dumps(entries, ensure_ascii=False).encode('utf-8')
+        for size in (1, 2, 7, 64, len(data)):
+            self.assertEqual(
+                list(iter_json_array(chunked(data, size))), entries)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array([b' [ ', b'] '])), [])
+
+    def test_yields_before_end(self):
+        entries = iter_json_array(iter([b'[{"a": 1},', b' {"b"']))
+        self.assertEqual(next(entries), {'a': 1})
+        with self.assertRaises(ValueError):
+            next(entries)
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"a": 1}']))
@@ -0,0 +1,56 @@
+from __future__ import unicode_literals
+
+import unittest
+from types import SimpleNamespace
+
+import requests
+
+from mopidy_radiobrowser import radiobrowser
+from mopidy_radiobrowser.library import RadioBrowserLibrary
+
+from tests.fakeapi import FakeApi
+
+STATIONS = [{'stationuuid': 'uuid-%d' % i, 'name': 'Radio %d' % i,
+             'url': 'http://radio%d/' % i} for i in range(5)]
+
+TAG = '/json/stations/bytagexact/jazz'
+
+
+class PrefetchingResolver(object):
+    prefetching = True
+
+    def __init__(self):
+        self.prefetched = []
+
+    def prefetch(self, stations):
+        self.prefetched.append(list(stations))
+
+
+class BrowsePrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeApi({TAG: STATIONS}).start()
+        self.addCleanup(self.api.stop)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+        # Smaller than the listing, its first stations are evicted
+        self.browser = radiobrowser.RadioBrowser(
+            5000, self.session, hosts=[self.api.host], maxStations=2)
+        self.resolver = PrefetchingResolver()
+        self.library = RadioBrowserLibrary(SimpleNamespace(
+            radiobrowser=self.browser, resolver=self.resolver))
+
+    def test_listed_stations_are_prefetched_without_requests(self):
+        self.browser.addTag({'name': 'jazz', 'stationcount': 5})
+
+        refs = self.library.browse('radiobrowser:tag:jazz')
+
+        self.assertEqual(len(refs), 5)
+        self.assertEqual([s.stationuuid for s in self.resolver.prefetched[0]],
+                         [s['stationuuid'] for s in STATIONS])
+        self.assertEqual(self.api.requests, [TAG])
+
+    def test_directories_are_not_prefetched(self):
+        self.library.browse('radiobrowser:root')
+
+        self.assertEqual(self.resolver.prefetched, [])
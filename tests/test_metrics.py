@@ -0,0 +1,139 @@
+from __future__ import unicode_literals
+
+import unittest
+
+import requests
+from tornado.testing import AsyncHTTPTestCase
+from tornado.web import Application
+
+from mopidy_radiobrowser import metrics, radiobrowser
+
+from tests.fakeapi import FakeApi
+
+TAGS = [{'name': 'jazz', 'stationcount': 10}]
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        metrics.clear()
+        self.addCleanup(metrics.clear)
+
+    def test_counters_and_gauges(self):
+        metrics.inc('radiobrowser_api_requests_total', endpoint='tags',
+                    status='200')
+        metrics.inc('radiobrowser_api_requests_total', 2, endpoint='tags',
+                    status='200')
+        metrics.register('test', lambda: [
+            ('radiobrowser_registry_entries', {'registry': 'stations'}, 5)])
+
+        text = metrics.exposition()
+
+        self.assertIn('# TYPE radiobrowser_api_requests_total counter\n'
+                      'radiobrowser_api_requests_total'
+                      '{endpoint="tags",status="200"} 3\n', text)
+        self.assertIn('radiobrowser_registry_entries{registry="stations"} 5\n',
+                      text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics.observe('radiobrowser_resolve_seconds', 0.003)
+        metrics.observe('radiobrowser_resolve_seconds', 0.2)
+        metrics.observe('radiobrowser_resolve_seconds', 60)
+
+        text = metrics.exposition()
+
+        self.assertIn('radiobrowser_resolve_seconds_bucket{le="0.005"} 1\n',
+                      text)
+        self.assertIn('radiobrowser_resolve_seconds_bucket{le="0.25"} 2\n',
+                      text)
+        self.assertIn('radiobrowser_resolve_seconds_bucket{le="+Inf"} 3\n',
+                      text)
+        self.assertIn('radiobrowser_resolve_seconds_sum 60.203\n', text)
+        self.assertIn('radiobrowser_resolve_seconds_count 3\n', text)
+
+    def test_label_values_are_escaped(self):
+        metrics.inc('radiobrowser_resolve_total', result='a"b\\')
+
+        self.assertIn('{result="a\\"b\\\\"}', metrics.exposition())
+
+    def test_unregistered_collector_is_not_read(self):
+        metrics.register('test', lambda: [
+            ('radiobrowser_registry_entries', {}, 1)])
+        metrics.unregister('test')
+
+        self.assertEqual(metrics.exposition(), '\n')
+
+    def test_timed_iteration_excludes_the_caller(self):
+        for _ in metrics.timed(range(3), 'radiobrowser_api_read_seconds'):
+            pass
+
+        self.assertIn('radiobrowser_api_read_seconds_count 1\n',
+                      metrics.exposition())
+
+    def test_endpoint_names(self):
+        self.assertEqual(radiobrowser.endpoint_name(
+            '/json/stations/bytagexact/jazz'), 'stations/bytagexact')
+        self.assertEqual(radiobrowser.endpoint_name(
+            '/json/tags?order=stationcount'), 'tags')
+        self.assertEqual(radiobrowser.endpoint_name(
+            '/json/states/Germany/'), 'states')
+        self.assertEqual(radiobrowser.endpoint_name('/json/stations'),
+                         'stations')
+
+
+class ClientMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        metrics.clear()
+        self.addCleanup(metrics.clear)
+        self.api = FakeApi({'/json/tags': TAGS}).start()
+        self.addCleanup(self.api.stop)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+        self.browser = radiobrowser.RadioBrowser(
+            5000, self.session, hosts=[self.api.host])
+
+    def test_requests_and_caches_are_counted(self):
+        metrics.register('radiobrowser', self.browser.gauges)
+
+        self.assertEqual(list(self.browser.iterCategory('tags')), TAGS)
+        self.browser.getStation('unknown')
+
+        text = metrics.exposition()
+        self.assertIn('radiobrowser_api_requests_total'
+                      '{endpoint="tags",status="200"} 1\n', text)
+        self.assertIn('radiobrowser_api_requests_total'
+                      '{endpoint="stations/byuuid",status="404"} 1\n', text)
+        self.assertIn('radiobrowser_api_request_seconds_count'
+                      '{endpoint="tags"} 1\n', text)
+        self.assertIn('radiobrowser_api_read_seconds_count'
+                      '{endpoint="tags"} 1\n', text)
+        self.assertNotIn('radiobrowser_api_bytes_total{endpoint="tags"} 0\n',
+                         text)
+        self.assertIn('radiobrowser_api_bytes_total{endpoint="tags"}', text)
+        self.assertIn('radiobrowser_cache_misses_total{cache="responses"}',
+                      text)
+        self.assertIn('radiobrowser_registry_entries{registry="stations"} 0\n',
+                      text)
+
+
+class MetricsHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return Application(metrics.http_app({}, None))
+
+    def setUp(self):
+        super(MetricsHandlerTest, self).setUp()
+        metrics.clear()
+        self.addCleanup(metrics.clear)
+
+    def test_metrics_are_served_as_text(self):
+        metrics.inc('radiobrowser_resolve_total', result='resolved')
+
+        response = self.fetch('/metrics')
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers['Content-Type'],
+                         metrics.CONTENT_TYPE)
+        self.assertIn(b'radiobrowser_resolve_total{result="resolved"} 1\n',
+                      response.body)
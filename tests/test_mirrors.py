@@ -0,0 +1,120 @@
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mopidy_radiobrowser import mirrors, radiobrowser
+
+from tests.fakes import FakeClock, FakeSession
+
+
+class MirrorPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.pool = mirrors.MirrorPool(
+            None, 1.0, hosts=['a', 'b', 'c'], clock=self.clock)
+
+    def test_ranked_by_latency(self):
+        self.pool.reportSuccess('a', 0.5)
+        self.pool.reportSuccess('b', 0.1)
+        self.pool.reportSuccess('c', 0.3)
+        self.assertEqual(self.pool.hosts(), ['b', 'c', 'a'])
+
+    def test_failing_mirror_is_tried_last(self):
+        self.pool.reportSuccess('a', 0.1)
+        self.pool.reportSuccess('b', 0.2)
+        self.pool.reportFailure('a')
+        self.assertEqual(self.pool.hosts()[0], 'b')
+        self.assertEqual(self.pool.hosts()[-1], 'a')
+
+        self.clock.now += mirrors.FAILURE_BACKOFF + 1
+        self.assertEqual(self.pool.hosts()[0], 'a')
+
+    def test_defaults_without_mirrors(self):
+        pool = mirrors.MirrorPool(None, 1.0)
+        self.assertEqual(pool.hosts(), mirrors.DEFAULT_HOSTS)
+
+    def test_defaults_fail_over_before_discovery(self):
+        pool = mirrors.MirrorPool(None, 1.0, clock=self.clock)
+        first = mirrors.DEFAULT_HOSTS[0]
+
+        pool.reportFailure(first)
+
+        self.assertEqual(pool.hosts(), mirrors.DEFAULT_HOSTS[1:] + [first])
+
+
+class FakeEvent(object):
+    # Records the waits of the discovery thread instead of sleeping
+
+    def __init__(self, waits):
+        self.waits = []
+        self._count = waits
+
+    def is_set(self):
+        return False
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        return len(self.waits) >= self._count
+
+
+class DiscoveryTest(unittest.TestCase):
+
+    def test_failed_discovery_is_retried_with_backoff(self):
+        results = [False, False, True, False]
+        pool = mirrors.MirrorPool(None, 1.0)
+        pool.discover = lambda: results.pop(0)
+        pool._stopped = FakeEvent(4)
+
+        pool._run()
+
+        self.assertEqual(pool._stopped.waits, [
+            mirrors.DISCOVERY_RETRY, mirrors.DISCOVERY_RETRY * 2,
+            mirrors.REDISCOVERY_INTERVAL, mirrors.DISCOVERY_RETRY])
+
+    def test_unreachable_mirrors_keep_the_known_ones(self):
+        pool = mirrors.MirrorPool(FakeSession({}, failing=['x']), 1.0)
+        pool._resolve = lambda: ['x']
+
+        self.assertFalse(pool.discover())
+        self.assertEqual(pool.hosts(), mirrors.DEFAULT_HOSTS)
+
+
+class MirrorCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'mirrors.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached_mirrors_are_used_on_start(self):
+        with open(self.path, 'w') as f:
+            json.dump([{'host': 'x', 'latency': 0.2},
+                       {'host': 'y', 'latency': 0.1}], f)
+        pool = mirrors.MirrorPool(None, 1.0, cachePath=self.path)
+        pool.discover = lambda: False
+        self.addCleanup(pool.stop)
+        pool.start()
+        self.assertEqual(pool.hosts(), ['y', 'x'])
+
+
+class FailoverTest(unittest.TestCase):
+
+    def test_request_fails_over_to_next_mirror(self):
+        session = FakeSession(
+            {'/json/tags': [{'name': 'rock', 'stationcount': 3}]},
+            failing=['a'])
+        browser = radiobrowser.RadioBrowser(1000, session, hosts=['a', 'b'])
+
+        tags = browser.browseCategory('tags')
+
+        self.assertEqual(tags, [{'name': 'rock', 'stationcount': 3}])
+        self.assertEqual(session.requested,
+                         ['http://a/json/tags', 'http://b/json/tags'])
+        self.assertEqual(browser._mirrors.hosts(), ['b', 'a'])
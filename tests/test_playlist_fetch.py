@@ -0,0 +1,107 @@
+from __future__ import unicode_literals
+
+import time
+import unittest
+
+import requests
+
+from mopidy_radiobrowser import radiobrowser
+
+from tests.fakeapi import FakeApi, Raw
+
+PLS = b"""[playlist]
+NumberOfEntries=1
+File1=http://one.example/stream
+"""
+
+HLS = b"""#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=128000
+chunks/128k.m3u8
+"""
+
+# An MPEG frame header followed by silence
+MP3 = b'\xff\xfb\x90\x64' + b'\x00' * 4092
+
+
+class PlaylistFetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeApi({
+            '/aac': Raw(MP3, 'audio/aac', endless=True),
+            '/octet': Raw(MP3, 'application/octet-stream', endless=True),
+            '/untyped': Raw(MP3, None, endless=True),
+            '/pls': Raw(PLS, 'audio/x-scpls; charset=utf-8'),
+            '/text': Raw(PLS, 'text/plain'),
+            '/m3u': Raw(b'http://two.example/stream\n', 'text/plain'),
+            '/hls': Raw(HLS, 'application/x-mpegurl'),
+            '/huge': Raw(PLS + b'#' * (radiobrowser.MAX_PLAYLIST_SIZE),
+                         'audio/x-scpls'),
+        }).start()
+        self.session = requests.Session()
+        self.browser = radiobrowser.RadioBrowser(
+            5000, self.session, hosts=[self.api.host])
+
+    def tearDown(self):
+        self.session.close()
+        self.api.stop()
+
+    def url(self, path):
+        return 'http://%s%s' % (self.api.host, path)
+
+    def test_audio_content_type_is_not_read(self):
+        start = time.monotonic()
+        data, content_type = self.browser._get_playlist(self.url('/aac'))
+
+        self.assertIsNone(data)
+        self.assertEqual(content_type, 'audio/aac')
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_unknown_content_type_is_sniffed(self):
+        for path in ('/octet', '/untyped'):
+            start = time.monotonic()
+            data, _ = self.browser._get_playlist(self.url(path))
+
+            self.assertIsNone(data)
+            self.assertLess(time.monotonic() - start, 1)
+
+    def test_playlist_is_parsed(self):
+        self.assertEqual(self.browser.parse_stream_url(self.url('/pls')),
+                         ['http://one.example/stream'])
+
+    def test_playlist_is_recognised_by_its_content(self):
+        self.assertEqual(self.browser._get_playlist(self.url('/text'))[1],
+                         'audio/x-scpls')
+        self.assertEqual(self.browser.parse_stream_url(self.url('/text')),
+                         ['http://one.example/stream'])
+        self.assertEqual(self.browser.parse_stream_url(self.url('/m3u')),
+                         ['http://two.example/stream'])
+
+    def test_hls_with_playlist_content_type_is_a_stream(self):
+        data, _ = self.browser._get_playlist(self.url('/hls'))
+
+        self.assertIsNone(data)
+        self.assertEqual(self.browser.parse_stream_url(self.url('/hls')),
+                         [self.url('/hls')])
+
+    def test_oversized_playlist_is_a_stream(self):
+        data, _ = self.browser._get_playlist(self.url('/huge'))
+
+        self.assertIsNone(data)
+
+
+class SniffPlaylistTest(unittest.TestCase):
+
+    def test_signatures(self):
+        self.assertEqual(radiobrowser.sniff_playlist(b'\xef\xbb\xbf\n#EXTM3U'),
+                         'audio/x-mpegurl')
+        self.assertEqual(radiobrowser.sniff_playlist(b'<ASX version="3.0">'),
+                         'video/x-ms-asf')
+        self.assertEqual(radiobrowser.sniff_playlist(b'[Reference]\nRef1='),
+                         'video/x-ms-asf')
+        self.assertIsNone(radiobrowser.sniff_playlist(MP3))
+        self.assertIsNone(radiobrowser.sniff_playlist(b'ID3\x04\x00'))
+        self.assertIsNone(radiobrowser.sniff_playlist(b'OggS\x00'))
+
+    def test_hls_is_a_stream(self):
+        self.assertIsNone(radiobrowser.sniff_playlist(
+            b'#EXTM3U\n#EXT-X-VERSION:3\n'))
@@ -0,0 +1,201 @@
+from __future__ import unicode_literals
+
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from mopidy_radiobrowser import radiobrowser
+
+from tests.fakes import FakeSession
+
+
+TAGS = [
+    {'name': 'rock', 'stationcount': 30},
+    {'name': 'jazz', 'stationcount': 20},
+    {'name': 'polka', 'stationcount': 1},
+]
+
+
+class PagedListingTest(unittest.TestCase):
+
+    def test_tags_are_filtered_and_paged(self):
+        session = FakeSession({'/json/tags': TAGS})
+        browser = radiobrowser.RadioBrowser(
+            1000, session, hosts=['mirror'], minStationCount=2, pageSize=3)
+
+        tags = list(browser.iterCategory('tags', 1))
+
+        self.assertEqual([tag['name'] for tag in tags], ['rock', 'jazz'])
+        self.assertFalse(browser.isPageFull(len(tags)))
+        query = parse_qs(urlparse(session.requested[0]).query)
+        self.assertEqual(query['order'], ['stationcount'])
+        self.assertEqual(query['reverse'], ['true'])
+        self.assertEqual(query['hidebroken'], ['true'])
+        self.assertEqual(query['limit'], ['3'])
+        self.assertEqual(query['offset'], ['3'])
+
+    def test_repeated_listing_is_cached(self):
+        session = FakeSession({'/json/tags': TAGS})
+        browser = radiobrowser.RadioBrowser(1000, session, hosts=['mirror'])
+
+        list(browser.iterCategory('tags'))
+        tags = list(browser.iterCategory('tags'))
+
+        self.assertEqual(len(tags), 3)
+        self.assertEqual(len(session.requested), 1)
+
+    def test_streamed_entries_are_not_cached_enriched(self):
+        session = FakeSession({'/json/tags': TAGS})
+        browser = radiobrowser.RadioBrowser(1000, session, hosts=['mirror'])
+
+        for tag in browser.iterCategory('tags'):
+            browser.addTag(tag)
+        tags = list(browser.iterCategory('tags'))
+
+        self.assertEqual(tags, TAGS)
+        self.assertNotIn('URL', tags[0])
+
+    def test_add_tag_applies_minimum(self):
+        browser = radiobrowser.RadioBrowser(
+            1000, FakeSession({}), hosts=['mirror'], minStationCount=2)
+
+        self.assertFalse(browser.addTag({'name': 'polka', 'stationcount': 1}))
+        self.assertTrue(browser.addTag({'name': 'rock', 'stationcount': 3}))
+
+
+class ConnectionTest(unittest.TestCase):
+
+    def test_connect_and_read_timeouts(self):
+        session = FakeSession({'/json/tags': TAGS})
+        browser = radiobrowser.RadioBrowser(
+            5000, session, hosts=['mirror'], connectTimeout=500)
+
+        browser.browseCategory('tags')
+
+        self.assertEqual(session.timeouts, [(0.5, 5.0)])
+
+    def test_connect_timeout_defaults_to_timeout(self):
+        session = FakeSession({'/json/tags': TAGS})
+        browser = radiobrowser.RadioBrowser(5000, session, hosts=['mirror'])
+
+        browser.browseCategory('tags')
+
+        self.assertEqual(session.timeouts, [(5.0, 5.0)])
+
+    def test_https(self):
+        session = FakeSession({'/json/tags': TAGS})
+        browser = radiobrowser.RadioBrowser(
+            1000, session, hosts=['mirror'], https=True)
+
+        browser.browseCategory('tags')
+
+        self.assertEqual(session.requested, ['https://mirror/json/tags'])
+
+
+class RegistryTest(unittest.TestCase):
+
+    def test_least_recently_used_is_evicted(self):
+        registry = radiobrowser.Registry(2)
+        registry['a'] = 1
+        registry['b'] = 2
+        registry.get('a')
+        registry['c'] = 3
+
+        self.assertEqual(sorted(registry), ['a', 'c'])
+        self.assertIsNone(registry.get('b'))
+
+    def test_unbounded(self):
+        registry = radiobrowser.Registry()
+        for i in range(100):
+            registry[i] = i
+
+        self.assertEqual(len(registry), 100)
+
+
+STATION = {
+    'stationuuid': 'uuid-1',
+    'name': 'Radio One',
+    'url': 'http://one.example/stream',
+}
+
+
+class EvictionTest(unittest.TestCase):
+
+    def test_evicted_station_is_fetched_again(self):
+        session = FakeSession({'/json/stations/byuuid/uuid-1': [STATION]})
+        browser = radiobrowser.RadioBrowser(
+            1000, session, hosts=['mirror'], maxStations=1)
+        browser.addStation(STATION)
+        browser.addStation(dict(STATION, stationuuid='uuid-2'))
+
+        station = browser.getStation('uuid-1')
+
+        self.assertEqual(station.name, 'Radio One')
+        self.assertEqual(
+            session.requested, ['http://mirror/json/stations/byuuid/uuid-1'])
+
+    def test_evicted_directory_is_rebuilt(self):
+        browser = radiobrowser.RadioBrowser(
+            1000, FakeSession({}), hosts=['mirror'], maxDirectories=1)
+        browser.addTag({'name': 'rock', 'stationcount': 3})
+        browser.addTag({'name': 'jazz', 'stationcount': 3})
+
+        tag = browser.getTag('rock')
+
+        self.assertEqual(tag['URL'], '/json/stations/bytagexact/rock')
+        self.assertEqual(len(browser.getDirectories()), 1)
+
+
+class BatchLookupTest(unittest.TestCase):
+
+    def test_missing_stations_are_fetched_in_one_request(self):
+        stations = [dict(STATION, stationuuid='uuid-%d' % i)
+                    for i in range(3)]
+        session = FakeSession({'/json/stations/byuuid': stations[1:]})
+        browser = radiobrowser.RadioBrowser(1000, session, hosts=['mirror'])
+        browser.addStation(stations[0])
+
+        result = browser.getStations(['uuid-0', 'uuid-1', 'uuid-2', 'uuid-x'])
+
+        self.assertEqual(sorted(result), ['uuid-0', 'uuid-1', 'uuid-2'])
+        self.assertEqual(len(session.requested), 1)
+        query = parse_qs(urlparse(session.requested[0]).query)
+        self.assertEqual(query['uuids'], ['uuid-1,uuid-2,uuid-x'])
+        self.assertIs(browser.getStation('uuid-2'), result['uuid-2'])
+
+
+class SearchTest(unittest.TestCase):
+
+    def test_remote_results_are_indexed_and_ranked(self):
+        session = FakeSession({'/json/stations/search': [
+            dict(STATION, stationuuid='uuid-1', name='Antenne Rock',
+                 tags='rock'),
+            dict(STATION, stationuuid='uuid-2', name='Rock Radio',
+                 tags='rock'),
+        ]})
+        browser = radiobrowser.RadioBrowser(1000, session, hosts=['mirror'])
+
+        stations = browser.search({'name': ['rock radio'], 'tag': ['rock']})
+
+        # The API matches substrings, its results are kept after the ranked
+        self.assertEqual([s.name for s in stations],
+                         ['Rock Radio', 'Antenne Rock'])
+        self.assertEqual(len(browser._index), 2)
+        query = parse_qs(urlparse(session.requested[0]).query)
+        self.assertEqual(query['name'], ['rock radio'])
+        self.assertEqual(query['tag'], ['rock'])
+        self.assertEqual(query['order'], ['votes'])
+
+    def test_complete_index_answers_offline(self):
+        session = FakeSession({})
+        browser = radiobrowser.RadioBrowser(1000, session, hosts=['mirror'])
+        browser._index.rebuild([radiobrowser.Station.fromApi(
+            dict(STATION, tags='jazz', countrycode='FR'))])
+
+        stations = browser.search({'any': ['radi']})
+        restricted = browser.search(
+            {'any': ['radio']}, directories=[
+                {'key': 'country-DE', 'name': 'Germany', 'a2': 'DE'}])
+
+        self.assertEqual([s.name for s in stations], ['Radio One'])
+        self.assertEqual(restricted, [])
+        self.assertEqual(session.requested, [])
@@ -0,0 +1,198 @@
+from __future__ import unicode_literals
+
+import collections
+import threading
+import unittest
+
+from mopidy import exceptions
+
+from mopidy_radiobrowser.resolver import StreamResolver
+from mopidy_radiobrowser.station import Station
+
+ScanResult = collections.namedtuple('ScanResult', ('mime', 'playable'))
+
+
+class FakeRadioBrowser(object):
+
+    def __init__(self, playlists):
+        self.playlists = playlists
+        self.parsed = []
+
+    def parse_stream_url(self, url):
+        self.parsed.append(url)
+        return self.playlists.get(url, [url])
+
+
+class FakeScanner(object):
+
+    def __init__(self, playable):
+        self.playable = playable
+        self.scanned = []
+
+    def scan(self, uri):
+        self.scanned.append(uri)
+        if uri not in self.playable:
+            raise exceptions.ScannerError('not playable')
+        return ScanResult('audio/mpeg', True)
+
+
+class BlockingScanner(FakeScanner):
+
+    def __init__(self, playable):
+        super(BlockingScanner, self).__init__(playable)
+        self.release = threading.Event()
+
+    def scan(self, uri):
+        self.release.wait(5)
+        return super(BlockingScanner, self).scan(uri)
+
+
+class SlowScanner(FakeScanner):
+    # Blocks the scans of some URIs only
+
+    def __init__(self, playable, slow):
+        super(SlowScanner, self).__init__(playable)
+        self.slow = slow
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def scan(self, uri):
+        if uri in self.slow:
+            self.started.set()
+            self.release.wait(5)
+        return super(SlowScanner, self).scan(uri)
+
+
+def station(url, url_resolved='', stationId='uuid-1'):
+    return Station.fromApi({'stationuuid': stationId, 'name': 'Radio One',
+                            'url': url, 'url_resolved': url_resolved})
+
+
+def stations(count):
+    return [station('http://stream/%d' % i, stationId='uuid-%d' % i)
+            for i in range(count)]
+
+
+class StreamResolverTest(unittest.TestCase):
+
+    def test_resolved_url_is_preferred(self):
+        radiobrowser = FakeRadioBrowser({})
+        resolver = StreamResolver(
+            radiobrowser, FakeScanner(['http://stream/a']))
+
+        uri = resolver.resolve(station('http://pls', 'http://stream/a'))
+
+        self.assertEqual(uri, 'http://stream/a')
+        self.assertEqual(radiobrowser.parsed, [])
+
+    def test_playlist_is_parsed_and_probed(self):
+        radiobrowser = FakeRadioBrowser(
+            {'http://pls': ['http://stream/a', 'http://stream/b']})
+        scanner = FakeScanner(['http://stream/b'])
+        resolver = StreamResolver(radiobrowser, scanner)
+
+        uri = resolver.resolve(station('http://pls', 'http://broken'))
+
+        self.assertEqual(uri, 'http://stream/b')
+        self.assertEqual(
+            sorted(scanner.scanned),
+            ['http://broken', 'http://stream/a', 'http://stream/b'])
+
+    def test_result_is_cached(self):
+        scanner = FakeScanner(['http://stream/a'])
+        resolver = StreamResolver(FakeRadioBrowser({}), scanner)
+
+        resolver.resolve(station('http://stream/a'))
+        resolver.resolve(station('http://stream/a'))
+
+        self.assertEqual(scanner.scanned, ['http://stream/a'])
+
+    def test_best_guess_without_playable_stream(self):
+        resolver = StreamResolver(FakeRadioBrowser({}), FakeScanner([]))
+
+        uri = resolver.resolve(station('http://stream/a', 'http://stream/b'))
+
+        self.assertEqual(uri, 'http://stream/b')
+
+    def test_without_scanner(self):
+        resolver = StreamResolver(FakeRadioBrowser({}))
+
+        self.assertEqual(
+            resolver.resolve(station('http://stream/a')), 'http://stream/a')
+        self.assertIsNone(resolver.resolve(
+            Station.fromApi({'stationuuid': 'uuid-2', 'name': 'Mute'})))
+
+
+class PrefetchTest(unittest.TestCase):
+
+    def resolver(self, scanner, prefetch=2):
+        resolver = StreamResolver(FakeRadioBrowser({}), scanner,
+                                  prefetch=prefetch, prefetchWorkers=1)
+        self.addCleanup(resolver.stop)
+        return resolver
+
+    def test_disabled_by_default(self):
+        scanner = FakeScanner([])
+        resolver = StreamResolver(FakeRadioBrowser({}), scanner)
+
+        resolver.prefetch(stations(3))
+
+        self.assertFalse(resolver.prefetching)
+        self.assertEqual(scanner.scanned, [])
+
+    def test_first_stations_are_resolved(self):
+        scanner = FakeScanner(['http://stream/0', 'http://stream/1'])
+        resolver = self.resolver(scanner)
+        listing = stations(5)
+
+        resolver.prefetch(listing)
+        resolver.resolve(listing[0])
+        resolver.resolve(listing[1])
+
+        self.assertEqual(sorted(scanner.scanned),
+                         ['http://stream/0', 'http://stream/1'])
+
+    def test_playback_waits_for_running_prefetch(self):
+        scanner = BlockingScanner(['http://stream/0'])
+        resolver = self.resolver(scanner, prefetch=1)
+        listing = stations(3)
+
+        resolver.prefetch(listing)
+        scanner.release.set()
+
+        self.assertEqual(resolver.resolve(listing[0]), 'http://stream/0')
+        self.assertEqual(scanner.scanned, ['http://stream/0'])
+
+    def test_playback_does_not_wait_for_queued_prefetch(self):
+        scanner = SlowScanner(['http://stream/0', 'http://stream/1'],
+                              ['http://stream/0'])
+        self.addCleanup(scanner.release.set)
+        resolver = self.resolver(scanner, prefetch=2)
+        listing = stations(2)
+        resolver.prefetch(listing)
+        scanner.started.wait(5)
+        resolved = []
+
+        # The second station is queued behind the blocked first one
+        thread = threading.Thread(
+            target=lambda: resolved.append(resolver.resolve(listing[1])))
+        thread.start()
+        thread.join(2)
+
+        self.assertEqual(resolved, ['http://stream/1'])
+        self.assertNotIn('uuid-1', resolver._pending)
+
+    def test_neighbours_of_playing_station(self):
+        scanner = BlockingScanner([])
+        resolver = self.resolver(scanner, prefetch=1)
+        listing = stations(5)
+        resolver.prefetch(listing)
+
+        resolver.prefetchAround(listing[2])
+        pending = set(resolver._pending)
+        scanner.release.set()
+
+        # The queued prefetch of the first station gave way to the neighbours
+        self.assertIn('uuid-3', pending)
+        self.assertIn('uuid-1', pending)
+        self.assertNotIn('uuid-4', pending)
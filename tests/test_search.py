@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from mopidy_radiobrowser.search import SearchIndex, within_one_edit
+from mopidy_radiobrowser.station import Station
+
+
+def station(uuid, name, tags='', country='', countrycode='', votes=0):
+    return Station.fromApi({
+        'stationuuid': uuid,
+        'name': name,
+        'tags': tags,
+        'country': country,
+        'countrycode': countrycode,
+        'votes': votes,
+    })
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add(station('1', 'Rock Antenne', 'rock,classic rock',
+                               'Germany', 'DE', votes=50))
+        self.index.add(station('2', 'Radio Rockland', 'rock',
+                               'Germany', 'DE', votes=10))
+        self.index.add(station('3', 'Jazz Radio', 'jazz',
+                               'France', 'FR', votes=100))
+
+    def names(self, query, **kwargs):
+        return [s.name for s in self.index.search(query, **kwargs)]
+
+    def test_exact_name_match_ranks_first(self):
+        self.assertEqual(
+            self.names({'any': ['rock']}), ['Rock Antenne', 'Radio Rockland'])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.names({'name': ['rockl']}), ['Radio Rockland'])
+
+    def test_exact_search_has_no_prefix_match(self):
+        self.assertEqual(self.names({'name': ['rockl']}, exact=True), [])
+
+    def test_fuzzy_match(self):
+        self.assertEqual(self.names({'name': ['jaz radio']}), ['Jazz Radio'])
+
+    def test_field_queries(self):
+        self.assertEqual(self.names({'tag': ['jazz']}), ['Jazz Radio'])
+        self.assertEqual(self.names({'album': ['france']}), ['Jazz Radio'])
+        self.assertEqual(self.names({'name': ['germany']}), [])
+
+    def test_terms_are_combined(self):
+        self.assertEqual(
+            self.names({'any': ['radio'], 'tag': ['rock']}),
+            ['Radio Rockland'])
+
+    def test_popularity_breaks_ties(self):
+        self.assertEqual(
+            self.names({'album': ['germany']}),
+            ['Rock Antenne', 'Radio Rockland'])
+
+    def test_limit_and_restriction(self):
+        self.assertEqual(self.names({'any': ['radio']}, limit=1),
+                         ['Jazz Radio'])
+        self.assertEqual(
+            self.names({'any': ['radio']},
+                       restrict=lambda s: s.countrycode == 'DE'),
+            ['Radio Rockland'])
+
+    def test_discard(self):
+        self.index.discard('3')
+        self.assertEqual(self.names({'tag': ['jazz']}), [])
+        self.assertEqual(len(self.index), 2)
+
+    def test_rebuild(self):
+        self.index.rebuild([station('4', 'Polka Power', 'polka')])
+        self.assertTrue(self.index.complete)
+        self.assertEqual(self.names({'any': ['rock']}), [])
+        self.assertEqual(self.names({'any': ['polk']}), ['Polka Power'])
+
+
+class WithinOneEditTest(unittest.TestCase):
+
+    def test_edits(self):
+        self.assertTrue(within_one_edit('jazz', 'jazz'))
+        self.assertTrue(within_one_edit('jaz', 'jazz'))
+        self.assertTrue(within_one_edit('jazz', 'jasz'))
+        self.assertFalse(within_one_edit('rokc', 'rock'))
+        self.assertFalse(within_one_edit('ja', 'jazz'))
@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+import requests
+
+from mopidy_radiobrowser import radiobrowser
+
+from tests.fakeapi import FakeApi
+
+TOP_CLICKED = [{'stationuuid': 'uuid-1', 'name': 'Radio One'}]
+TAGS = [{'name': 'jazz', 'stationcount': 10}]
+
+
+def concurrently(function, count=5):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(function()))
+               for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_execution(self):
+        flights = radiobrowser.SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def call():
+            calls.append(1)
+            release.wait(5)
+            return 'value'
+
+        threads = [threading.Thread(
+            target=lambda: results.append(flights.do('key', call)))
+            for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while flights.coalesced < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(flights.stats(),
+                         {'calls': 1, 'coalesced': 3, 'inflight': 0})
+
+    def test_errors_are_shared(self):
+        flights = radiobrowser.SingleFlight()
+        flight, leader = flights.join('key')
+        follower, isLeader = flights.join('key')
+
+        flights.leave('key', flight, error=ValueError('failed'))
+
+        self.assertTrue(leader)
+        self.assertFalse(isLeader)
+        with self.assertRaises(ValueError):
+            follower.result()
+        self.assertTrue(flights.join('key')[1])
+
+
+class CoalescedRequestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeApi({
+            '/json/stations/topclick/50': TOP_CLICKED,
+            '/json/tags': TAGS,
+        }, latency=0.2).start()
+        self.session = requests.Session()
+        self.browser = radiobrowser.RadioBrowser(
+            5000, self.session, hosts=[self.api.host])
+
+    def tearDown(self):
+        self.session.close()
+        self.api.stop()
+
+    def test_concurrent_browses_share_one_request(self):
+        results = concurrently(lambda: self.browser.browseCategory('clicks'))
+
+        self.assertEqual(results, [TOP_CLICKED] * 5)
+        self.assertEqual(self.api.count('/json/stations/topclick/50'), 1)
+        self.assertGreater(self.browser._flights.coalesced, 0)
+
+    def test_concurrent_listings_share_one_download(self):
+        results = concurrently(
+            lambda: list(self.browser.iterCategory('tags')))
+
+        self.assertEqual(results, [TAGS] * 5)
+        self.assertEqual(self.api.count('/json/tags'), 1)
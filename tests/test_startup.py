@@ -0,0 +1,63 @@
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from mopidy_radiobrowser import radiobrowser
+from mopidy_radiobrowser.catalog import Catalog
+
+# Modules the extension must not load before it is used
+HEAVY_MODULES = ('pkg_resources', 'pycountry', 'requests', 'sqlite3')
+
+# Generous upper limit for importing the extension, in seconds
+MAX_IMPORT_TIME = 0.5
+
+STARTUP = '''
+import json, sys, time
+import mopidy.ext
+before = set(sys.modules)
+start = time.perf_counter()
+import mopidy_radiobrowser
+mopidy_radiobrowser.Extension().get_config_schema()
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed,
+                  'loaded': sorted(set(sys.modules) - before)}))
+'''
+
+
+class FailingSession(object):
+
+    def get(self, uri, **kwargs):
+        raise AssertionError('Request to %s during startup' % uri)
+
+
+class StartupTest(unittest.TestCase):
+
+    def test_import_is_cheap(self):
+        # A fresh interpreter, the other tests have loaded everything
+        output = subprocess.check_output([sys.executable, '-c', STARTUP])
+        result = json.loads(output.decode('utf-8'))
+
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, result['loaded'])
+        self.assertLess(result['elapsed'], MAX_IMPORT_TIME)
+
+    def test_construction_does_no_io(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        threads = threading.active_count()
+
+        radiobrowser.RadioBrowser(
+            1000, FailingSession(),
+            catalog=Catalog(os.path.join(directory, 'catalog.sqlite3')),
+            mirrorCache=os.path.join(directory, 'mirrors.json'),
+            responseStore=os.path.join(directory, 'responses.sqlite3'))
+
+        self.assertEqual(os.listdir(directory), [])
+        self.assertEqual(threading.active_count(), threads)
@@ -0,0 +1,51 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from mopidy_radiobrowser.station import Station
+
+API_STATION = {
+    'stationuuid': 'uuid-1',
+    'changeuuid': 'change-1',
+    'name': 'Radio One',
+    'url': 'http://one.example/stream',
+    'homepage': 'http://one.example/',
+    'favicon': 'http://one.example/icon.png',
+    'tags': 'rock,pop',
+    'countrycode': 'DE',
+    'state': 'Saxony ',
+    'codec': 'MP3',
+    'votes': 10,
+}
+
+
+class StationTest(unittest.TestCase):
+
+    def test_from_api(self):
+        station = Station.fromApi(API_STATION)
+
+        self.assertEqual(station.stationuuid, 'uuid-1')
+        self.assertEqual(station.name, 'Radio One')
+        self.assertEqual(station.url, 'http://one.example/stream')
+        self.assertEqual(station.favicon, 'http://one.example/icon.png')
+        self.assertEqual(station.state, 'Saxony')
+        self.assertEqual(station.countrycode, 'DE')
+        self.assertFalse(hasattr(station, '__dict__'))
+
+    def test_missing_fields(self):
+        station = Station.fromApi({'stationuuid': 'uuid-2', 'name': None})
+
+        self.assertEqual(station.name, '')
+        self.assertEqual(station.favicon, '')
+
+    def test_repeated_values_are_shared(self):
+        first = Station.fromApi(dict(API_STATION, codec='M' + 'P3'))
+        second = Station.fromApi(dict(API_STATION, codec=''.join('MP3')))
+
+        self.assertIs(first.codec, second.codec)
+        self.assertEqual(first, second)
+
+    def test_record_is_passed_through(self):
+        station = Station.fromApi(API_STATION)
+
+        self.assertIs(Station.fromApi(station), station)
@@ -0,0 +1,80 @@
+from __future__ import unicode_literals
+
+import threading
+import unittest
+
+import requests
+
+from mopidy_radiobrowser import radiobrowser
+
+from tests.fakeapi import FakeApi
+
+STATION = {
+    'stationuuid': 'uuid-1',
+    'name': 'Radio One',
+    'url': 'http://one.example/stream',
+    'favicon': 'http://one.example/icon.png',
+}
+
+
+class StationLookupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeApi({
+            '/json/stations/byuuid/uuid-1': [STATION],
+            '/json/stations/byuuid/gone': [],
+        }).start()
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.api.stop()
+
+    def browser(self):
+        return radiobrowser.RadioBrowser(
+            1000, self.session, hosts=[self.api.host])
+
+    def test_unknown_station_is_fetched_and_kept(self):
+        browser = self.browser()
+
+        station = browser.getStation('uuid-1')
+
+        self.assertEqual(station.name, 'Radio One')
+        self.assertIs(browser.getStation('uuid-1'), station)
+        self.assertIn('uuid-1', browser._stations)
+        self.assertNotIn('stationId', browser._stations)
+        self.assertEqual(self.api.count('/json/stations/byuuid/uuid-1'), 1)
+
+    def test_missing_station_is_cached(self):
+        browser = self.browser()
+
+        self.assertIsNone(browser.getStation('gone'))
+        browser._responses.clear()
+        self.assertIsNone(browser.getStation('gone'))
+
+        self.assertEqual(self.api.count('/json/stations/byuuid/gone'), 1)
+
+    def test_concurrent_lookups_share_one_request(self):
+        self.api.latency = 0.2
+        browser = self.browser()
+        results = []
+
+        def lookup():
+            results.append(browser.getStation('uuid-1'))
+
+        threads = [threading.Thread(target=lookup) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([station.name for station in results],
+                         ['Radio One'] * 5)
+        self.assertEqual(self.api.count('/json/stations/byuuid/uuid-1'), 1)
+
+    def test_failed_mirror_is_not_cached_as_missing(self):
+        browser = radiobrowser.RadioBrowser(
+            1000, self.session, hosts=['127.0.0.1:9'])
+
+        self.assertIsNone(browser.getStation('uuid-1'))
+        self.assertEqual(browser._missingStations.get('uuid-1'), (False, None))
@@ -0,0 +1,62 @@
+from __future__ import unicode_literals
+
+import logging
+import unittest
+
+from mopidy_radiobrowser import radiobrowser, tracing
+
+from tests.fakes import FakeSession
+
+TAGS = [{'name': 'tag%d' % i, 'stationcount': 10} for i in range(10000)]
+
+
+class TracingTest(unittest.TestCase):
+
+    def setUp(self):
+        tracing.clear()
+        self.addCleanup(tracing.enable, False)
+        self.addCleanup(tracing.clear)
+
+    def test_disabled_tracing_records_nothing(self):
+        with tracing.span('request', uri='/json/tags') as span:
+            span.set(status=200)
+
+        self.assertIs(tracing.span('request'), tracing.NULL_SPAN)
+        self.assertEqual(tracing.spans(), [])
+
+    def test_spans_are_recorded_with_durations(self):
+        tracing.enable()
+
+        with tracing.span('request', uri='/json/tags') as span:
+            span.set(status=200)
+        with self.assertRaises(ValueError):
+            with tracing.span('parse'):
+                raise ValueError()
+
+        request, parse = tracing.spans()
+        self.assertEqual(request.attrs, {'uri': '/json/tags', 'status': 200})
+        self.assertGreaterEqual(request.duration, 0)
+        self.assertEqual(parse.attrs, {'error': 'ValueError'})
+        self.assertEqual(tracing.totals()['request'][0], 1)
+
+    def test_api_requests_are_traced(self):
+        tracing.enable()
+        browser = radiobrowser.RadioBrowser(
+            1000, FakeSession({'/json/tags': TAGS}), hosts=['mirror'])
+
+        list(browser.iterCategory('tags'))
+
+        names = [span.name for span in tracing.spans()]
+        self.assertEqual(names, ['request', 'parse'])
+        self.assertEqual(tracing.spans()[1].attrs['entries'], len(TAGS))
+
+    def test_large_listing_logs_once(self):
+        browser = radiobrowser.RadioBrowser(
+            1000, FakeSession({'/json/tags': TAGS}), hosts=['mirror'])
+
+        with self.assertLogs('mopidy_radiobrowser', logging.DEBUG) as logs:
+            tags = list(browser.iterCategory('tags'))
+            for tag in tags:
+                browser.addTag(tag)
+
+        self.assertLess(len(logs.records), 10)
@@ -0,0 +1,88 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from mopidy_radiobrowser import radiobrowser, translator
+from mopidy_radiobrowser.station import Station
+
+STATIONS = [Station('uuid-%d' % i, 'Radio %d' % i, 'http://radio%d/' % i)
+            for i in range(5)]
+
+
+class BatchTranslationTest(unittest.TestCase):
+
+    def test_station_refs_match_single_translation(self):
+        stations = STATIONS + [Station('uuid-x', '', 'http://x/'),
+                               Station('uuid-y', '', '')]
+
+        self.assertEqual(translator.stations_to_refs(stations),
+                         [translator.station_to_ref(s) for s in stations])
+        self.assertEqual(translator.stations_to_refs(stations)[-1].name, '??')
+
+    def test_directory_refs_match_unparse_uri(self):
+        tags = [{'name': ' hip hop '}, {'name': 'a:b'}]
+
+        refs = translator.directories_to_refs('tag', tags)
+
+        self.assertEqual([ref.uri for ref in refs],
+                         [translator.unparse_uri('tag', 'hip hop'),
+                          translator.unparse_uri('tag', 'a:b')])
+        self.assertEqual([ref.uri for ref in refs],
+                         ['radiobrowser:tag:hip%20hop', 'radiobrowser:tag:a%3Ab'])
+        self.assertEqual([ref.name for ref in refs], ['hip hop', 'a:b'])
+        self.assertEqual(translator.language_to_ref({'name': 'german'}).uri,
+                         'radiobrowser:language:german')
+
+    def test_tracks_match_single_translation(self):
+        self.assertEqual(translator.stations_to_tracks(STATIONS),
+                         [translator.station_to_track(s) for s in STATIONS])
+
+    def test_tracks_are_memoized_by_uuid(self):
+        memo = radiobrowser.Registry(10)
+
+        first = translator.stations_to_tracks(STATIONS, memo)
+        again = translator.stations_to_tracks(STATIONS[:2], memo)
+
+        self.assertIs(again[0], first[0])
+        self.assertIs(again[1], first[1])
+        self.assertEqual(len(memo), len(STATIONS))
+
+    def test_refs_are_memoized_by_uuid(self):
+        memo = {}
+
+        first = translator.stations_to_refs(STATIONS, memo)
+        again = translator.stations_to_refs(STATIONS, memo)
+
+        self.assertEqual(first, translator.stations_to_refs(STATIONS))
+        self.assertTrue(all(a is b for a, b in zip(first, again)))
+
+    def test_renamed_station_gets_a_new_track(self):
+        memo = {}
+        old, = translator.stations_to_tracks(STATIONS[:1], memo)
+
+        renamed = Station('uuid-0', 'Radio Zero', 'http://radio0/')
+        new, = translator.stations_to_tracks([renamed], memo)
+
+        self.assertEqual(new.name, 'Radio Zero')
+        self.assertIs(memo['uuid-0'], new)
+        self.assertIsNot(new, old)
+
+
+class AddStationsTest(unittest.TestCase):
+
+    def test_listing_is_added_at_once(self):
+        browser = radiobrowser.RadioBrowser(1000, hosts=['mirror'],
+                                            maxStations=3)
+
+        stations = browser.addStations(
+            [{'stationuuid': 'uuid-%d' % i, 'name': 'Radio %d' % i}
+             for i in range(5)])
+
+        self.assertEqual([s.stationuuid for s in stations],
+                         ['uuid-%d' % i for i in range(5)])
+        self.assertEqual(len(browser._stations), 3)
+        self.assertIsNone(browser._stations.get('uuid-0'))
+        # Evicted stations are not found by a search either
+        found = browser._index.search({'name': ['radio']}, False, 10)
+        self.assertEqual(sorted(s.stationuuid for s in found),
+                         ['uuid-2', 'uuid-3', 'uuid-4'])
@@ -0,0 +1,101 @@
+from __future__ import unicode_literals
+
+import unittest
+
+import requests
+
+from mopidy_radiobrowser import radiobrowser, translator, uris
+
+from tests.fakeapi import FakeApi
+
+STATIONS = [
+    {'stationuuid': 'uuid-1', 'name': 'Radio Dresden', 'countrycode': 'DE',
+     'state': 'Saxony'},
+]
+
+
+class UrisTest(unittest.TestCase):
+
+    def test_names_round_trip(self):
+        for name in ('Hip Hop', 'HipHop', 'a:b', 'r&b/soul', '50%', 'Köln'):
+            identifier = uris.quote_name(name)
+            self.assertNotIn(':', identifier)
+            self.assertEqual(uris.unquote_name(identifier), name)
+
+    def test_state_ids(self):
+        self.assertEqual(uris.state_id('DE', 'Saxony'), 'DE:Saxony')
+        self.assertEqual(uris.state_id('DE', 'DE'), 'DE')
+        self.assertEqual(uris.state_id('DE'), 'DE')
+        self.assertEqual(uris.state_id('', 'New York'), 'New%20York')
+        self.assertEqual(uris.parse_state_id('DE:Saxony'), ('DE', 'Saxony'))
+        self.assertEqual(uris.parse_state_id('DE'), ('DE', None))
+        self.assertEqual(uris.parse_state_id('US:New%20York'),
+                         ('US', 'New York'))
+        # Identifiers of the old form
+        self.assertEqual(uris.parse_state_id('Saxony'), ('', 'Saxony'))
+
+
+class DirectoryUriTest(unittest.TestCase):
+
+    def setUp(self):
+        self.browser = radiobrowser.RadioBrowser(1000, hosts=['mirror'])
+
+    def test_names_do_not_collide(self):
+        for name in ('Hip Hop', 'HipHop'):
+            self.browser.addTag({'name': name, 'stationcount': 10})
+
+        refs = translator.directories_to_refs(
+            'tag', [{'name': 'Hip Hop'}, {'name': 'HipHop'}])
+
+        self.assertEqual([ref.uri for ref in refs],
+                         ['radiobrowser:tag:Hip%20Hop', 'radiobrowser:tag:HipHop'])
+        self.assertEqual(self.browser.getTag('Hip%20Hop')['name'], 'Hip Hop')
+        self.assertEqual(self.browser.getTag('HipHop')['name'], 'HipHop')
+
+    def test_states_are_qualified_by_country(self):
+        for code, country in (('US', 'United States'), ('AU', 'Australia')):
+            state = {'name': 'Victoria', 'country': country,
+                     'countrycode': code, 'stationcount': 1}
+            self.browser.addState(state)
+            self.assertEqual(translator.state_to_ref(state).uri,
+                             'radiobrowser:state:%s:Victoria' % code)
+
+        self.assertEqual(self.browser.getState('US:Victoria')['countrycode'],
+                         'US')
+        self.assertEqual(self.browser.getState('AU:Victoria')['countrycode'],
+                         'AU')
+
+    def test_directories_are_rebuilt_from_the_uri(self):
+        tag = self.browser.getTag('r%26b%2Fsoul')
+        state = self.browser.getState('DE:Lower%20Saxony')
+        whole = self.browser.getState('DE')
+
+        self.assertEqual(tag['name'], 'r&b/soul')
+        self.assertTrue(tag['URL'].endswith('/bytagexact/r%26b%2Fsoul'))
+        self.assertEqual((state['name'], state['countrycode']),
+                         ('Lower Saxony', 'DE'))
+        self.assertTrue(state['URL'].endswith('/bystateexact/Lower%20Saxony'))
+        self.assertTrue(whole['URL'].endswith('/bycountrycodeexact/DE'))
+        self.assertEqual(self.browser.getLanguage('german')['name'], 'german')
+        self.assertEqual(self.browser.getCountry('DE')['a2'], 'DE')
+
+
+class RestartTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeApi({
+            '/json/stations/bycountrycodeexact/DE': STATIONS,
+        }).start()
+        self.addCleanup(self.api.stop)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+        self.browser = radiobrowser.RadioBrowser(
+            5000, self.session, hosts=[self.api.host])
+
+    def test_state_is_browsed_without_its_parent(self):
+        state = self.browser.getState('DE:Saxony')
+
+        stations = self.browser.stations(state)
+
+        self.assertEqual([s.stationuuid for s in stations], ['uuid-1'])
+        self.assertEqual(self.api.count('/json/states/Germany/'), 0)
@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from mopidy_radiobrowser import radiobrowser
+from mopidy_radiobrowser.validators import ValidatorStore, conditional_headers
+
+from tests.fakeapi import FakeApi
+
+TAGS = [{'name': 'jazz', 'stationcount': 10}]
+COUNTRIES = [{'name': 'DE', 'stationcount': 10}]
+
+
+class ValidatorStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'responses.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_entries_survive_a_restart(self):
+        store = ValidatorStore(self.path)
+        store.set('/json/tags', '"abc"', None, TAGS)
+        store.close()
+
+        validated = ValidatorStore(self.path).get('/json/tags')
+
+        self.assertEqual(validated.etag, '"abc"')
+        self.assertEqual(validated.body, TAGS)
+        self.assertEqual(conditional_headers(validated),
+                         {'If-None-Match': '"abc"'})
+
+    def test_responses_without_validators_are_not_stored(self):
+        store = ValidatorStore()
+        store.set('/json/tags', None, None, TAGS)
+
+        self.assertIsNone(store.get('/json/tags'))
+        self.assertEqual(conditional_headers(None), {})
+
+
+class RevalidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'responses.sqlite3')
+        self.api = FakeApi({
+            '/json/tags': TAGS,
+            '/json/countrycodes': COUNTRIES,
+        }).start()
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.api.stop()
+        shutil.rmtree(self.directory)
+
+    def browser(self):
+        browser = radiobrowser.RadioBrowser(
+            1000, self.session, hosts=[self.api.host],
+            responseStore=self.path)
+        self.addCleanup(browser.stop)
+        return browser
+
+    def test_stale_listing_is_revalidated(self):
+        browser = self.browser()
+        browser.browseCategory('countries')
+
+        browser.reload()
+        countries = browser.browseCategory('countries')
+
+        self.assertEqual(countries, COUNTRIES)
+        self.assertEqual(self.api.count('/json/countrycodes'), 2)
+        self.assertEqual(self.api.notModified, 1)
+
+    def test_streamed_listing_is_revalidated_after_restart(self):
+        list(self.browser().iterCategory('tags'))
+
+        tags = list(self.browser().iterCategory('tags'))
+
+        self.assertEqual(tags, TAGS)
+        self.assertEqual(self.api.count('/json/tags'), 2)
+        self.assertEqual(self.api.notModified, 1)